@@ -1,22 +1,474 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import csv
 import argparse
 import base64
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterable, Iterator, Set, AsyncIterator, Awaitable, NamedTuple, Mapping
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+from collections import deque, OrderedDict
+import collections.abc
+from urllib.parse import quote, urlsplit
 import sys
 import xml.etree.ElementTree as ET
 from html import unescape
 import re
 import logging
 import os
+import asyncio
+import threading
+import sqlite3
+import time
+import zlib
+import hashlib
+import bisect
+import copy
+import contextlib
+import functools
+import cProfile
+import pstats
+import tracemalloc
+import itertools
+import importlib.util
+import random
+import codecs
+from email.utils import parsedate_to_datetime
+
+try:
+    import httpx
+except ImportError:  # Only needed for the async engine
+    httpx = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Only needed for the parquet output format
+    pyarrow = None
+
+try:
+    import orjson
+except ImportError:  # Optional, decodes response bodies faster than the json module
+    orjson = None
+
+# Maximum number of work item IDs accepted by a single work items batch request
+WORK_ITEM_BATCH_SIZE = 200
+
+# Columns of the hierarchical export, in output order
+EXPORT_COLUMNS = [
+    'Type', 'Test Plan ID', 'Suite Path', 'Suite ID', 'Test Case ID', 
+    'Title', 'Step Number', 'Step Action', 'Expected Result',
+    'Execution Status', 'Execution Outcome', 'Last Run Date',
+    'Last Run By', 'Assigned To', 'Created Date', 
+    'Created By', 'Area Path', 'Iteration', 'Automated'
+]
+
+# Position of each export column in a row
+COLUMN_INDEX = {column: index for index, column in enumerate(EXPORT_COLUMNS)}
+
+# Work item fields each export column is read from; work items are fetched with only the fields of the columns
+COLUMN_FIELDS = {
+    'Title': ['System.Title'],
+    'Step Number': ['Microsoft.VSTS.TCM.Steps'],
+    'Step Action': ['Microsoft.VSTS.TCM.Steps'],
+    'Expected Result': ['Microsoft.VSTS.TCM.Steps'],
+    'Created Date': ['System.CreatedDate'],
+    'Created By': ['System.CreatedBy'],
+    'Area Path': ['System.AreaPath'],
+    'Iteration': ['System.IterationPath'],
+    'Automated': ['Microsoft.VSTS.TCM.AutomatedTestName'],
+}
+
+# Fields fetched for every work item: revisions validate cached payloads, steps hold shared steps references
+WORK_ITEM_BASE_FIELDS = ['System.Id', 'System.Rev', 'System.Title', 'Microsoft.VSTS.TCM.Steps']
+
+# Output formats and the file extension of each
+EXPORT_FORMATS = {'csv': '.csv', 'sqlite': '.sqlite', 'parquet': '.parquet', 'jsonl': '.jsonl'}
+
+# Rows buffered per table before a bulk insert into the SQLite output
+SQLITE_INSERT_BATCH_SIZE = 5000
+
+# Columns of the SQLite test_cases table, which extra field columns are added to
+SQLITE_TEST_CASE_COLUMNS = ['id', 'title', 'created_date', 'created_by', 'area_path', 'iteration', 'automated']
+
+# Rows buffered per row group of the Parquet output
+PARQUET_ROW_GROUP_SIZE = 50000
+
+# Low-cardinality export columns stored dictionary encoded in the Parquet output
+PARQUET_DICTIONARY_COLUMNS = [
+    'Type', 'Test Plan ID', 'Suite Path', 'Suite ID', 'Execution Status', 'Execution Outcome',
+    'Last Run By', 'Assigned To', 'Created By', 'Area Path', 'Iteration', 'Automated'
+]
+
+# Response header carrying the token for the next page of a list endpoint
+CONTINUATION_TOKEN_HEADER = 'x-ms-continuationtoken'
+
+# Page sizes for the test run endpoints, which page with $top/$skip rather than continuation tokens
+TEST_RUNS_PAGE_SIZE = 100
+TEST_RESULTS_PAGE_SIZE = 1000
+
+# The test runs query API accepts date ranges of at most 7 days
+TEST_RUNS_QUERY_MAX_DAYS = 7
+
+# WIQL queries return at most this many work items
+WIQL_MAX_RESULTS = 20000
+
+# Incremental exports look back this far before the previous watermark to tolerate clock skew
+INCREMENTAL_OVERLAP = timedelta(minutes=5)
+
+# Shared steps are referenced from a test step action as @<work item ID>
+SHARED_STEP_REF_PATTERN = re.compile(r'@(\d+)')
+
+# HTML tags inside test step text
+HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# Number of distinct test steps XML documents whose parsed steps are memoized
+STEPS_PARSE_CACHE_SIZE = 4096
+
+# Smaller batches of test steps XML are parsed in-process, as sending them to parse workers costs more
+PARSE_POOL_MIN_BATCH = 8
+
+# Responses worth retrying: throttling and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Default number of retries of a failed request, and the exponential backoff between them in seconds
+MAX_RETRIES = 5
+RETRY_BACKOFF_BASE = 1.0
+RETRY_BACKOFF_MAX = 60.0
+
+# Concurrency is reduced when fewer than this share of the rate limit remains
+RATE_LIMIT_PRESSURE_RATIO = 0.1
+
+# Response encodings accepted from the server; brotli only when a decoder for it is installed
+ACCEPT_ENCODING = ', '.join(['gzip', 'deflate'] + (['br'] if importlib.util.find_spec('brotli')
+                                                    or importlib.util.find_spec('brotlicffi') else []))
+
+# Response bodies with a Content-Length of at least this many bytes on the wire are decoded as they download instead
+# of being read whole and decoded with decode_json, and the chunk size they are read in. Bodies of unknown length,
+# such as chunked compressed responses, are read whole
+STREAM_DECODE_MIN_BYTES = 1024 * 1024
+STREAM_DECODE_CHUNK_SIZE = 64 * 1024
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Request metrics are grouped by endpoint, named after the first pattern matching the URL path
+ENDPOINT_PATTERNS = [
+    ('test_plans', re.compile(r'/testplan/plans$', re.IGNORECASE)),
+    ('test_plan', re.compile(r'/testplan/plans/\d+$', re.IGNORECASE)),
+    ('test_suites', re.compile(r'/testplan/plans/\d+/suites$', re.IGNORECASE)),
+    ('test_cases', re.compile(r'/suites/\d+/testcase$', re.IGNORECASE)),
+    ('test_points', re.compile(r'/suites/\d+/testpoint$', re.IGNORECASE)),
+    ('test_runs', re.compile(r'/test/runs$', re.IGNORECASE)),
+    ('test_results', re.compile(r'/test/runs/\d+/results$', re.IGNORECASE)),
+    ('wiql', re.compile(r'/wit/wiql$', re.IGNORECASE)),
+    ('work_items', re.compile(r'/wit/workitems(/\d+)?$', re.IGNORECASE)),
+]
+
+# Prefix of the metric names in the Prometheus textfile
+PROMETHEUS_METRIC_PREFIX = 'azure_test_plan_export'
+
+# Functions listed in each --profile hotspot table, and allocation sites in each of its memory tables
+PROFILE_TOP_FUNCTIONS = 40
+PROFILE_TOP_ALLOCATIONS = 15
+
+class TestResultRecord(NamedTuple):
+    """Compact latest test result of a test case, holding only the fields the export uses"""
+    outcome: str
+    state: str
+    completed_date: str
+    run_by: str
+    
+    @classmethod
+    def from_api(cls, result: Dict[Any, Any]) -> 'TestResultRecord':
+        return cls(
+            result.get('outcome', ''),
+            result.get('state', 'Not Executed'),
+            result.get('completedDate') or '',
+            (result.get('runBy') or {}).get('displayName', ''),
+        )
+
+class ExportRow(collections.abc.Mapping):
+    """One row of the hierarchical export, stored as a tuple of column values in EXPORT_COLUMNS order.
+    
+    Rows read like the column-keyed dicts they replace (row['Title'], get(), items(), dict(row)),
+    at a fraction of the memory of a 19-key dict. Test case rows may carry the values of extra field columns
+    after the EXPORT_COLUMNS cells; those are only read through row_cells.
+    """
+    __slots__ = ('cells',)
+    
+    def __init__(self, cells: Tuple[str, ...]):
+        self.cells = cells
+    
+    @classmethod
+    def make(cls, row_type: str, plan_id: str = '', suite_path: str = '', suite_id: str = '', test_case_id: str = '',
+             title: str = '', step_number: str = '', step_action: str = '', expected_result: str = '',
+             execution_status: str = '', execution_outcome: str = '', last_run_date: str = '', last_run_by: str = '',
+             assigned_to: str = '', created_date: str = '', created_by: str = '', area_path: str = '',
+             iteration: str = '', automated: str = '', extra_fields: Tuple[str, ...] = ()) -> 'ExportRow':
+        return cls((row_type, plan_id, suite_path, suite_id, test_case_id, title, step_number, step_action,
+                    expected_result, execution_status, execution_outcome, last_run_date, last_run_by, assigned_to,
+                    created_date, created_by, area_path, iteration, automated) + extra_fields)
+    
+    def __getitem__(self, column: str) -> str:
+        return self.cells[COLUMN_INDEX[column]]
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(EXPORT_COLUMNS)
+    
+    def __len__(self) -> int:
+        return len(EXPORT_COLUMNS)
+    
+    def __contains__(self, column: object) -> bool:
+        return column in COLUMN_INDEX
+    
+    def get(self, column: str, default: Any = None) -> Any:
+        index = COLUMN_INDEX.get(column)
+        return default if index is None else self.cells[index]
+    
+    def __repr__(self) -> str:
+        return f"ExportRow({dict(zip(EXPORT_COLUMNS, self.cells))!r})"
+
+# Blank row written after each suite; rows are never modified, so every suite shares it
+SEPARATOR_ROW = ExportRow.make('Separator')
+
+def intern_value(value: Any) -> Any:
+    """Intern strings repeated across many rows, such as IDs, paths and names, so rows share one copy"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+def row_cells(row: Mapping[str, str], columns: List[str] = EXPORT_COLUMNS) -> Tuple[str, ...]:
+    """Column values of an export row in columns order, for ExportRows and plain dicts alike.
+    
+    ExportRows without values for the extra field columns after EXPORT_COLUMNS are padded with blanks.
+    """
+    if isinstance(row, ExportRow):
+        cells = row.cells
+        return cells if len(cells) >= len(columns) else cells + ('',) * (len(columns) - len(cells))
+    return tuple(row.get(column, '') for column in columns)
+
+def format_field_value(value: Any) -> str:
+    """Export cell text of a work item field value; identities are shown by display name"""
+    if value is None:
+        return ''
+    if isinstance(value, dict):
+        return value.get('displayName') or value.get('uniqueName') or json.dumps(value, sort_keys=True)
+    return value if isinstance(value, str) else str(value)
+
+def decode_json(content: bytes) -> Any:
+    """Decode a JSON response body, with orjson when it is installed"""
+    return orjson.loads(content) if orjson else json.loads(content)
+
+def is_large_response(headers: Mapping[str, str], min_bytes: int = STREAM_DECODE_MIN_BYTES) -> bool:
+    """Whether a response body should be decoded as it downloads: its Content-Length is known to be at least
+    min_bytes, and min_bytes is not 0, which disables stream decoding"""
+    content_length = headers.get('Content-Length')
+    return bool(min_bytes) and bool(content_length) and content_length.isdigit() and int(content_length) >= min_bytes
+
+class JsonStreamDecoder:
+    """Incremental decoder of a JSON response body, fed in chunks as it downloads.
+    
+    The elements of arrays directly in the top-level object, such as the 'value' array of list responses, are
+    decoded one at a time as they arrive, so only the undecoded tail of the body is held rather than all of it.
+    Other values are decoded whole once complete, as are bodies that are not JSON objects.
+    """
+    
+    # JSON whitespace only; \S would also skip Unicode spaces, which json.loads rejects
+    _NON_WHITESPACE = re.compile(r'[^ \t\n\r]')
+    
+    def __init__(self):
+        self.result: Any = None
+        self._text = codecs.getincrementaldecoder('utf-8-sig')()
+        self._scan = json.JSONDecoder().raw_decode
+        self._buffer = ''
+        self._pos = 0
+        self._state = 'start'
+        self._key: Optional[str] = None
+        # Undecoded length needed before an incomplete value is scanned again; doubling it keeps a value split
+        # over many chunks from being rescanned for each one
+        self._retry_length = 0
+    
+    def feed(self, chunk: bytes):
+        self._buffer = self._buffer[self._pos:] + self._text.decode(chunk)
+        self._pos = 0
+        self._advance(final=False)
+    
+    def finish(self) -> Any:
+        """Decode the rest of the body, returning the decoded document"""
+        self._buffer = self._buffer[self._pos:] + self._text.decode(b'', final=True)
+        self._pos = 0
+        self._advance(final=True)
+        if self._state != 'done':
+            raise json.JSONDecodeError("Unexpected end of document", self._buffer, self._pos)
+        return self.result
+    
+    def _value(self, final: bool) -> Tuple[bool, Any]:
+        """Decode the value at the current position, returning (False, None) until it is complete"""
+        pending = len(self._buffer) - self._pos
+        if not final and pending < self._retry_length:
+            return False, None
+        try:
+            value, end = self._scan(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            self._retry_length = 2 * pending
+            return False, None
+        if not final and self._buffer[self._pos] in '-0123456789' and (
+                end == len(self._buffer) or self._buffer[end] not in ',]} \t\r\n'):
+            # A number may continue in the next chunk, as with '-1.' before '5'
+            self._retry_length = pending + 1
+            return False, None
+        self._pos = end
+        self._retry_length = 0
+        return True, value
+    
+    def _expect(self, char: str, expected: str):
+        if char not in expected:
+            raise json.JSONDecodeError(f"Expecting one of {expected!r}", self._buffer, self._pos)
+        self._pos += 1
+    
+    def _advance(self, final: bool):
+        while True:
+            match = self._NON_WHITESPACE.search(self._buffer, self._pos)
+            if not match:
+                self._pos = len(self._buffer)
+                return
+            self._pos = match.start()
+            char = self._buffer[self._pos]
+            state = self._state
+            
+            if state == 'done':
+                raise json.JSONDecodeError("Extra data", self._buffer, self._pos)
+            elif state == 'start' and char != '{':
+                complete, self.result = self._value(final)
+                if not complete:
+                    return
+                self._state = 'done'
+            elif state == 'start':
+                self._pos += 1
+                self.result = {}
+                self._state = 'first_key'
+            elif state == 'first_key' and char == '}':
+                self._pos += 1
+                self._state = 'done'
+            elif state in ('key', 'first_key'):
+                complete, key = self._value(final)
+                if not complete:
+                    return
+                if not isinstance(key, str):
+                    raise json.JSONDecodeError("Expecting property name", self._buffer, self._pos)
+                self._key = key
+                self._state = 'colon'
+            elif state == 'colon':
+                self._expect(char, ':')
+                self._state = 'value'
+            elif state == 'value' and char == '[':
+                self._pos += 1
+                self.result[self._key] = []
+                self._state = 'first_item'
+            elif state == 'value':
+                complete, value = self._value(final)
+                if not complete:
+                    return
+                self.result[self._key] = value
+                self._state = 'object_comma'
+            elif state == 'first_item' and char == ']':
+                self._pos += 1
+                self._state = 'object_comma'
+            elif state in ('item', 'first_item'):
+                complete, value = self._value(final)
+                if not complete:
+                    return
+                self.result[self._key].append(value)
+                self._state = 'array_comma'
+            elif state == 'array_comma':
+                self._expect(char, ',]')
+                self._state = 'item' if char == ',' else 'object_comma'
+            else:
+                self._expect(char, ',}')
+                self._state = 'key' if char == ',' else 'done'
+
+def format_utc(value: datetime) -> str:
+    """Format a datetime as an ISO 8601 UTC timestamp as used by Azure DevOps"""
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+class AuthenticationError(Exception):
+    """Azure DevOps rejected the PAT, e.g. because it expired; every later request would fail the same way"""
+
+# Response to a PAT that is invalid or expired; a 403 only denies the one resource and is a failed request
+AUTH_FAILURE_STATUS_CODE = 401
 
 class AzureTestPlanExporter:
-    def __init__(self, organization: str, project: str, pat: str, debug: bool = False):
+    def __init__(self, organization: str, project: str, pat: str, debug: bool = False, workers: int = 1,
+                 engine: str = 'threads', work_item_cache: Optional['WorkItemCache'] = None,
+                 execution_source: str = 'all', runs_since: Optional[datetime] = None,
+                 suite_id: Optional[str] = None, suite_path: Optional[str] = None, plan_workers: int = 1,
+                 max_retries: int = MAX_RETRIES, parse_workers: int = 0,
+                 extra_fields: Optional[List[Tuple[str, str]]] = None,
+                 stream_decode_min_bytes: int = STREAM_DECODE_MIN_BYTES):
         self.organization = organization
         self.project = project
         self.pat = pat
+        self.workers = max(1, workers)
+        self.plan_workers = max(1, plan_workers)
+        self.max_retries = max(0, max_retries)
+        self.stream_decode_min_bytes = max(0, stream_decode_min_bytes)
+        self.engine = engine
+        self.work_item_cache = work_item_cache
+        
+        # Where execution status comes from: 'all' runs, 'runs-since' runs_since, or test 'points' only
+        self.execution_source = execution_source
+        self.runs_since = runs_since
+        
+        # Restrict the export to the subtree under a suite, selected by ID or by ' > ' separated path
+        self.suite_id = str(suite_id) if suite_id else None
+        self.suite_path = suite_path
+        
+        # Extra (column name, work item field) pairs exported after EXPORT_COLUMNS on test case rows, and the
+        # fields requested for work items, derived from the columns instead of downloading everything
+        self.extra_fields = list(extra_fields or [])
+        self.export_columns = EXPORT_COLUMNS + [column for column, _ in self.extra_fields]
+        self.work_item_fields = list(dict.fromkeys(
+            WORK_ITEM_BASE_FIELDS + [field for column in EXPORT_COLUMNS for field in COLUMN_FIELDS.get(column, [])]
+            + [field for _, field in self.extra_fields]))
+        
+        # Test result indexes by plan ID, built on first use; persisted under test_result_index_dir when set
+        self.test_result_index_dir: Optional[str] = None
+        self._test_result_indexes: Dict[str, 'TestResultIndex'] = {}
+        self._test_result_index_lock = threading.RLock()
+        
+        # Name and raw suite list of every plan extracted, shared by forks, for outputs that store the suite tree
+        self._exported_plans: Dict[str, Tuple[str, List[Dict[Any, Any]]]] = {}
+        
+        # Set for incremental exports; work items outside the changed set are served from the cache as-is
+        self.incremental_state: Optional['IncrementalExportState'] = None
+        self._changed_work_item_ids: Optional[Set[str]] = None
+        
+        # Set for checkpointed exports; suites journaled by an interrupted export are replayed, not fetched
+        self.checkpoint: Optional['ExportCheckpoint'] = None
+        
+        # Shared steps work items by ID ({} for ones that could not be retrieved), and their
+        # flattened step sequences keyed by (work item ID, revision), reused for the exporter's lifetime
+        self._shared_steps_work_items: Dict[str, Dict[Any, Any]] = {}
+        self._shared_steps_cache: Dict[Tuple[str, Any], List[Dict[str, str]]] = {}
+        # Parsed steps of the prefetched shared steps work items, parsed in the same batch as they were fetched
+        self._shared_steps_parsed: Dict[str, List[Dict[str, str]]] = {}
+        self._shared_steps_lock = threading.Lock()
+        
+        # Suite list last passed to build_suite_hierarchy, its length and the tree built from it
+        self._suite_hierarchy_tree: Optional[Tuple[List[Dict[Any, Any]], int, 'SuiteTree']] = None
+        
+        # Parsed steps by hash of their XML, least recently used first; identical steps are common across cases
+        self._parsed_steps_cache: 'OrderedDict[bytes, List[Dict[str, str]]]' = OrderedDict()
+        self._parsed_steps_lock = threading.Lock()
+        
+        # Optional process pool parsing batches of test steps XML on every core. Workers are spawned rather
+        # than forked, as forking a process with live HTTP and worker threads is unsafe.
+        self.parse_workers = max(0, parse_workers)
+        self._parse_pool = (ProcessPoolExecutor(max_workers=self.parse_workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+                            if self.parse_workers else None)
         self.base_url = f"https://dev.azure.com/{organization}/{project}/_apis"
         
         # Set up logging
@@ -28,11 +480,30 @@ class AzureTestPlanExporter:
         encoded_credentials = base64.b64encode(credentials.encode()).decode()
         self.headers = {
             'Authorization': f'Basic {encoded_credentials}',
-            'Content-Type': 'application/json'
+            'Content-Type': 'application/json',
+            'Accept-Encoding': ACCEPT_ENCODING
         }
         
+        # Shared keep-alive session, with a connection pool large enough for every worker of every plan
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        pool_size = self.workers * self.plan_workers
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # Retries, Retry-After pauses and the adaptive concurrency limit, shared by every request of every plan
+        self.throttle = RequestThrottle(pool_size, self.logger)
+        
+        # Request, phase and cache metrics, shared by every plan and worker
+        self.metrics = ExportMetrics()
+        
+        # Set by --profile; debug-only payload dumps are skipped while profiling so they do not skew it
+        self.profiler: Optional['ExportProfiler'] = None
+        
         self.logger.info(f"Initialized AzureTestPlanExporter for organization: {organization}, project: {project}")
         self.logger.debug(f"Base URL: {self.base_url}")
+        self.logger.debug(f"Fetch engine: {self.engine}, worker pool size: {self.workers}")
         
     def setup_logging(self):
         """Set up logging configuration"""
@@ -71,48 +542,241 @@ class AzureTestPlanExporter:
         
     def make_request(self, url: str) -> Dict[Any, Any]:
         """Make authenticated request to Azure DevOps API"""
+        return self._request(url)[0]
+    
+    def post_request(self, url: str, payload: Dict[str, Any]) -> Dict[Any, Any]:
+        """Make authenticated POST request with a JSON body to Azure DevOps API"""
+        return self._request(url, payload)[0]
+    
+    def _request(self, url: str, payload: Optional[Dict[str, Any]] = None) -> Tuple[Dict[Any, Any], Dict[str, str]]:
+        """Make authenticated request to Azure DevOps API, returning the JSON body and response headers.
+        
+        Throttled and transient failures are retried with backoff, honouring Retry-After. Large bodies are
+        decoded as they download.
+        """
         self.logger.debug(f"Making request to: {url}")
         
-        try:
-            response = requests.get(url, headers=self.headers)
-            self.logger.debug(f"Response status code: {response.status_code}")
-            
-            if self.debug:
-                self.logger.debug(f"Response headers: {dict(response.headers)}")
-            
-            response.raise_for_status()
-            
-            json_response = response.json()
-            self.logger.debug(f"Response received. Data keys: {list(json_response.keys()) if isinstance(json_response, dict) else 'Non-dict response'}")
-            
-            if self.debug and isinstance(json_response, dict):
-                # Log response size info
-                if 'value' in json_response and isinstance(json_response['value'], list):
-                    self.logger.debug(f"Response contains {len(json_response['value'])} items in 'value' array")
+        attempt = 0
+        while True:
+            streamed = False
+            try:
+                with self.throttle:
+                    request_started = time.perf_counter()
+                    if payload is None:
+                        response = self.session.get(url, stream=True)
+                    else:
+                        response = self.session.post(url, json=payload, stream=True)
+                    streamed = response.status_code == 200 and is_large_response(response.headers,
+                                                                                   self.stream_decode_min_bytes)
+                    if streamed:
+                        decoder = JsonStreamDecoder()
+                        for chunk in response.iter_content(STREAM_DECODE_CHUNK_SIZE):
+                            decoder.feed(chunk)
+                        json_response = decoder.finish()
+                    else:
+                        response.content  # Read the whole body while holding the request slot
+                # Bytes on the wire, which are compressed when the server supports it
+                self.metrics.record_request(url, time.perf_counter() - request_started, response.raw.tell(),
+                                            response.status_code)
+                self.logger.debug(f"Response status code: {response.status_code}")
+                
+                if self.debug:
+                    self.logger.debug(f"Response headers: {dict(response.headers)}")
+                
+                self.throttle.record(response.status_code, response.headers)
+                if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                    delay = self.throttle.retry_delay(attempt, response.headers)
+                    self.logger.warning(f"HTTP {response.status_code} for {url}, retrying in {delay:.1f}s "
+                                        f"(attempt {attempt + 1} of {self.max_retries})")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                
+                response.raise_for_status()
+                
+                if not streamed:
+                    json_response = decode_json(response.content)
+                self.logger.debug(f"Response received. Data keys: {list(json_response.keys()) if isinstance(json_response, dict) else 'Non-dict response'}")
+                
+                if self.debug and not self.profiler and isinstance(json_response, dict):
+                    # Log response size info
+                    if 'value' in json_response and isinstance(json_response['value'], list):
+                        self.logger.debug(f"Response contains {len(json_response['value'])} items in 'value' array")
+                    
+                    # Log first few characters of response for debugging (truncated)
+                    response_str = json.dumps(json_response)[:500]
+                    self.logger.debug(f"Response preview: {response_str}...")
+                
+                return json_response, response.headers
                 
-                # Log first few characters of response for debugging (truncated)
-                response_str = json.dumps(json_response)[:500]
-                self.logger.debug(f"Response preview: {response_str}...")
-            
-            return json_response
-            
-        except requests.exceptions.HTTPError as e:
-            self.logger.error(f"HTTP error for {url}: {e}")
-            self.logger.error(f"Response status: {response.status_code}")
-            self.logger.error(f"Response text: {response.text[:1000]}")
-            return {}
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Request error for {url}: {e}")
-            return {}
-        except json.JSONDecodeError as e:
-            self.logger.error(f"JSON decode error for {url}: {e}")
-            self.logger.error(f"Response text: {response.text[:1000]}")
-            return {}
+            except requests.exceptions.HTTPError as e:
+                self.logger.error(f"HTTP error for {url}: {e}")
+                self.logger.error(f"Response status: {response.status_code}")
+                self.logger.error(f"Response text: {response.text[:1000]}")
+                # Missing work items are expected; anything else leaves the export incomplete
+                if response.status_code != 404:
+                    self.throttle.record_failure()
+                if response.status_code == AUTH_FAILURE_STATUS_CODE:
+                    raise AuthenticationError(f"HTTP {response.status_code} for {url}, the PAT is invalid "
+                                              f"or has expired") from e
+                return {}, {}
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError) as e:
+                # Includes bodies cut off or corrupted mid-transfer
+                self.metrics.record_request(url, time.perf_counter() - request_started, 0, None)
+                if attempt < self.max_retries:
+                    delay = self.throttle.retry_delay(attempt)
+                    self.logger.warning(f"Request error for {url}: {e}, retrying in {delay:.1f}s "
+                                        f"(attempt {attempt + 1} of {self.max_retries})")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                self.logger.error(f"Request error for {url}: {e}")
+                self.throttle.record_failure()
+                return {}, {}
+            except requests.exceptions.RequestException as e:
+                self.logger.error(f"Request error for {url}: {e}")
+                self.throttle.record_failure()
+                return {}, {}
+            except json.JSONDecodeError as e:
+                self.logger.error(f"JSON decode error for {url}: {e}")
+                if not streamed:
+                    self.logger.error(f"Response text: {response.text[:1000]}")
+                self.throttle.record_failure()
+                return {}, {}
+    
+    def _page_url(self, url: str, page_size: Optional[int], skip: int, continuation_token: Optional[str]) -> str:
+        """Add paging parameters to a list endpoint URL"""
+        if continuation_token:
+            return f"{url}&continuationToken={quote(continuation_token, safe='')}"
+        if page_size:
+            return f"{url}&$top={page_size}&$skip={skip}"
+        return url
+    
+    def _next_page(self, url: str, page_size: Optional[int], skip: int, page_len: int, headers: Dict[str, str],
+                   seen_tokens: Set[str]) -> Tuple[Optional[int], Optional[str]]:
+        """Work out where the next page starts, returning (skip, continuation token) or (None, None) when done.
+        
+        Stops at a continuation token already followed, which would otherwise page forever.
+        """
+        continuation_token = headers.get(CONTINUATION_TOKEN_HEADER) if headers else None
+        if continuation_token in seen_tokens:
+            self.logger.warning(f"Stopped paging {url}: the server repeated continuation token {continuation_token}")
+            return None, None
+        if continuation_token:
+            seen_tokens.add(continuation_token)
+            return skip, continuation_token
+        if page_size and page_len >= page_size:
+            return skip + page_len, None
+        return None, None
+    
+    def _repeats_previous_page(self, url: str, page: List[Dict[Any, Any]],
+                               previous_page: Optional[List[Dict[Any, Any]]]) -> bool:
+        """Whether a page repeats the previous one, as from a server ignoring $skip, which would page forever"""
+        if page and page == previous_page:
+            self.logger.warning(f"Stopped paging {url}: a page repeated the previous one")
+            return True
+        return False
+    
+    def iter_pages(self, url: str, page_size: Optional[int] = None) -> Iterator[List[Dict[Any, Any]]]:
+        """Lazily yield each page of a list endpoint, following continuation tokens or $top/$skip paging"""
+        skip = 0
+        continuation_token = None
+        seen_tokens: Set[str] = set()
+        previous_page = None
+        page_number = 0
+        
+        while skip is not None:
+            response, headers = self._request(self._page_url(url, page_size, skip, continuation_token))
+            page = response.get('value', []) or []
+            if self._repeats_previous_page(url, page, previous_page):
+                return
+            page_number += 1
+            if page_number > 1:
+                self.logger.debug(f"Fetched page {page_number} with {len(page)} items from {url}")
+            
+            yield page
+            previous_page = page
+            skip, continuation_token = self._next_page(url, page_size, skip, len(page), headers, seen_tokens)
+    
+    def iter_items(self, url: str, page_size: Optional[int] = None) -> Iterator[Dict[Any, Any]]:
+        """Lazily yield the items of a list endpoint across all of its pages"""
+        for page in self.iter_pages(url, page_size):
+            yield from page
+    
+    def _parallel_map(self, func: Callable[[Any], Any], items: Iterable[Any]) -> Iterator[Any]:
+        """Apply func to each item on the worker pool, yielding results in input order"""
+        if self.workers <= 1:
+            for item in items:
+                yield func(item)
+            return
+        
+        if self.profiler:
+            func = functools.partial(self.profiler.run, func)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='exporter') as executor:
+            pending = deque()
+            for item in items:
+                pending.append(executor.submit(func, item))
+                # Bound the number of in-flight results so large inputs are not all buffered at once
+                if len(pending) >= self.workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    
+    def _test_plans_url(self) -> str:
+        return f"{self.base_url}/testplan/plans?api-version=7.1-preview.1"
+    
+    def _test_plan_url(self, plan_id: str) -> str:
+        return f"{self.base_url}/testplan/plans/{plan_id}?api-version=7.1-preview.1"
+    
+    def _test_suites_url(self, plan_id: str) -> str:
+        return f"{self.base_url}/testplan/Plans/{plan_id}/suites?api-version=7.1-preview.1"
+    
+    def _test_cases_url(self, plan_id: str, suite_id: str) -> str:
+        return f"{self.base_url}/testplan/Plans/{plan_id}/Suites/{suite_id}/TestCase?api-version=7.1-preview.3"
+    
+    def _test_points_url(self, plan_id: str, suite_id: str) -> str:
+        return f"{self.base_url}/testplan/Plans/{plan_id}/Suites/{suite_id}/TestPoint?includePointDetails=true&api-version=7.1-preview.2"
+    
+    def _test_runs_url(self, plan_id: str) -> str:
+        return f"{self.base_url}/test/runs?planId={plan_id}&api-version=7.1-preview.3"
+    
+    def _test_results_url(self, run_id: str) -> str:
+        return f"{self.base_url}/test/Runs/{run_id}/results?api-version=7.1-preview.6"
+    
+    def _test_runs_query_url(self, plan_id: str, min_date: datetime, max_date: datetime) -> str:
+        return (f"{self.base_url}/test/runs?planIds={plan_id}&minLastUpdatedDate={quote(format_utc(min_date))}"
+                f"&maxLastUpdatedDate={quote(format_utc(max_date))}&api-version=7.1")
+    
+    def _test_runs_query_urls(self, plan_id: str, since: datetime, until: datetime) -> List[str]:
+        """Runs query URLs covering a date range, split into windows the API accepts"""
+        urls = []
+        window_start = since
+        while window_start < until:
+            window_end = min(window_start + timedelta(days=TEST_RUNS_QUERY_MAX_DAYS), until)
+            urls.append(self._test_runs_query_url(plan_id, window_start, window_end))
+            window_start = window_end
+        return urls
+    
+    def _wiql_url(self) -> str:
+        return f"{self.base_url}/wit/wiql?timePrecision=true&api-version=7.1"
+    
+    def _work_item_revisions_url(self, work_item_ids: List[str]) -> str:
+        return f"{self.base_url}/wit/workitems?ids={','.join(work_item_ids)}&fields=System.Rev&errorPolicy=omit&api-version=7.1"
+    
+    def _work_items_batch_url(self, work_item_ids: List[str]) -> str:
+        # errorPolicy=omit returns null for missing or deleted IDs instead of failing the whole batch
+        return (f"{self.base_url}/wit/workitems?ids={','.join(work_item_ids)}&fields={','.join(self.work_item_fields)}"
+                f"&errorPolicy=omit&api-version=7.1")
+    
+    def _work_item_url(self, work_item_id: str) -> str:
+        # Only the exported fields; $expand=all would also return every other field, relations and links
+        return f"{self.base_url}/wit/workitems/{work_item_id}?fields={','.join(self.work_item_fields)}&api-version=7.1"
     
     def get_test_plan(self, plan_id: str) -> Dict[Any, Any]:
         """Get test plan details"""
         self.logger.info(f"Fetching test plan details for ID: {plan_id}")
-        url = f"{self.base_url}/testplan/plans/{plan_id}?api-version=7.1-preview.1"
+        url = self._test_plan_url(plan_id)
         
         result = self.make_request(url)
         if result:
@@ -123,13 +787,56 @@ class AzureTestPlanExporter:
             
         return result
     
+    def get_test_plans(self) -> List[Dict[Any, Any]]:
+        """Get all test plans of the project"""
+        self.logger.info(f"Fetching test plans for project: {self.project}")
+        test_plans = list(self.iter_items(self._test_plans_url()))
+        self.logger.info(f"Found {len(test_plans)} test plans")
+        return test_plans
+    
+    def _fields_url(self) -> str:
+        return f"{self.base_url}/wit/fields?api-version=7.1"
+    
+    def unknown_extra_fields(self) -> List[str]:
+        """Extra field reference names that are not work item fields of the project.
+        
+        Azure DevOps fails a whole fields= request over one unknown field, so a mistyped extra field would fail
+        every work item request. Returns [] when the fields cannot be listed.
+        """
+        if not self.extra_fields:
+            return []
+        fields = self.make_request(self._fields_url()).get('value')
+        if not fields:
+            self.logger.warning("Could not list the work item fields to check the extra fields against")
+            return []
+        # Field reference names are case-insensitive
+        known_fields = {field.get('referenceName', '').casefold() for field in fields}
+        return [field for _, field in self.extra_fields if field.casefold() not in known_fields]
+    
+    def fork(self) -> 'AzureTestPlanExporter':
+        """Exporter for extracting another plan concurrently, sharing this one's session, caches and settings"""
+        forked = copy.copy(self)
+        forked.incremental_state = None
+        forked.checkpoint = None
+        forked._changed_work_item_ids = None
+        return forked
+    
+    def _phase_boundary(self, label: str):
+        """Mark the end of an extraction phase for the --profile memory report"""
+        if self.profiler:
+            self.profiler.boundary(label)
+    
+    def close(self):
+        """Shut down the parse worker processes, if any"""
+        if self._parse_pool:
+            self._parse_pool.shutdown()
+    
     def get_test_suites(self, plan_id: str) -> List[Dict[Any, Any]]:
         """Get all test suites for a plan"""
         self.logger.info(f"Fetching test suites for plan ID: {plan_id}")
-        url = f"{self.base_url}/testplan/Plans/{plan_id}/suites?api-version=7.1-preview.1"
+        url = self._test_suites_url(plan_id)
         
-        response = self.make_request(url)
-        suites = response.get('value', [])
+        suites = list(self.iter_items(url))
         
         self.logger.info(f"Found {len(suites)} test suites")
         if self.debug and suites:
@@ -142,10 +849,9 @@ class AzureTestPlanExporter:
     def get_test_cases_for_suite(self, plan_id: str, suite_id: str) -> List[Dict[Any, Any]]:
         """Get test cases for a specific suite"""
         self.logger.debug(f"Fetching test cases for suite ID: {suite_id}")
-        url = f"{self.base_url}/testplan/Plans/{plan_id}/Suites/{suite_id}/TestCase?api-version=7.1-preview.3"
+        url = self._test_cases_url(plan_id, suite_id)
         
-        response = self.make_request(url)
-        test_cases = response.get('value', [])
+        test_cases = list(self.iter_items(url))
         
         self.logger.debug(f"Found {len(test_cases)} test cases in suite {suite_id}")
         if self.debug and test_cases:
@@ -159,9 +865,11 @@ class AzureTestPlanExporter:
     def get_test_case_details(self, test_case_id: str) -> Dict[Any, Any]:
         """Get detailed test case information including test steps"""
         self.logger.debug(f"Fetching details for test case ID: {test_case_id}")
-        url = f"{self.base_url}/wit/workitems/{test_case_id}?$expand=all&api-version=7.1"
         
-        result = self.make_request(url)
+        if self.work_item_cache:
+            result = self.get_work_items_batch([test_case_id]).get(test_case_id, {})
+        else:
+            result = self.make_request(self._work_item_url(test_case_id))
         if result:
             fields = result.get('fields', {})
             title = fields.get('System.Title', 'Unknown')
@@ -178,12 +886,109 @@ class AzureTestPlanExporter:
             
         return result
     
+    def get_work_items_batch(self, work_item_ids: List[str]) -> Dict[str, Dict[Any, Any]]:
+        """Get multiple work items in batches, keyed by work item ID"""
+        unique_ids = list(dict.fromkeys(str(wi_id) for wi_id in work_item_ids if wi_id))
+        self.logger.debug(f"Fetching {len(unique_ids)} work items in batches of {WORK_ITEM_BATCH_SIZE}")
+        
+        work_items = {}
+        for start in range(0, len(unique_ids), WORK_ITEM_BATCH_SIZE):
+            batch_ids = unique_ids[start:start + WORK_ITEM_BATCH_SIZE]
+            
+            if self.work_item_cache:
+                # Only download work items that changed since they were cached
+                if self._changed_work_item_ids is not None:
+                    cached, batch_ids = self._lookup_unchanged_work_items(batch_ids)
+                else:
+                    revisions_response = self.make_request(self._work_item_revisions_url(batch_ids))
+                    cached, batch_ids = self._lookup_cached_work_items(batch_ids, revisions_response)
+                work_items.update(cached)
+                if not batch_ids:
+                    continue
+            
+            fetched = self._work_items_from_response(self.make_request(self._work_items_batch_url(batch_ids)))
+            if self.work_item_cache:
+                self.work_item_cache.put_many(fetched.values())
+            work_items.update(fetched)
+        
+        self.logger.debug(f"Retrieved {len(work_items)} of {len(unique_ids)} requested work items")
+        return work_items
+    
+    def _work_items_from_response(self, response: Dict[Any, Any]) -> Dict[str, Dict[Any, Any]]:
+        """Get the work items of a batch response keyed by work item ID, skipping omitted (null) entries"""
+        return {str(work_item.get('id', '')): work_item for work_item in response.get('value', []) or [] if work_item}
+    
+    def _lookup_cached_work_items(self, work_item_ids: List[str],
+                                  revisions_response: Dict[Any, Any]) -> Tuple[Dict[str, Dict[Any, Any]], List[str]]:
+        """Split work items into cached payloads matching their current revision and IDs that must be fetched"""
+        if not revisions_response:
+            # Revision lookup failed, fetch everything rather than dropping work items
+            return {}, work_item_ids
+        
+        revisions = {wi_id: work_item.get('rev')
+                     for wi_id, work_item in self._work_items_from_response(revisions_response).items()}
+        cached = self.work_item_cache.get_many(revisions)
+        stale_ids = [wi_id for wi_id in revisions if wi_id not in cached]
+        self.metrics.record_cache('work_item_cache', len(cached), len(stale_ids))
+        self.logger.debug(f"Work item cache: {len(cached)} current, {len(stale_ids)} stale or missing")
+        return cached, stale_ids
+    
+    def _lookup_unchanged_work_items(self, work_item_ids: List[str]) -> Tuple[Dict[str, Dict[Any, Any]], List[str]]:
+        """Split work items into cached payloads known to be unchanged since the last export and IDs that must be fetched"""
+        unchanged = {wi_id: None for wi_id in work_item_ids if wi_id not in self._changed_work_item_ids}
+        cached = self.work_item_cache.get_many(unchanged)
+        missing_ids = [wi_id for wi_id in work_item_ids if wi_id not in cached]
+        self.metrics.record_cache('work_item_cache', len(cached), len(missing_ids))
+        return cached, missing_ids
+    
+    def get_changed_work_item_ids(self, since: datetime) -> Optional[Set[str]]:
+        """Get the IDs of test cases and shared steps changed since the given time, or None if that is unknown"""
+        self.logger.info(f"Querying test cases and shared steps changed since {format_utc(since)}")
+        query = ("SELECT [System.Id] FROM WorkItems WHERE [System.TeamProject] = @project "
+                 "AND [System.WorkItemType] IN ('Test Case', 'Shared Steps') "
+                 f"AND [System.ChangedDate] >= '{format_utc(since)}'")
+        
+        response = self.post_request(self._wiql_url(), {'query': query})
+        if 'workItems' not in response:
+            self.logger.warning("Could not query changed work items, validating cached work items by revision instead")
+            return None
+        
+        changed_ids = {str(work_item.get('id')) for work_item in response['workItems']}
+        if len(changed_ids) >= WIQL_MAX_RESULTS:
+            self.logger.warning("Too many changed work items for one query, validating cached work items by revision instead")
+            return None
+        
+        self.logger.info(f"Found {len(changed_ids)} changed test cases and shared steps")
+        return changed_ids
+    
+    def get_test_case_details_batch(self, test_case_ids: List[str]) -> Dict[str, Dict[Any, Any]]:
+        """Get detailed information for multiple test cases, keyed by test case ID"""
+        self.logger.debug(f"Fetching details for {len(test_case_ids)} test cases")
+        details = self.get_work_items_batch(test_case_ids)
+        
+        for test_case_id in test_case_ids:
+            if test_case_id not in details:
+                self.logger.warning(f"Failed to retrieve details for test case {test_case_id}")
+            elif self.debug:
+                fields = details[test_case_id].get('fields', {})
+                self.logger.debug(f"Retrieved test case '{fields.get('System.Title', 'Unknown')}' with {len(fields)} fields")
+        
+        return details
+    
     def get_shared_steps_details(self, shared_steps_id: str) -> Dict[Any, Any]:
         """Get shared steps details"""
         self.logger.debug(f"Fetching shared steps details for ID: {shared_steps_id}")
-        url = f"{self.base_url}/wit/workitems/{shared_steps_id}?$expand=all&api-version=7.1"
         
-        result = self.make_request(url)
+        with self._shared_steps_lock:
+            result = self._shared_steps_work_items.get(shared_steps_id)
+        self.metrics.record_cache('shared_steps', int(result is not None), int(result is None))
+        if result is None:
+            if self.work_item_cache:
+                result = self.get_work_items_batch([shared_steps_id]).get(shared_steps_id, {})
+            else:
+                result = self.make_request(self._work_item_url(shared_steps_id))
+            with self._shared_steps_lock:
+                self._shared_steps_work_items[shared_steps_id] = result
         if result:
             fields = result.get('fields', {})
             title = fields.get('System.Title', 'Unknown')
@@ -196,10 +1001,9 @@ class AzureTestPlanExporter:
     def get_test_points(self, plan_id: str, suite_id: str) -> List[Dict[Any, Any]]:
         """Get test points (execution status) for a suite"""
         self.logger.debug(f"Fetching test points for suite ID: {suite_id}")
-        url = f"{self.base_url}/testplan/Plans/{plan_id}/Suites/{suite_id}/TestPoint?includePointDetails=true&api-version=7.1-preview.2"
+        url = self._test_points_url(plan_id, suite_id)
         
-        response = self.make_request(url)
-        test_points = response.get('value', [])
+        test_points = list(self.iter_items(url))
         
         self.logger.debug(f"Found {len(test_points)} test points in suite {suite_id}")
         if self.debug and test_points:
@@ -215,10 +1019,9 @@ class AzureTestPlanExporter:
     def get_test_runs_for_plan(self, plan_id: str) -> List[Dict[Any, Any]]:
         """Get test runs for a specific test plan"""
         self.logger.info(f"Fetching test runs for plan ID: {plan_id}")
-        url = f"{self.base_url}/test/runs?planId={plan_id}&api-version=7.1-preview.3"
+        url = self._test_runs_url(plan_id)
         
-        response = self.make_request(url)
-        test_runs = response.get('value', [])
+        test_runs = list(self.iter_items(url, TEST_RUNS_PAGE_SIZE))
         
         self.logger.info(f"Found {len(test_runs)} test runs")
         if self.debug and test_runs:
@@ -230,13 +1033,27 @@ class AzureTestPlanExporter:
         
         return test_runs
     
+    def get_test_runs_updated_since(self, plan_id: str, since: datetime) -> List[Dict[Any, Any]]:
+        """Get test runs of a plan updated between the given time and now"""
+        self.logger.info(f"Fetching test runs for plan ID: {plan_id} updated since {format_utc(since)}")
+        
+        test_runs = {}
+        for url in self._test_runs_query_urls(plan_id, since, datetime.now(timezone.utc)):
+            for run in self.iter_items(url):
+                # Adjacent windows share their boundary, so a run can be listed twice
+                test_runs[str(run.get('id', ''))] = run
+        
+        self.logger.info(f"Found {len(test_runs)} updated test runs")
+        return list(test_runs.values())
+    
+    def iter_test_results_for_run(self, run_id: str) -> Iterator[Dict[Any, Any]]:
+        """Lazily yield test results for a specific test run, one page at a time"""
+        return self.iter_items(self._test_results_url(run_id), TEST_RESULTS_PAGE_SIZE)
+    
     def get_test_results_for_run(self, run_id: str) -> List[Dict[Any, Any]]:
         """Get test results for a specific test run"""
         self.logger.debug(f"Fetching test results for run ID: {run_id}")
-        url = f"{self.base_url}/test/Runs/{run_id}/results?api-version=7.1-preview.6"
-        
-        response = self.make_request(url)
-        results = response.get('value', [])
+        results = list(self.iter_test_results_for_run(run_id))
         
         self.logger.debug(f"Found {len(results)} test results in run {run_id}")
         if self.debug and results:
@@ -248,94 +1065,170 @@ class AzureTestPlanExporter:
         
         return results
     
+    def get_test_result_index(self, plan_id: str) -> 'TestResultIndex':
+        """Get the test result index of a plan, building it from every run of the plan on first use"""
+        with self._test_result_index_lock:
+            index = self._test_result_indexes.get(plan_id)
+            if index is None:
+                index = TestResultIndex(plan_id, self.test_result_index_dir, self.logger)
+                self._test_result_indexes[plan_id] = index
+                if index.watermark:
+                    self._refresh_test_result_index(index)
+                else:
+                    self._index_test_runs(index, self.get_test_runs_for_plan(plan_id), datetime.now(timezone.utc))
+            return index
+    
+    def refresh_test_result_index(self, plan_id: str) -> 'TestResultIndex':
+        """Bring the test result index of a plan up to date by re-reading the runs updated since it was built"""
+        with self._test_result_index_lock:
+            index = self._test_result_indexes.get(plan_id)
+            if index is None or not index.watermark:
+                return self.get_test_result_index(plan_id)
+            self._refresh_test_result_index(index)
+            return index
+    
+    def invalidate_test_result_index(self, plan_id: Optional[str] = None):
+        """Discard the test result index of a plan, or of every plan, including persisted copies"""
+        with self._test_result_index_lock:
+            plan_ids = [plan_id] if plan_id is not None else list(self._test_result_indexes)
+            for invalidated_id in plan_ids:
+                index = self._test_result_indexes.pop(invalidated_id, None)
+                if index is None and self.test_result_index_dir:
+                    index = TestResultIndex(invalidated_id, self.test_result_index_dir, self.logger)
+                if index is not None:
+                    index.delete()
+                    self.logger.info(f"Invalidated test result index for plan ID: {invalidated_id}")
+    
+    def _refresh_test_result_index(self, index: 'TestResultIndex'):
+        started = datetime.now(timezone.utc)
+        test_runs = self.get_test_runs_updated_since(index.plan_id, index.watermark - INCREMENTAL_OVERLAP)
+        self._index_test_runs(index, test_runs, started)
+    
+    def _index_test_runs(self, index: 'TestResultIndex', test_runs: List[Dict[Any, Any]], started: datetime):
+        """Read the results of the given runs into the index and record it as current as of started"""
+        run_ids = [str(run.get('id', '')) for run in test_runs if run.get('id')]
+        total_results = 0
+        for run_id, results in zip(run_ids, self._parallel_map(self.get_test_results_for_run, run_ids)):
+            total_results += index.add(run_id, results)
+        index.save(started)
+        self.logger.info(f"Indexed {total_results} test results from {len(run_ids)} test runs for plan ID: {index.plan_id}")
+    
     def get_latest_test_result_for_case(self, test_case_id: str, plan_id: str) -> Dict[Any, Any]:
         """Get the latest test result for a specific test case"""
         self.logger.debug(f"Finding latest test result for test case: {test_case_id}")
-        
-        # First, get all test runs for the plan
-        test_runs = self.get_test_runs_for_plan(plan_id)
-        
-        latest_result = None
-        latest_date = None
-        
-        for run in test_runs:
-            run_id = str(run.get('id', ''))
-            if not run_id:
-                continue
-                
-            # Get results for this run
-            results = self.get_test_results_for_run(run_id)
-            
-            for result in results:
-                # Check if this result is for our test case
-                result_test_case_id = str(result.get('testCase', {}).get('id', ''))
-                if result_test_case_id == test_case_id:
-                    completed_date = result.get('completedDate')
-                    if completed_date and (latest_date is None or completed_date > latest_date):
-                        latest_date = completed_date
-                        latest_result = result
-                        self.logger.debug(f"Found newer result for TC {test_case_id}: {completed_date}")
+        latest_result = self.get_test_result_index(plan_id).latest(test_case_id)
         
         if latest_result:
-            self.logger.debug(f"Latest result for TC {test_case_id}: outcome={latest_result.get('outcome')}, date={latest_date}")
+            self.logger.debug(f"Latest result for TC {test_case_id}: outcome={latest_result.get('outcome')}, date={latest_result.get('completedDate')}")
         else:
             self.logger.debug(f"No test results found for test case {test_case_id}")
         
         return latest_result or {}
     
+    def get_test_results_for_case(self, test_case_id: str, plan_id: str, since: Optional[datetime] = None,
+                                  until: Optional[datetime] = None) -> List[Dict[Any, Any]]:
+        """Get the results of a specific test case, oldest first, optionally only those completed within [since, until]"""
+        index = self.get_test_result_index(plan_id)
+        if since is None and until is None:
+            return index.all(test_case_id)
+        return index.between(test_case_id, since, until)
+    
     def clean_html_text(self, html_text: str) -> str:
         """Clean HTML text and convert to plain text"""
         if not html_text:
             return ""
         
-        original_length = len(html_text)
-        
-        # Remove HTML tags
-        clean_text = re.sub(r'<[^>]+>', '', html_text)
-        # Unescape HTML entities
-        clean_text = unescape(clean_text)
+        clean_text = html_text
+        # Remove HTML tags, then unescape HTML entities, skipping either when there is nothing to do
+        if '<' in clean_text:
+            clean_text = HTML_TAG_PATTERN.sub('', clean_text)
+        if '&' in clean_text:
+            clean_text = unescape(clean_text)
         # Remove extra whitespace
         clean_text = ' '.join(clean_text.split())
-        clean_text = clean_text.strip()
         
-        if self.debug and original_length > 0:
-            self.logger.debug(f"Cleaned HTML: {original_length} -> {len(clean_text)} chars")
+        if self.debug:
+            self.logger.debug(f"Cleaned HTML: {len(html_text)} -> {len(clean_text)} chars")
             if len(clean_text) > 100:
                 self.logger.debug(f"Cleaned text preview: {clean_text[:100]}...")
         
         return clean_text
     
     def parse_test_steps(self, test_steps_xml: str) -> List[Dict[str, str]]:
-        """Parse test steps XML and return list of steps with actions and expected results"""
-        if not test_steps_xml:
-            return []
+        """Parse test steps XML and return list of steps with actions and expected results.
         
+        Results are memoized by a hash of the XML; the returned list is a fresh copy, the step dicts are shared.
+        """
+        return self.parse_test_steps_many([test_steps_xml])[0]
+    
+    def parse_test_steps_many(self, test_steps_xmls: List[str]) -> List[List[Dict[str, str]]]:
+        """Parse a batch of test steps XML documents, in order, on the parse workers when there are any"""
+        parsed: List[Optional[List[Dict[str, str]]]] = [None] * len(test_steps_xmls)
+        missing: Dict[bytes, Tuple[str, List[int]]] = {}
+        hits = 0
+        
+        with self._parsed_steps_lock:
+            for position, test_steps_xml in enumerate(test_steps_xmls):
+                if not test_steps_xml:
+                    parsed[position] = []
+                    continue
+                key = hashlib.blake2b(test_steps_xml.encode('utf-8'), digest_size=16).digest()
+                steps = self._parsed_steps_cache.get(key)
+                if steps is not None:
+                    self._parsed_steps_cache.move_to_end(key)
+                    parsed[position] = list(steps)
+                    hits += 1
+                else:
+                    missing.setdefault(key, (test_steps_xml, []))[1].append(position)
+        self.metrics.record_cache('parsed_steps', hits, len(missing))
+        
+        if missing:
+            documents = [test_steps_xml for test_steps_xml, _ in missing.values()]
+            if self._parse_pool and not self.debug and len(documents) >= PARSE_POOL_MIN_BATCH:
+                chunk_size = max(1, len(documents) // (self.parse_workers * 4))
+                results = list(self._parse_pool.map(_parse_steps_in_worker, documents, chunksize=chunk_size))
+            else:
+                results = [self._parse_test_steps_xml(test_steps_xml) for test_steps_xml in documents]
+            
+            with self._parsed_steps_lock:
+                for (key, (_, positions)), steps in zip(missing.items(), results):
+                    self._parsed_steps_cache[key] = steps
+                    for position in positions:
+                        parsed[position] = list(steps)
+                while len(self._parsed_steps_cache) > STEPS_PARSE_CACHE_SIZE:
+                    self._parsed_steps_cache.popitem(last=False)
+        
+        return parsed
+    
+    def _parse_test_steps_xml(self, test_steps_xml: str) -> List[Dict[str, str]]:
+        """Parse test steps XML in a single pass over its step elements"""
         steps = []
         try:
             # Parse the XML
             root = ET.fromstring(test_steps_xml)
             
-            # Find all step elements
-            for step_elem in root.findall('.//step'):
-                step_id = step_elem.get('id', '')
-                step_type = step_elem.get('type', '')
-                
+            # Walk every step element below the root, in document order
+            step_elems = root.iter('step')
+            if root.tag == 'step':
+                next(step_elems)
+            
+            for step_elem in step_elems:
                 # Debugging output: Log the XML of the current step being parsed
-                if self.debug:
+                if self.debug and not self.profiler:
                     self.logger.debug(f"Parsing step: {ET.tostring(step_elem, encoding='unicode')}")
                 
-                if step_type == 'ValidateStep':
+                if step_elem.get('type', '') == 'ValidateStep':
                     # For ValidateStep, extract both action and expected result
-                    parameterized_strings = step_elem.findall('parameterizedString')
+                    parameterized_strings = [child.text for child in step_elem if child.tag == 'parameterizedString']
                     if len(parameterized_strings) >= 2:
-                        action = self.clean_html_text(parameterized_strings[0].text)
-                        expected = self.clean_html_text(parameterized_strings[1].text)
+                        action = self.clean_html_text(parameterized_strings[0])
+                        expected = self.clean_html_text(parameterized_strings[1])
                     else:
                         action = ''
                         expected = ''
                 else:  # For ActionStep
-                    # Get action (parameterizedString)
-                    action_elem = step_elem.find('.//parameterizedString')
+                    # Get action (first parameterizedString anywhere in the step)
+                    action_elem = next(step_elem.iter('parameterizedString'), None)
                     action = self.clean_html_text(action_elem.text if action_elem is not None else "")
                     expected = ''  # No expected result for ActionStep
                 
@@ -346,7 +1239,7 @@ class AzureTestPlanExporter:
                 # Include steps that have either an action OR an expected result
                 if action or expected:  # Changed this condition
                     steps.append({
-                        'step_id': step_id,
+                        'step_id': step_elem.get('id', ''),
                         'action': action,
                         'expected_result': expected
                     })
@@ -357,487 +1250,2392 @@ class AzureTestPlanExporter:
         
         return steps
     
-    def flatten_shared_steps(self, test_steps: List[Dict[str, str]], test_case_id: str) -> List[Dict[str, str]]:
+    def _parse_work_item_steps(self, work_items: Dict[str, Dict[Any, Any]]) -> Dict[str, List[Dict[str, str]]]:
+        """Parse the test steps of work items keyed by ID in one batch, on the parse workers when there are any"""
+        work_item_ids = list(work_items)
+        test_steps_xmls = [work_items[work_item_id].get('fields', {}).get('Microsoft.VSTS.TCM.Steps', '')
+                           for work_item_id in work_item_ids]
+        with self.metrics.phase('step_parsing'):
+            return dict(zip(work_item_ids, self.parse_test_steps_many(test_steps_xmls)))
+    
+    def _shared_step_refs(self, parsed_steps: Iterable[List[Dict[str, str]]]) -> List[str]:
+        """Get the shared steps work item IDs referenced from parsed test steps"""
+        refs = []
+        for steps in parsed_steps:
+            for step in steps:
+                match = SHARED_STEP_REF_PATTERN.search(step.get('action', ''))
+                if match:
+                    refs.append(match.group(1))
+        return refs
+    
+    def prefetch_shared_steps(self, work_items: Dict[str, Dict[Any, Any]]) -> Dict[str, List[Dict[str, str]]]:
+        """Fetch in bulk every not yet cached shared steps work item reachable from the given work items, keyed by
+        ID, returning their parsed steps for building rows"""
+        parsed_steps = self._parse_work_item_steps(work_items)
+        self._prefetch_shared_steps_ids(self._shared_step_refs(parsed_steps.values()))
+        return parsed_steps
+    
+    def _prefetch_shared_steps_ids(self, shared_steps_ids: Iterable[str]):
+        """Fetch in bulk the given shared steps work items and everything they reference, level by level"""
+        pending = set(shared_steps_ids)
+        while pending:
+            with self._shared_steps_lock:
+                batch_ids = sorted(pending - self._shared_steps_work_items.keys())
+            if not batch_ids:
+                break
+            
+            self.logger.debug(f"Prefetching {len(batch_ids)} shared steps work items")
+            with self.metrics.phase('shared_steps'):
+                shared_steps = self.get_work_items_batch(batch_ids)
+            parsed_steps = self._parse_work_item_steps(shared_steps)
+            self._store_shared_steps(batch_ids, shared_steps, parsed_steps)
+            pending = set(self._shared_step_refs(parsed_steps.values()))
+    
+    def _store_shared_steps(self, batch_ids: List[str], shared_steps: Dict[str, Dict[Any, Any]],
+                            parsed_steps: Dict[str, List[Dict[str, str]]]):
+        """Record a prefetched batch of shared steps work items and their parsed steps"""
+        with self._shared_steps_lock:
+            for shared_steps_id in batch_ids:
+                # Misses are recorded too so they are reported without being requested again
+                self._shared_steps_work_items[shared_steps_id] = shared_steps.get(shared_steps_id, {})
+            self._shared_steps_parsed.update(parsed_steps)
+    
+    def clear_shared_steps_cache(self):
+        """Forget all fetched shared steps work items and resolved shared steps sequences"""
+        with self._shared_steps_lock:
+            self._shared_steps_work_items.clear()
+            self._shared_steps_cache.clear()
+            self._shared_steps_parsed.clear()
+    
+    def _resolve_shared_steps(self, shared_step_id: str, resolving: Tuple[str, ...]) -> Optional[List[Dict[str, str]]]:
+        """Get the flattened steps of a shared steps work item, or None when it cannot be resolved"""
+        if shared_step_id in resolving:
+            self.logger.warning(f"Shared steps reference cycle detected: {' -> '.join(resolving + (shared_step_id,))}")
+            return None
+        
+        shared_steps_details = self.get_shared_steps_details(shared_step_id)
+        if not shared_steps_details:
+            self.logger.warning(f"Could not retrieve shared steps {shared_step_id}")
+            return None
+        
+        fields = shared_steps_details.get('fields', {})
+        cache_key = (shared_step_id, shared_steps_details.get('rev', fields.get('System.Rev')))
+        with self._shared_steps_lock:
+            cached_steps = self._shared_steps_cache.get(cache_key)
+        if cached_steps is not None:
+            self.logger.debug(f"Using cached flattened steps for shared steps {shared_step_id} (rev {cache_key[1]})")
+            return cached_steps
+        
+        shared_steps_xml = fields.get('Microsoft.VSTS.TCM.Steps', '')
+        if not shared_steps_xml:
+            self.logger.warning(f"No steps XML found in shared steps {shared_step_id}")
+            return None
+        
+        with self._shared_steps_lock:
+            shared_steps = self._shared_steps_parsed.get(shared_step_id)
+        if shared_steps is None:
+            shared_steps = self.parse_test_steps(shared_steps_xml)
+        self.logger.debug(f"Parsed {len(shared_steps)} steps from shared steps {shared_step_id}")
+        
+        # Recursively flatten in case shared steps contain other shared steps
+        shared_steps = self.flatten_shared_steps(shared_steps, shared_step_id, resolving)
+        with self._shared_steps_lock:
+            self._shared_steps_cache[cache_key] = shared_steps
+        return shared_steps
+    
+    def flatten_shared_steps(self, test_steps: List[Dict[str, str]], test_case_id: str,
+                             resolving: Tuple[str, ...] = ()) -> List[Dict[str, str]]:
         """Flatten shared steps by fetching their details and replacing references"""
         self.logger.debug(f"Flattening shared steps for test case {test_case_id}")
         
+        # Work items currently being flattened, used to detect shared steps that reference themselves
+        resolving = resolving + (test_case_id,)
+        
+        shared_step_ids = [match.group(1) for match in
+                           (SHARED_STEP_REF_PATTERN.search(step.get('action', '')) for step in test_steps) if match]
+        if not shared_step_ids:
+            return test_steps
+        self._prefetch_shared_steps_ids(shared_step_ids)
+        
         flattened_steps = []
         shared_steps_found = 0
         
-        for i, step in enumerate(test_steps):
-            action = step.get('action', '')
-            
+        for step in test_steps:
             # Check if this step references shared steps (typically contains @SharedStepId)
-            shared_step_match = re.search(r'@(\d+)', action)
+            shared_step_match = SHARED_STEP_REF_PATTERN.search(step.get('action', ''))
             if shared_step_match:
                 shared_step_id = shared_step_match.group(1)
                 shared_steps_found += 1
-                self.logger.info(f"  Fetching shared steps {shared_step_id} for test case {test_case_id}")
+                self.logger.debug(f"  Resolving shared steps {shared_step_id} for test case {test_case_id}")
                 
-                # Get shared steps details
-                shared_steps_details = self.get_shared_steps_details(shared_step_id)
-                if shared_steps_details:
-                    shared_steps_xml = shared_steps_details.get('fields', {}).get('Microsoft.VSTS.TCM.Steps', '')
-                    if shared_steps_xml:
-                        shared_steps = self.parse_test_steps(shared_steps_xml)
-                        self.logger.debug(f"Parsed {len(shared_steps)} steps from shared steps {shared_step_id}")
-                        
-                        # Recursively flatten in case shared steps contain other shared steps
-                        shared_steps = self.flatten_shared_steps(shared_steps, shared_step_id)
-                        flattened_steps.extend(shared_steps)
-                        self.logger.debug(f"Added {len(shared_steps)} flattened shared steps")
-                    else:
-                        self.logger.warning(f"No steps XML found in shared steps {shared_step_id}")
-                        flattened_steps.append(step)
+                shared_steps = self._resolve_shared_steps(shared_step_id, resolving)
+                if shared_steps is not None:
+                    flattened_steps.extend(shared_steps)
+                    self.logger.debug(f"Added {len(shared_steps)} flattened shared steps")
                 else:
-                    self.logger.warning(f"Could not retrieve shared steps {shared_step_id}")
                     flattened_steps.append(step)
             else:
                 # Regular step, add as-is
                 flattened_steps.append(step)
         
-        if shared_steps_found > 0:
-            self.logger.info(f"Processed {shared_steps_found} shared step references, result: {len(flattened_steps)} total steps")
+        self.logger.info(f"Processed {shared_steps_found} shared step references, result: {len(flattened_steps)} total steps")
         
         return flattened_steps
     
     def build_suite_hierarchy(self, suite: Dict[Any, Any], all_suites: List[Dict[Any, Any]]) -> List[str]:
-        """Build hierarchical path for a test suite as a list"""
+        """Build hierarchical path for a test suite as a list.
+        
+        The tree is reused while the same, unchanged suite list is passed, so resolving every suite's path one by
+        one stays linear. Code holding a SuiteTree should call its path method instead.
+        """
+        cached = self._suite_hierarchy_tree
+        if cached is None or cached[0] is not all_suites or cached[1] != len(all_suites):
+            cached = self._suite_hierarchy_tree = (all_suites, len(all_suites), SuiteTree(all_suites, self.logger))
+        return cached[2].path(str(suite.get('id', '')))
+    
+    def _fetch_suite_data(self, plan_id: str, suite_id: str) -> Tuple[List[Dict[Any, Any]], List[Dict[Any, Any]], Dict[str, Dict[Any, Any]], Dict[str, List[Dict[str, str]]]]:
+        """Fetch test cases, test points and test case details for a single suite, with the test cases' parsed steps"""
+        # Get test cases for this suite
+        with self.metrics.phase('suite_test_cases'):
+            test_cases = self.get_test_cases_for_suite(plan_id, suite_id)
+        if not test_cases:
+            return [], [], {}, {}
+        
+        # Get test points (execution status) for this suite
+        with self.metrics.phase('suite_test_points'):
+            test_points = self.get_test_points(plan_id, suite_id)
+        
+        # Fetch details for all test cases in this suite in bulk
+        with self.metrics.phase('test_case_details'):
+            test_case_details_map = self.get_test_case_details_batch(self._suite_case_ids(test_cases))
+        
+        # Parse the test cases' steps in one batch and resolve the shared steps they reference in bulk, timing the
+        # fetches as shared_steps and the parsing as step_parsing
+        parsed_steps = self.prefetch_shared_steps(test_case_details_map)
+        
+        return test_cases, test_points, test_case_details_map, parsed_steps
+    
+    def _suite_case_ids(self, test_cases: List[Dict[Any, Any]]) -> List[str]:
+        """Get the valid test case IDs from a suite's test case list"""
+        suite_case_ids = [str(tc.get('workItem', {}).get('id', '')) for tc in test_cases]
+        return [tc_id for tc_id in suite_case_ids if tc_id]
+    
+    def _extract_suite_rows(self, plan_id: str, suite_info: Dict[str, Any],
+                            test_results_map: Dict[str, 'TestResultRecord']) -> Tuple[List[ExportRow], int, int]:
+        """Fetch and build the hierarchical rows for a single suite, returning rows, test case and step counts"""
+        suite = suite_info['suite']
         suite_id = str(suite.get('id', ''))
+        self.logger.info(f"Processing suite: {suite.get('name', '')} (ID: {suite_id})")
+        
+        test_cases, test_points, test_case_details_map, parsed_steps = self._fetch_suite_data(plan_id, suite_id)
+        return self._build_suite_rows(plan_id, suite_info, test_cases, test_points, test_case_details_map,
+                                      test_results_map, parsed_steps)
+    
+    def _build_suite_rows(self, plan_id: str, suite_info: Dict[str, Any], test_cases: List[Dict[Any, Any]],
+                          test_points: List[Dict[Any, Any]], test_case_details_map: Dict[str, Dict[Any, Any]],
+                          test_results_map: Dict[str, 'TestResultRecord'],
+                          parsed_steps: Optional[Dict[str, List[Dict[str, str]]]] = None) -> Tuple[List[ExportRow], int, int]:
+        """Build the hierarchical rows for a single suite from its fetched data, returning rows, test case and step counts.
+        
+        Test steps are taken from parsed_steps, by test case ID, and only parsed here for test cases missing from it.
+        """
+        suite = suite_info['suite']
+        plan_id = intern_value(str(plan_id))
+        suite_id = intern_value(str(suite.get('id', '')))
         suite_name = suite.get('name', '')
-        self.logger.debug(f"Building hierarchy for suite: {suite_name} (ID: {suite_id})")
-        
-        path_parts = []
-        current_suite = suite
-        depth = 0
-        max_depth = 10  # Prevent infinite loops
-        
-        # Build path from current suite up to root
-        while current_suite and depth < max_depth:
-            suite_name = current_suite.get('name', '')
-            if suite_name:
-                path_parts.insert(0, suite_name)
-                self.logger.debug(f"  Added to path: {suite_name}")
-            
-            # Move to parent
-            parent_id = current_suite.get('parentSuite', {}).get('id') if current_suite.get('parentSuite') else None
-            if parent_id:
-                self.logger.debug(f"  Looking for parent suite ID: {parent_id}")
-                current_suite = next((s for s in all_suites if str(s.get('id')) == str(parent_id)), None)
-                if not current_suite:
-                    self.logger.warning(f"  Parent suite {parent_id} not found in suite list")
+        suite_path = intern_value(suite_info['full_path'])
+        
+        self.logger.info(f"  Found {len(test_cases)} test cases in suite {suite_name}")
+        
+        if not test_cases:
+            self.logger.debug(f"  Skipping suite {suite_name} - no test cases")
+            return [], 0, 0
+        
+        # Create a mapping of test case ID to test point status
+        test_point_map = {}
+        for point in test_points:
+            # Try different possible locations for test case ID in test points
+            tc_id = str(point.get('testCaseReference', {}).get('id', ''))
+            if not tc_id:
+                tc_id = str(point.get('testCase', {}).get('id', ''))
+            if not tc_id:
+                tc_id = str(point.get('workItem', {}).get('id', ''))
+            
+            if tc_id:
+                test_point_map[tc_id] = {
+                    'status': point.get('outcome', 'Not Executed'),
+                    'lastResultOutcome': point.get('lastResultOutcome', ''),
+                    'lastResultState': point.get('lastResultState', ''),
+                    'assignedTo': point.get('assignedTo', {}).get('displayName', ''),
+                }
+        
+        self.logger.debug(f"  Created test point mapping for {len(test_point_map)} test cases")
+        
+        suite_rows = []
+        
+        # Add suite header row
+        suite_rows.append(ExportRow.make('Suite', plan_id=plan_id, suite_path=suite_path, suite_id=suite_id,
+                                         title=f"SUITE: {suite_name}"))
+        
+        suite_test_cases = 0
+        suite_test_steps = 0
+        
+        for test_case in test_cases:
+            # Extract test case ID from workItem.id
+            tc_id = str(test_case.get('workItem', {}).get('id', ''))
+            
+            # Skip if no valid test case ID
+            if not tc_id or tc_id == '':
+                self.logger.warning(f"    No valid test case ID found in suite {suite_name}")
+                continue
+            
+            self.logger.debug(f"    Processing test case {tc_id}")
+            
+            # Get detailed test case information including test steps
+            test_case_details = test_case_details_map.get(tc_id)
+            if not test_case_details:
+                self.logger.warning(f"    Could not get details for test case {tc_id}")
+                continue
+            
+            # Extract test case fields
+            fields = test_case_details.get('fields', {})
+            
+            # Get test point status for this test case
+            test_point_info = test_point_map.get(tc_id, {})
+            
+            # Get latest test result for this test case
+            latest_test_result = test_results_map.get(tc_id)
+            
+            # Determine the actual execution status
+            execution_status = 'Not Executed'
+            execution_outcome = ''
+            last_run_date = ''
+            last_run_by = ''
+            
+            if latest_test_result:
+                execution_outcome = latest_test_result.outcome
+                execution_status = latest_test_result.state
+                last_run_date = latest_test_result.completed_date
+                last_run_by = latest_test_result.run_by
+                self.logger.debug(f"    Test case {tc_id} has execution result: {execution_outcome}")
+            elif test_point_info.get('lastResultOutcome'):
+                execution_outcome = test_point_info.get('lastResultOutcome', '')
+                execution_status = test_point_info.get('lastResultState', 'Not Executed')
+                self.logger.debug(f"    Test case {tc_id} has test point result: {execution_outcome}")
             else:
-                current_suite = None
+                self.logger.debug(f"    Test case {tc_id} has no execution results")
+            
+            # Extract assigned to from point assignments if available
+            assigned_to = test_point_info.get('assignedTo', '')
+            if not assigned_to and test_case.get('pointAssignments'):
+                first_assignment = test_case['pointAssignments'][0]
+                tester = first_assignment.get('tester') if first_assignment else None
+                if tester:
+                    assigned_to = tester.get('displayName', '')
+            
+            # Test steps parsed when the suite was fetched, or parsed now
+            test_steps = parsed_steps.get(tc_id) if parsed_steps else None
+            if test_steps is None:
+                with self.metrics.phase('step_parsing'):
+                    test_steps = self.parse_test_steps(fields.get('Microsoft.VSTS.TCM.Steps', ''))
             
-            depth += 1
+            # Flatten shared steps
+            if test_steps:
+                original_step_count = len(test_steps)
+                with self.metrics.phase('shared_steps'):
+                    test_steps = self.flatten_shared_steps(test_steps, tc_id)
+                if len(test_steps) != original_step_count:
+                    self.logger.debug(f"    Flattened {original_step_count} -> {len(test_steps)} steps for TC {tc_id}")
+            
+            # Add test case header row
+            tc_id = intern_value(tc_id)
+            test_case_data = ExportRow.make(
+                'Test Case',
+                plan_id=plan_id,
+                suite_path=suite_path,
+                suite_id=suite_id,
+                test_case_id=tc_id,
+                title=fields.get('System.Title', ''),
+                execution_status=intern_value(execution_status),
+                execution_outcome=intern_value(execution_outcome),
+                last_run_date=last_run_date,
+                last_run_by=intern_value(last_run_by),
+                assigned_to=intern_value(assigned_to),
+                created_date=fields.get('System.CreatedDate', ''),
+                created_by=intern_value(fields.get('System.CreatedBy', {}).get('displayName', '')),
+                area_path=intern_value(fields.get('System.AreaPath', '')),
+                iteration=intern_value(fields.get('System.IterationPath', '')),
+                automated='Yes' if fields.get('Microsoft.VSTS.TCM.AutomatedTestName') else 'No',
+                extra_fields=tuple(intern_value(format_field_value(fields.get(field))) for _, field in self.extra_fields)
+            )
+            
+            suite_rows.append(test_case_data)
+            suite_test_cases += 1
+            
+            # Add test steps as sub-rows
+            for i, step in enumerate(test_steps, 1):
+                step_data = ExportRow.make('Test Step', plan_id=plan_id, suite_path=suite_path, suite_id=suite_id,
+                                           test_case_id=tc_id, step_number=intern_value(str(i)),
+                                           step_action=step.get('action', ''),
+                                           expected_result=step.get('expected_result', ''))
+                suite_rows.append(step_data)
+                suite_test_steps += 1
+        
+        self.logger.info(f"  Suite {suite_name} processed: {suite_test_cases} test cases, {suite_test_steps} test steps")
+        
+        # Add blank row after each suite for better readability
+        suite_rows.append(SEPARATOR_ROW)
+        
+        return suite_rows, suite_test_cases, suite_test_steps
+    
+    def _reduce_latest_results(self, results: Iterable[Dict[Any, Any]], latest: Dict[str, 'TestResultRecord']) -> int:
+        """Fold test results into a map of test case ID to its latest compact result, returning how many were read"""
+        total_results = 0
+        for result in results:
+            total_results += 1
+            test_case_id = str(result.get('testCase', {}).get('id', ''))
+            if test_case_id:
+                completed_date = result.get('completedDate') or ''
+                current = latest.get(test_case_id)
+                # Keep only the latest result for each test case
+                if current is None or completed_date > current.completed_date:
+                    latest[test_case_id] = TestResultRecord.from_api(result)
+        return total_results
+    
+    def get_latest_results_for_run(self, run_id: str) -> Tuple[Dict[str, 'TestResultRecord'], int]:
+        """Read a run's results page by page, keeping only the latest compact result per test case"""
+        latest = {}
+        total_results = self._reduce_latest_results(self.iter_test_results_for_run(run_id), latest)
+        self.logger.debug(f"Read {total_results} test results in run {run_id} for {len(latest)} test cases")
+        return latest, total_results
+    
+    def _build_test_results_map(self, latest_per_run: Iterable[Tuple[Dict[str, 'TestResultRecord'], int]],
+                                test_results_map: Optional[Dict[str, 'TestResultRecord']] = None) -> Dict[str, 'TestResultRecord']:
+        """Merge the latest results of each run, in run order, into a map of test case ID to its latest result"""
+        self.logger.info("Building test results map...")
+        test_results_map = test_results_map if test_results_map is not None else {}
+        total_results = 0
         
-        if depth >= max_depth:
-            self.logger.warning(f"Maximum hierarchy depth reached for suite {suite_id}")
+        for run_latest, run_total in latest_per_run:
+            total_results += run_total
+            for test_case_id, record in run_latest.items():
+                current = test_results_map.get(test_case_id)
+                if current is None or record.completed_date > current.completed_date:
+                    test_results_map[test_case_id] = record
+        
+        self.logger.info(f"Processed {total_results} total results, {len(test_results_map)} unique test cases with results")
+        return test_results_map
+    
+    def _begin_incremental_export(self) -> Tuple[datetime, Optional[datetime]]:
+        """Work out what changed since the previous incremental export, returning the new and previous watermarks"""
+        started = datetime.now(timezone.utc)
+        self._changed_work_item_ids = None
+        if not self.incremental_state or not self.incremental_state.watermark:
+            if self.incremental_state:
+                self.logger.info("No previous incremental export found, running a full export")
+            return started, None
+        
+        since = self.incremental_state.watermark - INCREMENTAL_OVERLAP
+        self.logger.info(f"Incremental export of changes since {format_utc(since)}")
+        self._changed_work_item_ids = self.get_changed_work_item_ids(since)
+        return started, since
+    
+    def _runs_window_start(self, changed_since: Optional[datetime]) -> Optional[datetime]:
+        """Earliest last-updated date of the test runs to read, or None to read every run of the plan"""
+        bounds = [bound for bound in (changed_since, self.runs_since) if bound]
+        return max(bounds) if bounds else None
+    
+    def _test_run_listings(self, plan_id: str, changed_since: Optional[datetime],
+                           until: datetime) -> List[Tuple[str, Optional[int]]]:
+        """List endpoints, as (URL, page size), to read the relevant test runs of a plan from"""
+        if self.execution_source == 'points':
+            return []
+        runs_since = self._runs_window_start(changed_since)
+        if runs_since:
+            return [(url, None) for url in self._test_runs_query_urls(plan_id, runs_since, until)]
+        return [(self._test_runs_url(plan_id), TEST_RUNS_PAGE_SIZE)]
+    
+    def _initial_test_results_map(self, changed_since: Optional[datetime]) -> Dict[str, 'TestResultRecord']:
+        """Results to merge new runs into: those of the previous export when running incrementally"""
+        if changed_since and self.execution_source != 'points':
+            return dict(self.incremental_state.test_results)
+        return {}
+    
+    def _finish_incremental_export(self, started: datetime, test_results_map: Dict[str, 'TestResultRecord'],
+                                   failed_requests: int):
+        """Record the watermark and latest test results for the next incremental export, unless requests failed
+        since failed_requests was read and changes may have been missed"""
+        self._changed_work_item_ids = None
+        if self.incremental_state:
+            if self.throttle.failed_requests != failed_requests:
+                self.logger.warning("Requests failed during the export, keeping the previous incremental export "
+                                    "watermark so the next export reads these changes again")
+                return
+            self.incremental_state.save(started, test_results_map)
+            self.logger.info(f"Saved incremental export watermark {format_utc(started)}")
+    
+    def _count_suite_rows(self, suite_rows: List[ExportRow]) -> Tuple[int, int]:
+        """Count the test cases and test steps among a suite's rows"""
+        row_types = [row['Type'] for row in suite_rows]
+        return row_types.count('Test Case'), row_types.count('Test Step')
+    
+    def _checkpoint_test_results(self, test_results_map: Dict[str, 'TestResultRecord'], failed_requests: int):
+        """Journal the test results map, unless requests failed since failed_requests was read and it may be partial"""
+        if not self.checkpoint:
+            return
+        if self.throttle.failed_requests != failed_requests:
+            self.logger.warning("Requests failed while reading test results, they will be read again on resume")
+            return
+        self.checkpoint.record_test_results(test_results_map)
+    
+    def _checkpoint_suite(self, suite_id: str, suite_rows: List[ExportRow], failed_requests: int):
+        """Journal a suite's rows, unless requests failed since failed_requests was read and they may be partial"""
+        if not self.checkpoint:
+            return
+        if self.throttle.failed_requests != failed_requests:
+            self.logger.warning(f"Requests failed while extracting suite {suite_id}, it will be extracted again on resume")
+            return
+        self.checkpoint.record_suite(suite_id, suite_rows)
+    
+    def _organize_suites(self, test_suites: List[Dict[Any, Any]]) -> List[Dict[str, Any]]:
+        """Build the hierarchy path of every suite to export and return them sorted by full path"""
+        self.logger.info("Building suite hierarchy...")
+        suite_tree = SuiteTree(test_suites, self.logger)
+        
+        # Only export the subtree under the selected suite, if any
+        suite_ids = suite_tree.ids()
+        if self.suite_id or self.suite_path:
+            root_id = self.suite_id or suite_tree.find_by_path(self.suite_path)
+            if not root_id or root_id not in suite_tree:
+                self.logger.error(f"Test suite {self.suite_id or self.suite_path!r} not found in plan")
+                return []
+            suite_ids = suite_tree.subtree_ids(root_id)
+            self.logger.info(f"Exporting {len(suite_ids)} suites under '{suite_tree.full_path(root_id)}'")
+        
+        suite_hierarchy = [{
+            'suite': suite_tree[suite_id],
+            'hierarchy_path': suite_tree.path(suite_id),
+            'full_path': suite_tree.full_path(suite_id)
+        } for suite_id in suite_ids]
         
-        hierarchy_path = ' > '.join(path_parts)
-        self.logger.debug(f"Final hierarchy path: {hierarchy_path}")
-        return path_parts
+        # Sort suites by hierarchy path for better organization
+        sorted_suites = sorted(suite_hierarchy, key=lambda x: x['full_path'])
+        self.logger.info(f"Organized {len(sorted_suites)} suites by hierarchy")
+        return sorted_suites
     
-    def extract_test_data_hierarchical(self, plan_id: str) -> List[Dict[str, Any]]:
+    def extract_test_data_hierarchical(self, plan_id: str) -> List[ExportRow]:
         """Extract all test data from a test plan in hierarchical format"""
+        return list(self.iter_test_data_hierarchical(plan_id))
+    
+    def iter_test_data_hierarchical(self, plan_id: str) -> Iterator[ExportRow]:
+        """Extract all test data from a test plan in hierarchical format, yielding rows as each suite completes"""
+        if self.engine == 'async':
+            yield from AsyncExtractionEngine(self).iter_test_data_hierarchical(plan_id)
+            return
+        
         self.logger.info(f"Starting hierarchical extraction for Test Plan ID: {plan_id}")
+        export_failed_requests = self.throttle.failed_requests
+        export_started, changed_since = self._begin_incremental_export()
+        if self.checkpoint:
+            export_started = self.checkpoint.begin(export_started)
         
         # Get test plan details
-        test_plan = self.get_test_plan(plan_id)
+        with self.metrics.phase('plan_and_suites'):
+            test_plan = self.get_test_plan(plan_id)
         if not test_plan:
             self.logger.error(f"Could not retrieve test plan {plan_id}")
-            return []
+            return
         
         plan_name = test_plan.get('name', 'Unknown')
         self.logger.info(f"Test Plan: {plan_name}")
         
         # Get all test suites
-        test_suites = self.get_test_suites(plan_id)
+        with self.metrics.phase('plan_and_suites'):
+            test_suites = self.get_test_suites(plan_id)
         if not test_suites:
             self.logger.error(f"No test suites found for plan {plan_id}")
-            return []
+            return
         
         self.logger.info(f"Found {len(test_suites)} test suites")
+        self._exported_plans[str(plan_id)] = (plan_name, test_suites)
+        self._phase_boundary(f"plan {plan_id}: plan and suites fetched")
         
-        # Get test runs for this plan to build execution history
-        self.logger.info("Fetching test execution history...")
-        test_runs = self.get_test_runs_for_plan(plan_id)
-        self.logger.info(f"Found {len(test_runs)} test runs")
-        
-        # Build a comprehensive test results map
-        self.logger.info("Building test results map...")
-        test_results_map = {}
-        total_results = 0
+        sorted_suites = self._organize_suites(test_suites)
+        if not sorted_suites:
+            return
         
-        for run in test_runs:
-            run_id = str(run.get('id', ''))
-            if not run_id:
-                continue
-            
-            results = self.get_test_results_for_run(run_id)
-            total_results += len(results)
-            
-            for result in results:
-                test_case_id = str(result.get('testCase', {}).get('id', ''))
-                if test_case_id:
-                    completed_date = result.get('completedDate', '')
-                    # Keep only the latest result for each test case
-                    if (test_case_id not in test_results_map or 
-                        completed_date > test_results_map[test_case_id].get('completedDate', '')):
-                        test_results_map[test_case_id] = result
+        # Get test runs for this plan to build execution history, unless test point results are enough
+        runs_since = self._runs_window_start(changed_since)
+        resumed_test_results = self.checkpoint.test_results if self.checkpoint else None
+        with self.metrics.phase('runs_and_results'):
+            if resumed_test_results is not None:
+                self.logger.info(f"Using the checkpointed test results of {len(resumed_test_results)} test cases")
+                test_results_map = resumed_test_results
+            else:
+                failed_requests = self.throttle.failed_requests
+                if self.execution_source == 'points':
+                    self.logger.info("Using test point results as execution history, skipping test runs")
+                    test_runs = []
+                else:
+                    self.logger.info("Fetching test execution history...")
+                    if runs_since:
+                        test_runs = self.get_test_runs_updated_since(plan_id, runs_since)
+                    else:
+                        test_runs = self.get_test_runs_for_plan(plan_id)
+                    self.logger.info(f"Found {len(test_runs)} test runs")
+                test_results_map = self._initial_test_results_map(changed_since)
+                
+                # Build a comprehensive test results map; runs are read in parallel, page by page, each
+                # reduced to compact latest results before being merged in run order
+                run_ids = [str(run.get('id', '')) for run in test_runs if str(run.get('id', ''))]
+                test_results_map = self._build_test_results_map(
+                    self._parallel_map(self.get_latest_results_for_run, run_ids), test_results_map)
+                self._checkpoint_test_results(test_results_map, failed_requests)
+        self._phase_boundary(f"plan {plan_id}: runs and results fetched")
+        
+        total_rows = 0
+        total_test_cases = 0
+        total_test_steps = 0
         
-        self.logger.info(f"Processed {total_results} total results, {len(test_results_map)} unique test cases with results")
+        # Suites are processed concurrently but consumed in sorted order so row order is stable
+        def process_suite(suite_info):
+            suite_id = str(suite_info['suite'].get('id', ''))
+            completed_rows = self.checkpoint.completed_rows(suite_id) if self.checkpoint else None
+            if completed_rows is not None:
+                return (completed_rows,) + self._count_suite_rows(completed_rows)
+            failed_requests = self.throttle.failed_requests
+            suite_rows, suite_test_cases, suite_test_steps = self._extract_suite_rows(plan_id, suite_info, test_results_map)
+            self._checkpoint_suite(suite_id, suite_rows, failed_requests)
+            return suite_rows, suite_test_cases, suite_test_steps
+        
+        for suite_rows, suite_test_cases, suite_test_steps in self._parallel_map(process_suite, sorted_suites):
+            yield from suite_rows
+            total_rows += len(suite_rows)
+            total_test_cases += suite_test_cases
+            total_test_steps += suite_test_steps
+        
+        self._finish_incremental_export(export_started, test_results_map, export_failed_requests)
+        self._phase_boundary(f"plan {plan_id}: suites extracted")
         
-        # Organize suites by hierarchy
-        self.logger.info("Building suite hierarchy...")
-        suite_hierarchy = {}
-        for suite in test_suites:
-            hierarchy_path = self.build_suite_hierarchy(suite, test_suites)
-            suite_hierarchy[str(suite.get('id', ''))] = {
-                'suite': suite,
-                'hierarchy_path': hierarchy_path,
-                'full_path': ' > '.join(hierarchy_path)
-            }
+        self.logger.info(f"Extraction complete: {total_test_cases} test cases, {total_test_steps} test steps")
+        self.logger.info(f"Total hierarchical data rows: {total_rows}")
+    
+    def export_hierarchical(self, hierarchical_data: Iterable[Mapping[str, str]], filename: str = None,
+                            output_format: str = 'csv') -> int:
+        """Export hierarchical test data in the given format (see EXPORT_FORMATS); returns the row count.
+        
+        Rows may be extracted lazily as they are written, so the write phase is timed net of producing them.
+        """
+        started = time.perf_counter()
+        rows = TimedIterator(hierarchical_data)
+        try:
+            if output_format == 'sqlite':
+                return self.export_hierarchical_to_sqlite(rows, filename)
+            if output_format == 'parquet':
+                return self.export_hierarchical_to_parquet(rows, filename)
+            if output_format == 'jsonl':
+                return self.export_hierarchical_to_jsonl(rows, filename)
+            return self.export_hierarchical_to_csv(rows, filename)
+        finally:
+            self.metrics.record_phase('write', time.perf_counter() - started - rows.seconds)
+            self.metrics.record_rows(rows.count)
+            self._phase_boundary("output written")
+    
+    def export_hierarchical_to_csv(self, hierarchical_data: Iterable[Mapping[str, str]], filename: str = None) -> int:
+        """Export hierarchical test data to CSV file, writing rows as they are produced; returns the row count"""
+        rows = iter(hierarchical_data)
+        first_row = next(rows, None)
+        if first_row is None:
+            self.logger.error("No test data to export")
+            return 0
         
-        # Sort suites by hierarchy path for better organization
-        sorted_suites = sorted(suite_hierarchy.values(), key=lambda x: x['full_path'])
-        self.logger.info(f"Organized {len(sorted_suites)} suites by hierarchy")
+        if not filename:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"test_plan_hierarchical_export_{timestamp}.csv"
         
-        all_hierarchical_data = []
-        total_test_cases = 0
-        total_test_steps = 0
+        self.logger.info(f"Exporting rows to {filename}")
         
-        for suite_info in sorted_suites:
-            suite = suite_info['suite']
-            suite_id = str(suite.get('id', ''))
-            suite_name = suite.get('name', '')
-            suite_path = suite_info['full_path']
+        try:
+            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+                writer = csv.writer(csvfile)
+                writer.writerow(self.export_columns)
+                writer.writerow(row_cells(first_row, self.export_columns))
+                row_count = 1
+                for row in rows:
+                    writer.writerow(row_cells(row, self.export_columns))
+                    row_count += 1
+                    # Flush at suite boundaries so a partial export is readable while it runs
+                    if row['Type'] == 'Separator':
+                        csvfile.flush()
             
-            self.logger.info(f"Processing suite: {suite_name} (ID: {suite_id})")
+            self.logger.info(f"Successfully exported {row_count} rows of hierarchical test data to {filename}")
             
-            # Get test cases for this suite
-            test_cases = self.get_test_cases_for_suite(plan_id, suite_id)
-            self.logger.info(f"  Found {len(test_cases)} test cases in suite {suite_name}")
+            # Log file size
+            file_size = os.path.getsize(filename)
+            self.logger.info(f"Output file size: {file_size:,} bytes ({file_size/1024/1024:.2f} MB)")
+            return row_count
             
-            if not test_cases:
-                self.logger.debug(f"  Skipping suite {suite_name} - no test cases")
-                continue
+        except Exception as e:
+            self.logger.error(f"Error writing CSV file: {e}")
+            raise
+
+    def export_hierarchical_to_sqlite(self, hierarchical_data: Iterable[Mapping[str, str]], filename: str = None) -> int:
+        """Export hierarchical test data to a SQLite database of normalized, indexed tables; returns the row count.
+        
+        Tables: plans, suites (with parent links), test_cases (with any extra field columns), suite_test_cases (the
+        test cases of each suite and who they are assigned to), steps and results (the latest execution of each test
+        case in each suite).
+        """
+        rows = iter(hierarchical_data)
+        first_row = next(rows, None)
+        if first_row is None:
+            self.logger.error("No test data to export")
+            return 0
+        
+        if not filename:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"test_plan_hierarchical_export_{timestamp}.sqlite"
+        
+        self.logger.info(f"Exporting rows to {filename}")
+        if os.path.exists(filename):
+            os.remove(filename)
+        
+        conn = sqlite3.connect(filename)
+        try:
+            # A fresh output file needs no crash safety until it is complete
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            # Extra field columns are stored on test_cases, named as in the CSV
+            extra_columns = ''.join(', "{}" TEXT'.format(column.replace('"', '""')) for column, _ in self.extra_fields)
+            conn.executescript("""
+                CREATE TABLE plans (id TEXT PRIMARY KEY, name TEXT);
+                CREATE TABLE suites (id TEXT PRIMARY KEY, plan_id TEXT, parent_id TEXT, name TEXT, path TEXT);
+                CREATE TABLE test_cases (id TEXT PRIMARY KEY, title TEXT, created_date TEXT, created_by TEXT,
+                                         area_path TEXT, iteration TEXT, automated INTEGER{extra_columns});
+                CREATE TABLE suite_test_cases (suite_id TEXT, test_case_id TEXT, plan_id TEXT, assigned_to TEXT,
+                                               PRIMARY KEY (suite_id, test_case_id));
+                CREATE TABLE steps (test_case_id TEXT, step_number INTEGER, action TEXT, expected_result TEXT,
+                                    PRIMARY KEY (test_case_id, step_number));
+                CREATE TABLE results (suite_id TEXT, test_case_id TEXT, execution_status TEXT, outcome TEXT,
+                                      last_run_date TEXT, last_run_by TEXT, PRIMARY KEY (suite_id, test_case_id));
+            """.format(extra_columns=extra_columns))
             
-            # Get test points (execution status) for this suite
-            test_points = self.get_test_points(plan_id, suite_id)
+            inserts = {
+                'test_cases': f"INSERT OR REPLACE INTO test_cases VALUES "
+                              f"({', '.join('?' * (len(SQLITE_TEST_CASE_COLUMNS) + len(self.extra_fields)))})",
+                'suite_test_cases': "INSERT OR REPLACE INTO suite_test_cases VALUES (?, ?, ?, ?)",
+                'steps': "INSERT OR REPLACE INTO steps VALUES (?, ?, ?, ?)",
+                'results': "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+            }
+            buffers: Dict[str, List[Tuple[Any, ...]]] = {table: [] for table in inserts}
             
-            # Create a mapping of test case ID to test point status
-            test_point_map = {}
-            for point in test_points:
-                # Try different possible locations for test case ID in test points
-                tc_id = str(point.get('testCaseReference', {}).get('id', ''))
-                if not tc_id:
-                    tc_id = str(point.get('testCase', {}).get('id', ''))
-                if not tc_id:
-                    tc_id = str(point.get('workItem', {}).get('id', ''))
-                
-                if tc_id:
-                    test_point_map[tc_id] = {
-                        'status': point.get('outcome', 'Not Executed'),
-                        'lastResultOutcome': point.get('lastResultOutcome', ''),
-                        'lastResultState': point.get('lastResultState', ''),
-                        'assignedTo': point.get('assignedTo', {}).get('displayName', ''),
-                    }
-            
-            self.logger.debug(f"  Created test point mapping for {len(test_point_map)} test cases")
-            
-            # Add suite header row
-            all_hierarchical_data.append({
-                'Type': 'Suite',
-                'Test Plan ID': plan_id,
-                'Suite Path': suite_path,
-                'Suite ID': suite_id,
-                'Test Case ID': '',
-                'Title': f"SUITE: {suite_name}",
-                'Step Number': '',
-                'Step Action': '',
-                'Expected Result': '',
-                'Execution Status': '',
-                'Execution Outcome': '',
-                'Last Run Date': '',
-                'Last Run By': '',
-                'Assigned To': '',
-                'Created Date': '',
-                'Created By': '',
-                'Area Path': '',
-                'Iteration': '',
-                'Automated': ''
-            })
-            
-            suite_test_cases = 0
-            suite_test_steps = 0
-            
-            for test_case in test_cases:
-                # Extract test case ID from workItem.id
-                tc_id = str(test_case.get('workItem', {}).get('id', ''))
-                
-                # Skip if no valid test case ID
-                if not tc_id or tc_id == '':
-                    self.logger.warning(f"    No valid test case ID found in suite {suite_name}")
-                    continue
-                
-                self.logger.debug(f"    Processing test case {tc_id}")
-                
-                # Get detailed test case information including test steps
-                test_case_details = self.get_test_case_details(tc_id)
-                if not test_case_details:
-                    self.logger.warning(f"    Could not get details for test case {tc_id}")
-                    continue
-                
-                # Extract test case fields
-                fields = test_case_details.get('fields', {})
-                
-                # Get test point status for this test case
-                test_point_info = test_point_map.get(tc_id, {})
-                
-                # Get latest test result for this test case
-                latest_test_result = test_results_map.get(tc_id, {})
-                
-                # Determine the actual execution status
-                execution_status = 'Not Executed'
-                execution_outcome = ''
-                last_run_date = ''
-                last_run_by = ''
-                
-                if latest_test_result:
-                    execution_outcome = latest_test_result.get('outcome', '')
-                    execution_status = latest_test_result.get('state', 'Not Executed')
-                    last_run_date = latest_test_result.get('completedDate', '')
-                    last_run_by = latest_test_result.get('runBy', {}).get('displayName', '')
-                    self.logger.debug(f"    Test case {tc_id} has execution result: {execution_outcome}")
-                elif test_point_info.get('lastResultOutcome'):
-                    execution_outcome = test_point_info.get('lastResultOutcome', '')
-                    execution_status = test_point_info.get('lastResultState', 'Not Executed')
-                    self.logger.debug(f"    Test case {tc_id} has test point result: {execution_outcome}")
-                else:
-                    self.logger.debug(f"    Test case {tc_id} has no execution results")
-                
-                # Extract assigned to from point assignments if available
-                assigned_to = test_point_info.get('assignedTo', '')
-                if not assigned_to and test_case.get('pointAssignments'):
-                    first_assignment = test_case['pointAssignments'][0]
-                    tester = first_assignment.get('tester') if first_assignment else None
-                    if tester:
-                        assigned_to = tester.get('displayName', '')
-                
-                # Extract and parse test steps
-                test_steps_xml = fields.get('Microsoft.VSTS.TCM.Steps', '')
-                test_steps = self.parse_test_steps(test_steps_xml)
-                
-                # Flatten shared steps
-                if test_steps:
-                    original_step_count = len(test_steps)
-                    test_steps = self.flatten_shared_steps(test_steps, tc_id)
-                    if len(test_steps) != original_step_count:
-                        self.logger.debug(f"    Flattened {original_step_count} -> {len(test_steps)} steps for TC {tc_id}")
-                
-                # Add test case header row
-                test_case_data = {
-                    'Type': 'Test Case',
-                    'Test Plan ID': plan_id,
-                    'Suite Path': suite_path,
-                    'Suite ID': suite_id,
-                    'Test Case ID': tc_id,
-                    'Title': fields.get('System.Title', ''),
-                    'Step Number': '',
-                    'Step Action': '',
-                    'Expected Result': '',
-                    'Execution Status': execution_status,
-                    'Execution Outcome': execution_outcome,
-                    'Last Run Date': last_run_date,
-                    'Last Run By': last_run_by,
-                    'Assigned To': assigned_to,
-                    'Created Date': fields.get('System.CreatedDate', ''),
-                    'Created By': fields.get('System.CreatedBy', {}).get('displayName', ''),
-                    'Area Path': fields.get('System.AreaPath', ''),
-                    'Iteration': fields.get('System.IterationPath', ''),
-                    'Automated': 'Yes' if fields.get('Microsoft.VSTS.TCM.AutomatedTestName') else 'No'
-                }
-                
-                all_hierarchical_data.append(test_case_data)
-                suite_test_cases += 1
-                total_test_cases += 1
+            def flush(table: str):
+                conn.executemany(inserts[table], buffers[table])
+                buffers[table].clear()
+            
+            # Everything is inserted in bulk inside a single transaction
+            row_count = 0
+            plan_ids = set()
+            for row in itertools.chain((first_row,), rows):
+                row_count += 1
+                cells = row_cells(row, self.export_columns)
+                (row_type, plan_id, _, suite_id, test_case_id, title, step_number, step_action, expected_result,
+                 execution_status, execution_outcome, last_run_date, last_run_by, assigned_to, created_date,
+                 created_by, area_path, iteration, automated) = cells[:len(EXPORT_COLUMNS)]
                 
-                # Add test steps as sub-rows
-                for i, step in enumerate(test_steps, 1):
-                    step_data = {
-                        'Type': 'Test Step',
-                        'Test Plan ID': plan_id,
-                        'Suite Path': suite_path,
-                        'Suite ID': suite_id,
-                        'Test Case ID': tc_id,
-                        'Title': '',
-                        'Step Number': str(i),
-                        'Step Action': step.get('action', ''),
-                        'Expected Result': step.get('expected_result', ''),
-                        'Execution Status': '',
-                        'Execution Outcome': '',
-                        'Last Run Date': '',
-                        'Last Run By': '',
-                        'Assigned To': '',
-                        'Created Date': '',
-                        'Created By': '',
-                        'Area Path': '',
-                        'Iteration': '',
-                        'Automated': ''
-                    }
-                    all_hierarchical_data.append(step_data)
-                    suite_test_steps += 1
-                    total_test_steps += 1
-            
-            self.logger.info(f"  Suite {suite_name} processed: {suite_test_cases} test cases, {suite_test_steps} test steps")
-            
-            # Add blank row after each suite for better readability
-            all_hierarchical_data.append({
-                'Type': 'Separator',
-                'Test Plan ID': '',
-                'Suite Path': '',
-                'Suite ID': '',
-                'Test Case ID': '',
-                'Title': '',
-                'Step Number': '',
-                'Step Action': '',
-                'Expected Result': '',
-                'Execution Status': '',
-                'Execution Outcome': '',
-                'Last Run Date': '',
-                'Last Run By': '',
-                'Assigned To': '',
-                'Created Date': '',
-                'Created By': '',
-                'Area Path': '',
-                'Iteration': '',
-                'Automated': ''
-            })
+                if row_type == 'Test Step':
+                    buffers['steps'].append((test_case_id, int(step_number), step_action, expected_result))
+                    if len(buffers['steps']) >= SQLITE_INSERT_BATCH_SIZE:
+                        flush('steps')
+                elif row_type == 'Test Case':
+                    buffers['test_cases'].append((test_case_id, title, created_date, created_by, area_path, iteration,
+                                                  1 if automated == 'Yes' else 0) + cells[len(EXPORT_COLUMNS):])
+                    buffers['suite_test_cases'].append((suite_id, test_case_id, plan_id, assigned_to))
+                    buffers['results'].append((suite_id, test_case_id, execution_status, execution_outcome,
+                                               last_run_date, last_run_by))
+                    if len(buffers['test_cases']) >= SQLITE_INSERT_BATCH_SIZE:
+                        for table in ('test_cases', 'suite_test_cases', 'results'):
+                            flush(table)
+                elif row_type == 'Suite':
+                    plan_ids.add(plan_id)
+            for table in inserts:
+                flush(table)
+            
+            # Plans and the full suite tree of each, including suites without test cases
+            for plan_id in sorted(plan_ids):
+                plan_name, test_suites = self._exported_plans.get(plan_id, ('', []))
+                conn.execute("INSERT OR REPLACE INTO plans VALUES (?, ?)", (plan_id, plan_name))
+                suite_tree = SuiteTree(test_suites, self.logger)
+                conn.executemany("INSERT OR REPLACE INTO suites VALUES (?, ?, ?, ?, ?)", (
+                    (suite_id, plan_id, str((suite_tree[suite_id].get('parentSuite') or {}).get('id', '')) or None,
+                     suite_tree[suite_id].get('name', ''), suite_tree.full_path(suite_id))
+                    for suite_id in suite_tree.ids()))
+            
+            # Indexes are built once the data is in, which is faster than maintaining them on every insert
+            conn.executescript("""
+                CREATE INDEX idx_suites_plan_id ON suites (plan_id);
+                CREATE INDEX idx_suites_parent_id ON suites (parent_id);
+                CREATE INDEX idx_test_cases_area_path ON test_cases (area_path);
+                CREATE INDEX idx_suite_test_cases_test_case_id ON suite_test_cases (test_case_id);
+                CREATE INDEX idx_results_test_case_id ON results (test_case_id);
+                CREATE INDEX idx_results_outcome ON results (outcome);
+            """)
+            conn.commit()
+            
+            self.logger.info(f"Successfully exported {row_count} rows of hierarchical test data to {filename}")
+            file_size = os.path.getsize(filename)
+            self.logger.info(f"Output file size: {file_size:,} bytes ({file_size/1024/1024:.2f} MB)")
+            return row_count
         
-        self.logger.info(f"Extraction complete: {total_test_cases} test cases, {total_test_steps} test steps")
-        self.logger.info(f"Total hierarchical data rows: {len(all_hierarchical_data)}")
-        return all_hierarchical_data
-    
-    def export_hierarchical_to_csv(self, hierarchical_data: List[Dict[str, Any]], filename: str = None):
-        """Export hierarchical test data to CSV file"""
-        if not hierarchical_data:
+        except Exception as e:
+            self.logger.error(f"Error writing SQLite database: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def export_hierarchical_to_jsonl(self, hierarchical_data: Iterable[Mapping[str, str]], filename: str = None) -> int:
+        """Export hierarchical test data to JSON Lines, one record per row as rows are produced; returns the record count.
+        
+        Records carry the CSV columns as keys. The blank separator rows between suites are left out.
+        """
+        rows = iter(hierarchical_data)
+        first_row = next(rows, None)
+        if first_row is None:
             self.logger.error("No test data to export")
-            return
+            return 0
         
         if not filename:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"test_plan_hierarchical_export_{timestamp}.csv"
-        
-        self.logger.info(f"Exporting {len(hierarchical_data)} rows to {filename}")
+            filename = f"test_plan_hierarchical_export_{timestamp}.jsonl"
         
-        fieldnames = [
-            'Type', 'Test Plan ID', 'Suite Path', 'Suite ID', 'Test Case ID', 
-            'Title', 'Step Number', 'Step Action', 'Expected Result',
-            'Execution Status', 'Execution Outcome', 'Last Run Date',
-            'Last Run By', 'Assigned To', 'Created Date', 
-            'Created By', 'Area Path', 'Iteration', 'Automated'
-        ]
+        self.logger.info(f"Exporting rows to {filename}")
         
         try:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(hierarchical_data)
+            row_count = 0
+            with open(filename, 'w', encoding='utf-8') as jsonl_file:
+                for row in itertools.chain((first_row,), rows):
+                    cells = row_cells(row, self.export_columns)
+                    if cells[0] == 'Separator':
+                        # Flush at suite boundaries so a partial export is readable while it runs
+                        jsonl_file.flush()
+                        continue
+                    jsonl_file.write(json.dumps(dict(zip(self.export_columns, cells)), ensure_ascii=False))
+                    jsonl_file.write('\n')
+                    row_count += 1
             
-            self.logger.info(f"Successfully exported hierarchical test data to {filename}")
-            
-            # Log file size
+            self.logger.info(f"Successfully exported {row_count} records of hierarchical test data to {filename}")
             file_size = os.path.getsize(filename)
             self.logger.info(f"Output file size: {file_size:,} bytes ({file_size/1024/1024:.2f} MB)")
+            return row_count
+        
+        except Exception as e:
+            self.logger.error(f"Error writing JSON Lines file: {e}")
+            raise
+
+    def export_hierarchical_to_parquet(self, hierarchical_data: Iterable[Mapping[str, str]], filename: str = None) -> int:
+        """Export hierarchical test data to a Parquet file with the CSV columns; returns the record count.
+        
+        Rows are written in row groups of PARQUET_ROW_GROUP_SIZE as they are produced, so memory stays bounded,
+        and the repetitive columns in PARQUET_DICTIONARY_COLUMNS are dictionary encoded. The blank separator rows
+        between suites are left out.
+        """
+        if pyarrow is None:
+            raise ImportError("The parquet output format requires pyarrow: pip install pyarrow")
+        
+        rows = iter(hierarchical_data)
+        first_row = next(rows, None)
+        if first_row is None:
+            self.logger.error("No test data to export")
+            return 0
+        
+        if not filename:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"test_plan_hierarchical_export_{timestamp}.parquet"
+        
+        self.logger.info(f"Exporting rows to {filename}")
+        
+        schema = pyarrow.schema([(column, pyarrow.string()) for column in self.export_columns])
+        try:
+            row_count = 0
+            row_group: List[Tuple[str, ...]] = []
+            with pyarrow.parquet.ParquetWriter(filename, schema, compression='zstd',
+                                               use_dictionary=PARQUET_DICTIONARY_COLUMNS) as writer:
+                def write_row_group():
+                    # Transpose the buffered rows into one array per column
+                    columns = [pyarrow.array(values, type=pyarrow.string()) for values in zip(*row_group)]
+                    writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+                    row_group.clear()
+                
+                for row in itertools.chain((first_row,), rows):
+                    cells = row_cells(row, self.export_columns)
+                    if cells[0] == 'Separator':
+                        continue
+                    row_group.append(cells)
+                    row_count += 1
+                    if len(row_group) >= PARQUET_ROW_GROUP_SIZE:
+                        write_row_group()
+                if row_group:
+                    write_row_group()
             
+            self.logger.info(f"Successfully exported {row_count} records of hierarchical test data to {filename}")
+            file_size = os.path.getsize(filename)
+            self.logger.info(f"Output file size: {file_size:,} bytes ({file_size/1024/1024:.2f} MB)")
+            return row_count
+        
         except Exception as e:
-            self.logger.error(f"Error writing CSV file: {e}")
+            self.logger.error(f"Error writing Parquet file: {e}")
             raise
 
+_worker_steps_parser: Optional[AzureTestPlanExporter] = None
+
+def _parse_steps_in_worker(test_steps_xml: str) -> List[Dict[str, str]]:
+    """Parse one test steps XML document in a --parse-workers process"""
+    global _worker_steps_parser
+    if _worker_steps_parser is None:
+        # Only the parsing methods are used, so skip the HTTP session and logging setup of __init__
+        _worker_steps_parser = AzureTestPlanExporter.__new__(AzureTestPlanExporter)
+        _worker_steps_parser.debug = False
+        _worker_steps_parser.profiler = None
+        _worker_steps_parser.logger = logging.getLogger('AzureTestPlanExporter')
+    return _worker_steps_parser._parse_test_steps_xml(test_steps_xml)
+
+class RequestThrottle:
+    """Client-side throttling shared by concurrent requests.
+    
+    Limits requests in flight to an adaptive limit that is halved when the server throttles or its rate-limit
+    headers show pressure, and grows back by one after a limit's worth of successful responses. A Retry-After
+    header pauses every request until it has passed.
+    """
+    
+    def __init__(self, max_limit: int, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger('AzureTestPlanExporter')
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.retries = 0
+        self.failed_requests = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+    
+    def __enter__(self):
+        pause = self.pause_remaining()
+        if pause > 0:
+            time.sleep(pause)
+        with self._condition:
+            self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+    
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+    
+    def pause_remaining(self) -> float:
+        """Seconds left of the pause requested by the last Retry-After header"""
+        return max(0.0, self.paused_until - time.monotonic())
+    
+    def record(self, status_code: int, headers: Dict[str, str]):
+        """Adapt the concurrency limit and pause to a response's status and rate-limit headers"""
+        retry_after = self._retry_after(headers)
+        with self._condition:
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            if status_code in RETRY_STATUS_CODES:
+                self.retries += 1
+            
+            if status_code in (429, 503) or retry_after or self._under_pressure(headers):
+                self._decrease()
+            elif status_code < 400:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+                    self._condition.notify_all()
+    
+    def record_failure(self):
+        """Count a request that failed even after retrying, so its data is missing from the export"""
+        with self._condition:
+            self.failed_requests += 1
+    
+    def retry_delay(self, attempt: int, headers: Optional[Dict[str, str]] = None) -> float:
+        """Seconds to wait before the next attempt: Retry-After if given, else exponential backoff with jitter"""
+        retry_after = self._retry_after(headers or {})
+        if retry_after:
+            return retry_after + random.uniform(0, 1)
+        backoff = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt)
+        return backoff / 2 + random.uniform(0, backoff / 2)
+    
+    def _decrease(self):
+        # Back off at most once a second, so one burst of throttled responses does not collapse the limit
+        now = time.monotonic()
+        if self.limit > 1 and now - self._last_decrease >= 1.0:
+            self.limit = max(1, self.limit // 2)
+            self._last_decrease = now
+            self.logger.warning(f"Server is throttling requests, reducing concurrency to {self.limit}")
+        self._successes = 0
+    
+    def _retry_after(self, headers: Dict[str, str]) -> float:
+        value = headers.get('Retry-After') if headers else None
+        if not value:
+            return 0.0
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return 0.0
+    
+    def _under_pressure(self, headers: Dict[str, str]) -> bool:
+        try:
+            if float(headers.get('X-RateLimit-Delay') or 0) > 0:
+                return True
+            remaining, limit = headers.get('X-RateLimit-Remaining'), headers.get('X-RateLimit-Limit')
+            return bool(remaining and limit) and float(remaining) < float(limit) * RATE_LIMIT_PRESSURE_RATIO
+        except ValueError:
+            return False
+
+class AsyncExtractionEngine:
+    """Asyncio fetch backend for AzureTestPlanExporter.
+    
+    Fetches the same endpoints as the thread-based path with up to ``exporter.workers`` requests in flight,
+    multiplexed over HTTP/2 when the h2 package is installed, then builds rows with the exporter's own
+    row-building code so the output is identical.
+    """
+    
+    def __init__(self, exporter: AzureTestPlanExporter):
+        if httpx is None:
+            raise ImportError("The async engine requires httpx: pip install 'httpx[http2]'")
+        
+        self.exporter = exporter
+        self.logger = exporter.logger
+        self.max_concurrency = exporter.workers
+        self.throttle = exporter.throttle
+        self.http2 = importlib.util.find_spec('h2') is not None
+    
+    def iter_test_data_hierarchical(self, plan_id: str) -> Iterator[ExportRow]:
+        """Extract all test data from a test plan in hierarchical format, yielding rows as each suite completes"""
+        loop = asyncio.new_event_loop()
+        suite_batches = self.iter_suite_rows(plan_id)
+        try:
+            while True:
+                try:
+                    suite_rows = loop.run_until_complete(suite_batches.__anext__())
+                except StopAsyncIteration:
+                    break
+                yield from suite_rows
+        finally:
+            loop.run_until_complete(suite_batches.aclose())
+            loop.close()
+    
+    async def make_request(self, url: str) -> Dict[Any, Any]:
+        """Make authenticated request to Azure DevOps API, returning {} on failure like the sync path"""
+        return (await self._request(url))[0]
+    
+    async def _acquire(self):
+        """Wait out any Retry-After pause, then for a request slot under the adaptive concurrency limit"""
+        pause = self.throttle.pause_remaining()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        async with self.slots:
+            await self.slots.wait_for(lambda: self.in_flight < min(self.max_concurrency, self.throttle.limit))
+            self.in_flight += 1
+    
+    async def _release(self):
+        async with self.slots:
+            self.in_flight -= 1
+            self.slots.notify_all()
+    
+    async def _request(self, url: str) -> Tuple[Dict[Any, Any], Dict[str, str]]:
+        """Make authenticated request to Azure DevOps API, returning the JSON body and response headers.
+        
+        Throttled and transient failures are retried with backoff, honouring Retry-After, and large bodies are
+        decoded as they download, like the sync path.
+        """
+        self.logger.debug(f"Making async request to: {url}")
+        max_retries = self.exporter.max_retries
+        attempt = 0
+        while True:
+            try:
+                await self._acquire()
+                try:
+                    request_started = time.perf_counter()
+                    json_response = None
+                    async with self.client.stream('GET', url) as response:
+                        if response.status_code == 200 and is_large_response(response.headers,
+                                                                             self.exporter.stream_decode_min_bytes):
+                            decoder = JsonStreamDecoder()
+                            async for chunk in response.aiter_bytes(STREAM_DECODE_CHUNK_SIZE):
+                                decoder.feed(chunk)
+                            json_response = decoder.finish()
+                        else:
+                            await response.aread()
+                finally:
+                    await self._release()
+                # Bytes on the wire, which are compressed when the server supports it
+                self.exporter.metrics.record_request(url, time.perf_counter() - request_started,
+                                                     response.num_bytes_downloaded, response.status_code)
+                self.logger.debug(f"Response status code: {response.status_code} ({response.http_version})")
+                
+                self.throttle.record(response.status_code, response.headers)
+                if response.status_code in RETRY_STATUS_CODES and attempt < max_retries:
+                    delay = self.throttle.retry_delay(attempt, response.headers)
+                    self.logger.warning(f"HTTP {response.status_code} for {url}, retrying in {delay:.1f}s "
+                                        f"(attempt {attempt + 1} of {max_retries})")
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                
+                response.raise_for_status()
+                if json_response is None:
+                    json_response = decode_json(response.content)
+                return json_response, response.headers
+            
+            except httpx.HTTPStatusError as e:
+                self.logger.error(f"HTTP error for {url}: {e}")
+                self.logger.error(f"Response text: {e.response.text[:1000]}")
+                # Missing work items are expected; anything else leaves the export incomplete
+                if e.response.status_code != 404:
+                    self.throttle.record_failure()
+                if e.response.status_code == AUTH_FAILURE_STATUS_CODE:
+                    raise AuthenticationError(f"HTTP {e.response.status_code} for {url}, the PAT is invalid "
+                                              f"or has expired") from e
+                return {}, {}
+            except (httpx.TransportError, httpx.DecodingError) as e:
+                # Transport errors include bodies cut off mid-transfer (RemoteProtocolError)
+                self.exporter.metrics.record_request(url, time.perf_counter() - request_started, 0, None)
+                if attempt < max_retries:
+                    delay = self.throttle.retry_delay(attempt)
+                    self.logger.warning(f"Request error for {url}: {e}, retrying in {delay:.1f}s "
+                                        f"(attempt {attempt + 1} of {max_retries})")
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                self.logger.error(f"Request error for {url}: {e}")
+                self.throttle.record_failure()
+                return {}, {}
+            except httpx.HTTPError as e:
+                self.logger.error(f"Request error for {url}: {e}")
+                self.throttle.record_failure()
+                return {}, {}
+            except json.JSONDecodeError as e:
+                self.logger.error(f"JSON decode error for {url}: {e}")
+                self.throttle.record_failure()
+                return {}, {}
+    
+    async def timed(self, phase: str, awaitable: Awaitable[Any]) -> Any:
+        """Await a fetch, timing it as one call of an extraction phase; concurrent fetches overlap"""
+        with self.exporter.metrics.phase(phase):
+            return await awaitable
+    
+    async def iter_pages(self, url: str, page_size: Optional[int] = None) -> AsyncIterator[List[Dict[Any, Any]]]:
+        """Yield each page of a list endpoint, following continuation tokens or $top/$skip paging"""
+        skip = 0
+        continuation_token = None
+        seen_tokens: Set[str] = set()
+        previous_page = None
+        while skip is not None:
+            response, headers = await self._request(self.exporter._page_url(url, page_size, skip, continuation_token))
+            page = response.get('value', []) or []
+            if self.exporter._repeats_previous_page(url, page, previous_page):
+                return
+            yield page
+            previous_page = page
+            skip, continuation_token = self.exporter._next_page(url, page_size, skip, len(page), headers, seen_tokens)
+    
+    async def get_values(self, url: str, page_size: Optional[int] = None) -> List[Dict[Any, Any]]:
+        """Get the items of a list endpoint across all of its pages"""
+        values = []
+        async for page in self.iter_pages(url, page_size):
+            values.extend(page)
+        return values
+    
+    async def get_latest_results_for_run(self, run_id: str) -> Tuple[Dict[str, 'TestResultRecord'], int]:
+        """Read a run's results page by page, keeping only the latest compact result per test case"""
+        latest = {}
+        total_results = 0
+        async for page in self.iter_pages(self.exporter._test_results_url(run_id), TEST_RESULTS_PAGE_SIZE):
+            total_results += self.exporter._reduce_latest_results(page, latest)
+        return latest, total_results
+    
+    async def get_work_items_batch(self, work_item_ids: List[str]) -> Dict[str, Dict[Any, Any]]:
+        """Get multiple work items with all batches in flight at once, keyed by work item ID"""
+        unique_ids = list(dict.fromkeys(str(wi_id) for wi_id in work_item_ids if wi_id))
+        batches = [unique_ids[start:start + WORK_ITEM_BATCH_SIZE]
+                   for start in range(0, len(unique_ids), WORK_ITEM_BATCH_SIZE)]
+        
+        work_items = {}
+        for batch_work_items in await asyncio.gather(*(self._get_work_items_chunk(batch_ids) for batch_ids in batches)):
+            work_items.update(batch_work_items)
+        return work_items
+    
+    async def _get_work_items_chunk(self, batch_ids: List[str]) -> Dict[str, Dict[Any, Any]]:
+        """Get one batch of work items, serving current revisions from the work item cache when configured"""
+        exporter = self.exporter
+        work_items = {}
+        
+        if exporter.work_item_cache:
+            if exporter._changed_work_item_ids is not None:
+                work_items, batch_ids = exporter._lookup_unchanged_work_items(batch_ids)
+            else:
+                revisions_response = await self.make_request(exporter._work_item_revisions_url(batch_ids))
+                work_items, batch_ids = exporter._lookup_cached_work_items(batch_ids, revisions_response)
+            if not batch_ids:
+                return work_items
+        
+        fetched = exporter._work_items_from_response(await self.make_request(exporter._work_items_batch_url(batch_ids)))
+        if exporter.work_item_cache:
+            exporter.work_item_cache.put_many(fetched.values())
+        work_items.update(fetched)
+        return work_items
+    
+    async def fetch_suite_data(self, plan_id: str, suite_id: str) -> Tuple[List[Dict[Any, Any]], List[Dict[Any, Any]], Dict[str, Dict[Any, Any]], Dict[str, List[Dict[str, str]]]]:
+        """Fetch test cases, test points and test case details for a single suite, with the test cases' parsed steps"""
+        exporter = self.exporter
+        test_cases, test_points = await asyncio.gather(
+            self.timed('suite_test_cases', self.get_values(exporter._test_cases_url(plan_id, suite_id))),
+            self.timed('suite_test_points', self.get_values(exporter._test_points_url(plan_id, suite_id))))
+        if not test_cases:
+            return [], [], {}, {}
+        
+        test_case_ids = exporter._suite_case_ids(test_cases)
+        test_case_details_map = await self.timed('test_case_details', self.get_work_items_batch(test_case_ids))
+        for test_case_id in test_case_ids:
+            if test_case_id not in test_case_details_map:
+                self.logger.warning(f"Failed to retrieve details for test case {test_case_id}")
+        
+        # Parse the test cases' steps and resolve the shared steps they reference before the suite's rows are built
+        parsed_steps = await self.prefetch_shared_steps(test_case_details_map)
+        
+        return test_cases, test_points, test_case_details_map, parsed_steps
+    
+    async def prefetch_shared_steps(self, work_items: Dict[str, Dict[Any, Any]]) -> Dict[str, List[Dict[str, str]]]:
+        """Fetch every not yet cached shared steps work item reachable from the given work items, keyed by ID, level
+        by level, returning their parsed steps for building rows.
+        
+        The fetches are timed as shared_steps and the parsing, by _parse_work_item_steps, as step_parsing.
+        """
+        exporter = self.exporter
+        
+        parsed_steps = await self.parse_work_item_steps(work_items)
+        pending = set(exporter._shared_step_refs(parsed_steps.values()))
+        while pending:
+            with exporter._shared_steps_lock:
+                batch_ids = sorted(pending - exporter._shared_steps_work_items.keys())
+            if not batch_ids:
+                break
+            
+            self.logger.debug(f"Prefetching {len(batch_ids)} shared steps work items")
+            shared_steps = await self.timed('shared_steps', self.get_work_items_batch(batch_ids))
+            shared_parsed_steps = await self.parse_work_item_steps(shared_steps)
+            exporter._store_shared_steps(batch_ids, shared_steps, shared_parsed_steps)
+            pending = set(exporter._shared_step_refs(shared_parsed_steps.values()))
+        return parsed_steps
+    
+    async def parse_work_item_steps(self, work_items: Dict[str, Dict[Any, Any]]) -> Dict[str, List[Dict[str, str]]]:
+        """Parse the test steps of work items keyed by ID, off the event loop with parse workers"""
+        if self.exporter._parse_pool:
+            parse_work_item_steps = self.exporter._parse_work_item_steps
+            if self.exporter.profiler:
+                parse_work_item_steps = functools.partial(self.exporter.profiler.run, parse_work_item_steps)
+            return await asyncio.get_running_loop().run_in_executor(None, parse_work_item_steps, dict(work_items))
+        return self.exporter._parse_work_item_steps(work_items)
+    
+    async def iter_suite_rows(self, plan_id: str) -> AsyncIterator[List[ExportRow]]:
+        """Extract all test data from a test plan, yielding each suite's rows in sorted suite order"""
+        exporter = self.exporter
+        self.logger.info(f"Starting async hierarchical extraction for Test Plan ID: {plan_id} "
+                         f"(max {self.max_concurrency} concurrent requests, HTTP/2: {self.http2})")
+        export_failed_requests = exporter.throttle.failed_requests
+        export_started, changed_since = exporter._begin_incremental_export()
+        if exporter.checkpoint:
+            export_started = exporter.checkpoint.begin(export_started)
+        resumed_test_results = exporter.checkpoint.test_results if exporter.checkpoint else None
+        run_listings = []
+        if resumed_test_results is None:
+            run_listings = exporter._test_run_listings(plan_id, changed_since, export_started)
+        results_failed_requests = exporter.throttle.failed_requests
+        
+        self.slots = asyncio.Condition()
+        self.in_flight = 0
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        async with httpx.AsyncClient(headers=exporter.headers, http2=self.http2, limits=limits,
+                                     timeout=httpx.Timeout(60.0)) as client:
+            self.client = client
+            
+            test_plan, test_suites, run_pages = await asyncio.gather(
+                self.timed('plan_and_suites', self.make_request(exporter._test_plan_url(plan_id))),
+                self.timed('plan_and_suites', self.get_values(exporter._test_suites_url(plan_id))),
+                self.timed('runs_and_results', asyncio.gather(
+                    *(self.get_values(url, page_size) for url, page_size in run_listings))))
+            # Adjacent query windows share their boundary, so a run can be listed twice
+            test_runs = list({str(run.get('id', '')): run for runs in run_pages for run in runs}.values())
+            
+            if not test_plan:
+                self.logger.error(f"Could not retrieve test plan {plan_id}")
+                return
+            self.logger.info(f"Test Plan: {test_plan.get('name', 'Unknown')}")
+            
+            if not test_suites:
+                self.logger.error(f"No test suites found for plan {plan_id}")
+                return
+            self.logger.info(f"Found {len(test_suites)} test suites")
+            exporter._exported_plans[str(plan_id)] = (test_plan.get('name', 'Unknown'), test_suites)
+            exporter._phase_boundary(f"plan {plan_id}: plan and suites fetched")
+            if resumed_test_results is not None:
+                self.logger.info(f"Using the checkpointed test results of {len(resumed_test_results)} test cases")
+            elif exporter.execution_source == 'points':
+                self.logger.info("Using test point results as execution history, skipping test runs")
+            else:
+                self.logger.info(f"Found {len(test_runs)} test runs")
+            
+            sorted_suites = exporter._organize_suites(test_suites)
+            if not sorted_suites:
+                return
+            
+            run_ids = [str(run.get('id', '')) for run in test_runs if str(run.get('id', ''))]
+            
+            # Run results are fetched while the first suites are already in flight
+            results_task = asyncio.ensure_future(self.timed('runs_and_results', asyncio.gather(
+                *(self.get_latest_results_for_run(run_id) for run_id in run_ids))))
+            pending = deque()
+            test_results_map = None
+            total_rows = 0
+            total_test_cases = 0
+            total_test_steps = 0
+            
+            try:
+                suites = iter(sorted_suites)
+                while True:
+                    # Keep a bounded window of suites in flight, consumed in sorted order
+                    for suite_info in suites:
+                        # Suites journaled by an interrupted export are replayed rather than fetched
+                        suite_id = str(suite_info['suite'].get('id', ''))
+                        completed_rows = exporter.checkpoint.completed_rows(suite_id) if exporter.checkpoint else None
+                        suite_task = None
+                        if completed_rows is None:
+                            suite_task = asyncio.ensure_future(self.fetch_suite_data(plan_id, suite_id))
+                        pending.append((suite_info, suite_task, exporter.throttle.failed_requests))
+                        if len(pending) >= self.max_concurrency:
+                            break
+                    if not pending:
+                        break
+                    
+                    if test_results_map is None:
+                        run_results = await results_task
+                        if resumed_test_results is not None:
+                            test_results_map = resumed_test_results
+                        else:
+                            test_results_map = exporter._build_test_results_map(
+                                run_results, exporter._initial_test_results_map(changed_since))
+                            exporter._checkpoint_test_results(test_results_map, results_failed_requests)
+                        exporter._phase_boundary(f"plan {plan_id}: runs and results fetched")
+                    
+                    suite_info, suite_task, failed_requests = pending.popleft()
+                    suite_id = str(suite_info['suite'].get('id', ''))
+                    if suite_task is None:
+                        suite_rows = exporter.checkpoint.completed_rows(suite_id)
+                        suite_test_cases, suite_test_steps = exporter._count_suite_rows(suite_rows)
+                    else:
+                        test_cases, test_points, test_case_details_map, parsed_steps = await suite_task
+                        suite_rows, suite_test_cases, suite_test_steps = exporter._build_suite_rows(
+                            plan_id, suite_info, test_cases, test_points, test_case_details_map, test_results_map,
+                            parsed_steps)
+                        exporter._checkpoint_suite(suite_id, suite_rows, failed_requests)
+                    
+                    total_rows += len(suite_rows)
+                    total_test_cases += suite_test_cases
+                    total_test_steps += suite_test_steps
+                    if suite_rows:
+                        yield suite_rows
+            finally:
+                # Abandoned iteration leaves fetches in flight; cancel them before the client closes
+                results_task.cancel()
+                for _, suite_task, _ in pending:
+                    if suite_task:
+                        suite_task.cancel()
+        
+        exporter._finish_incremental_export(export_started, test_results_map, export_failed_requests)
+        exporter._phase_boundary(f"plan {plan_id}: suites extracted")
+        
+        self.logger.info(f"Extraction complete: {total_test_cases} test cases, {total_test_steps} test steps")
+        self.logger.info(f"Total hierarchical data rows: {total_rows}")
+
+class WorkItemCache:
+    """On-disk cache of raw work item payloads, validated against the current work item revision.
+    
+    Payloads are stored zlib-compressed in a SQLite database inside ``directory``, one row per work item
+    holding its latest fetched revision. Entries unused for ``max_age_days`` are dropped, and the least
+    recently used entries are evicted once the stored payloads exceed ``max_size_mb``. Payloads hold only the
+    ``fields`` they were fetched with, so the cache is cleared when different fields are requested.
+    """
+    
+    DB_FILENAME = 'work_items.sqlite3'
+    
+    def __init__(self, directory: str, max_size_mb: float = 1024, max_age_days: float = 30,
+                 logger: Optional[logging.Logger] = None, fields: Optional[List[str]] = None):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, self.DB_FILENAME)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_days * 24 * 60 * 60
+        self.logger = logger or logging.getLogger('AzureTestPlanExporter')
+        self.hits = 0
+        self.misses = 0
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS work_items (
+            id INTEGER PRIMARY KEY,
+            rev INTEGER NOT NULL,
+            payload BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            last_used REAL NOT NULL
+        )''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_work_items_last_used ON work_items (last_used)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS cache_info (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self._conn.commit()
+        
+        self.logger.info(f"Using work item cache: {self.path}")
+        if fields is not None:
+            self._use_fields(fields)
+        self.evict()
+    
+    def _use_fields(self, fields: List[str]):
+        """Clear the cache if its payloads were fetched with other fields than the ones now requested"""
+        fields_key = ','.join(sorted(fields))
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM cache_info WHERE key = 'fields'").fetchone()
+            if row and row[0] == fields_key:
+                return
+            removed = self._conn.execute("DELETE FROM work_items").rowcount
+            self._conn.execute("INSERT OR REPLACE INTO cache_info VALUES ('fields', ?)", (fields_key,))
+            self._conn.commit()
+        if removed:
+            self.logger.info(f"Cleared {removed} work item cache entries fetched with different fields")
+    
+    def get_many(self, revisions: Dict[str, Any]) -> Dict[str, Dict[Any, Any]]:
+        """Get the cached payloads whose revision matches the given current revisions, keyed by work item ID"""
+        cached = {}
+        ids = [int(wi_id) for wi_id in revisions]
+        now = time.time()
+        
+        with self._lock:
+            # Stay well below SQLite's bound parameter limit
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT id, rev, payload FROM work_items WHERE id IN ({placeholders})", chunk).fetchall()
+                for wi_id, rev, payload in rows:
+                    # A revision of None accepts whatever revision is cached
+                    expected_rev = revisions[str(wi_id)]
+                    if expected_rev is None or rev == expected_rev:
+                        cached[str(wi_id)] = json.loads(zlib.decompress(payload))
+            
+            if cached:
+                self._conn.executemany("UPDATE work_items SET last_used = ? WHERE id = ?",
+                                       [(now, int(wi_id)) for wi_id in cached])
+                self._conn.commit()
+            
+            self.hits += len(cached)
+            self.misses += len(ids) - len(cached)
+        
+        return cached
+    
+    def put_many(self, work_items: Iterable[Dict[Any, Any]]):
+        """Store work item payloads, replacing any older revision"""
+        now = time.time()
+        rows = []
+        for work_item in work_items:
+            rev = work_item.get('rev', work_item.get('fields', {}).get('System.Rev'))
+            if work_item.get('id') is None or rev is None:
+                continue
+            payload = zlib.compress(json.dumps(work_item).encode('utf-8'))
+            rows.append((int(work_item['id']), rev, payload, len(payload), now))
+        
+        if rows:
+            with self._lock:
+                self._conn.executemany("INSERT OR REPLACE INTO work_items (id, rev, payload, size, last_used) "
+                                       "VALUES (?, ?, ?, ?, ?)", rows)
+                self._conn.commit()
+    
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones until under the size limit; returns entries removed"""
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM work_items WHERE last_used < ?",
+                                         (time.time() - self.max_age_seconds,)).rowcount
+            
+            total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM work_items").fetchone()[0]
+            if total_size > self.max_size_bytes:
+                evict_ids = []
+                for wi_id, size in self._conn.execute("SELECT id, size FROM work_items ORDER BY last_used"):
+                    if total_size <= self.max_size_bytes:
+                        break
+                    evict_ids.append((wi_id,))
+                    total_size -= size
+                self._conn.executemany("DELETE FROM work_items WHERE id = ?", evict_ids)
+                removed += len(evict_ids)
+            
+            self._conn.commit()
+        
+        if removed:
+            self.logger.info(f"Evicted {removed} entries from work item cache")
+        return removed
+    
+    def close(self):
+        """Apply eviction limits and close the cache database"""
+        self.evict()
+        self.logger.info(f"Work item cache: {self.hits} hits, {self.misses} misses")
+        with self._lock:
+            self._conn.close()
+
+class IncrementalExportState:
+    """Watermark and latest test results recorded by the previous incremental export of a test plan"""
+    
+    def __init__(self, directory: str, plan_id: str, logger: Optional[logging.Logger] = None):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"incremental_plan_{plan_id}.json")
+        self.logger = logger or logging.getLogger('AzureTestPlanExporter')
+        self.watermark: Optional[datetime] = None
+        self.test_results: Dict[str, TestResultRecord] = {}
+        
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding='utf-8') as state_file:
+                    state = json.load(state_file)
+                self.watermark = datetime.fromisoformat(state['watermark'].replace('Z', '+00:00'))
+                self.test_results = {test_case_id: TestResultRecord(*record)
+                                     for test_case_id, record in state.get('test_results', {}).items()}
+                self.logger.info(f"Loaded incremental export state from {self.path}")
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                self.logger.warning(f"Ignoring unreadable incremental export state {self.path}: {e}")
+    
+    def save(self, watermark: datetime, test_results: Dict[str, TestResultRecord]):
+        """Atomically replace the stored state"""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as state_file:
+            json.dump({'watermark': format_utc(watermark), 'test_results': test_results}, state_file)
+        os.replace(temp_path, self.path)
+        self.watermark = watermark
+        self.test_results = test_results
+
+class ExportCheckpoint:
+    """Journal of the suites of a test plan already extracted, so an interrupted export can resume.
+    
+    The journal is a JSON Lines file: a header with the export settings and start time, the latest test results
+    once they are built, then one entry per completed suite holding its rows. Entries are flushed to disk as they
+    are appended, and a torn last line left by a crash is ignored. Resuming with different settings starts over.
+    """
+    
+    def __init__(self, directory: str, plan_id: str, settings: Dict[str, Any], resume: bool = False,
+                 logger: Optional[logging.Logger] = None):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"checkpoint_plan_{plan_id}.jsonl")
+        self.settings = settings
+        self.logger = logger or logging.getLogger('AzureTestPlanExporter')
+        self.started: Optional[datetime] = None
+        self.test_results: Optional[Dict[str, TestResultRecord]] = None
+        self.suite_rows: Dict[str, List[ExportRow]] = {}
+        self._journal = None
+        self._valid_length = 0
+        self._lock = threading.Lock()
+        
+        if resume and os.path.exists(self.path):
+            self._load()
+        elif resume:
+            self.logger.info(f"No checkpoint found at {self.path}, starting from the beginning")
+    
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as journal:
+                lines = journal.read().split(b'\n')
+            header = json.loads(lines[0])
+            if header.get('settings') != self.settings:
+                self.logger.warning(f"Checkpoint {self.path} was written with different settings, starting over")
+                return
+            started = datetime.fromisoformat(header['started'].replace('Z', '+00:00'))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.warning(f"Ignoring unreadable checkpoint {self.path}: {e}")
+            return
+        
+        self.started = started
+        self._valid_length = len(lines[0]) + 1
+        for line in lines[1:]:
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Only the last entry can be torn, by a crash while it was being written
+                self.logger.warning(f"Ignoring an incomplete entry at the end of checkpoint {self.path}")
+                break
+            self._valid_length += len(line) + 1
+            if 'test_results' in entry:
+                self.test_results = {test_case_id: TestResultRecord(*record)
+                                     for test_case_id, record in entry['test_results'].items()}
+            else:
+                self.suite_rows[entry['suite_id']] = [ExportRow(tuple(cells)) for cells in entry['rows']]
+        self.logger.info(f"Resuming from checkpoint {self.path}: {len(self.suite_rows)} suites already extracted")
+    
+    def begin(self, started: datetime) -> datetime:
+        """Open the journal for appending, returning when the checkpointed export originally started"""
+        with self._lock:
+            if self.started is not None:
+                # Drop any torn entry so new entries follow the last complete one
+                length = min(self._valid_length, os.path.getsize(self.path))
+                os.truncate(self.path, length)
+                self._journal = open(self.path, 'a', encoding='utf-8')
+                if length < self._valid_length:
+                    self._journal.write('\n')
+            else:
+                self.started = started
+                self._journal = open(self.path, 'w', encoding='utf-8')
+                self._append({'settings': self.settings, 'started': format_utc(started)})
+        return self.started
+    
+    def completed_rows(self, suite_id: str) -> Optional[List[ExportRow]]:
+        """Rows of a suite extracted before the export was interrupted, or None when it still has to be extracted"""
+        return self.suite_rows.get(suite_id)
+    
+    def record_test_results(self, test_results: Dict[str, TestResultRecord]):
+        with self._lock:
+            self.test_results = test_results
+            self._append({'test_results': test_results})
+    
+    def record_suite(self, suite_id: str, rows: List[ExportRow]):
+        with self._lock:
+            self._append({'suite_id': suite_id, 'rows': [row_cells(row) for row in rows]})
+    
+    def _append(self, entry: Dict[str, Any]):
+        self._journal.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+    
+    def close(self):
+        with self._lock:
+            if self._journal:
+                self._journal.close()
+                self._journal = None
+    
+    def delete(self):
+        """Remove the journal once the export it covers has been written completely"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.logger.info(f"Removed checkpoint {self.path}")
+
+class SuiteTree:
+    """Test suites of a plan indexed by ID, with parent/child links and memoized hierarchy paths"""
+    
+    def __init__(self, suites: List[Dict[Any, Any]], logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger('AzureTestPlanExporter')
+        self._suites: Dict[str, Dict[Any, Any]] = {}
+        self._parents: Dict[str, str] = {}
+        self._children: Dict[str, List[str]] = {}
+        self._paths: Dict[str, List[str]] = {}
+        
+        for suite in suites:
+            self._suites[str(suite.get('id', ''))] = suite
+        for suite_id, suite in self._suites.items():
+            parent_id = (suite.get('parentSuite') or {}).get('id')
+            if parent_id:
+                self._parents[suite_id] = str(parent_id)
+                self._children.setdefault(str(parent_id), []).append(suite_id)
+    
+    def __contains__(self, suite_id: str) -> bool:
+        return str(suite_id) in self._suites
+    
+    def __getitem__(self, suite_id: str) -> Dict[Any, Any]:
+        return self._suites[str(suite_id)]
+    
+    def ids(self) -> List[str]:
+        """IDs of every suite, in the order they were listed"""
+        return list(self._suites)
+    
+    def children(self, suite_id: str) -> List[str]:
+        """IDs of the direct child suites of a suite"""
+        return self._children.get(str(suite_id), [])
+    
+    def path(self, suite_id: str) -> List[str]:
+        """Names of the suites from the root down to the given suite"""
+        suite_id = str(suite_id)
+        if suite_id in self._paths or suite_id not in self._suites:
+            return self._paths.get(suite_id, [])
+        
+        # Walk up to the root or the nearest suite whose path is already known
+        lineage = []
+        seen = set()
+        current_id = suite_id
+        path_parts: List[str] = []
+        while current_id and current_id not in self._paths:
+            if current_id in seen:
+                self.logger.warning(f"Suite hierarchy cycle detected at suite {current_id}")
+                break
+            if current_id not in self._suites:
+                self.logger.warning(f"  Parent suite {current_id} not found in suite list")
+                break
+            seen.add(current_id)
+            lineage.append(current_id)
+            current_id = self._parents.get(current_id)
+        else:
+            if current_id:
+                path_parts = self._paths[current_id]
+        
+        # Memoize the path of every suite walked through, from the top down
+        for lineage_id in reversed(lineage):
+            name = self._suites[lineage_id].get('name', '')
+            path_parts = path_parts + [name] if name else path_parts
+            self._paths[lineage_id] = path_parts
+        return self._paths.get(suite_id, [])
+    
+    def full_path(self, suite_id: str) -> str:
+        """Hierarchy path of a suite as shown in the export, e.g. 'Plan > Area > Suite'"""
+        return ' > '.join(self.path(suite_id))
+    
+    def find_by_path(self, full_path: str) -> Optional[str]:
+        """ID of the suite with the given ' > ' separated hierarchy path, or None if there is none"""
+        wanted = [part.strip() for part in full_path.split('>') if part.strip()]
+        for suite_id in self._suites:
+            if self.path(suite_id) == wanted:
+                return suite_id
+        return None
+    
+    def subtree_ids(self, suite_id: str) -> List[str]:
+        """IDs of a suite and all of its descendants"""
+        subtree = [str(suite_id)]
+        seen = set(subtree)
+        for current_id in subtree:
+            for child_id in self.children(current_id):
+                if child_id not in seen:
+                    seen.add(child_id)
+                    subtree.append(child_id)
+        return subtree
+
+class TestResultIndex:
+    """Test results of a test plan indexed by test case, ordered by completion date, optionally persisted"""
+    
+    def __init__(self, plan_id: str, directory: Optional[str] = None, logger: Optional[logging.Logger] = None):
+        self.plan_id = plan_id
+        self.logger = logger or logging.getLogger('AzureTestPlanExporter')
+        self.path = None
+        self.watermark: Optional[datetime] = None
+        # Per test case, (completed date, result key, result) sorted by completed date
+        self._results: Dict[str, List[Tuple[str, str, Dict[Any, Any]]]] = {}
+        # Per test case, the completed dates of its results in the same order, to bisect (no bisect key= before 3.10)
+        self._dates: Dict[str, List[str]] = {}
+        # Result key (run ID and result ID) to the indexed entry, so re-read runs replace their results
+        self._entries: Dict[str, Tuple[str, Tuple[str, str, Dict[Any, Any]]]] = {}
+        
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.path = os.path.join(directory, f"test_results_plan_{plan_id}.json")
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, encoding='utf-8') as index_file:
+                        state = json.load(index_file)
+                    for run_id, results in state['runs'].items():
+                        self.add(run_id, results)
+                    self.watermark = datetime.fromisoformat(state['watermark'].replace('Z', '+00:00'))
+                    self.logger.info(f"Loaded {len(self._entries)} test results from {self.path}")
+                except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                    self.logger.warning(f"Ignoring unreadable test result index {self.path}: {e}")
+                    self.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def add(self, run_id: str, results: Iterable[Dict[Any, Any]]) -> int:
+        """Index the results of a test run, replacing any indexed before, returning how many were read"""
+        total_results = 0
+        for result in results:
+            total_results += 1
+            test_case_id = str(result.get('testCase', {}).get('id', ''))
+            if not test_case_id:
+                continue
+            key = f"{run_id}:{result.get('id', total_results)}"
+            if key in self._entries:
+                previous_case_id, previous_entry = self._entries.pop(key)
+                position = self._results[previous_case_id].index(previous_entry)
+                del self._results[previous_case_id][position]
+                del self._dates[previous_case_id][position]
+            entry = (result.get('completedDate') or '', key, result)
+            dates = self._dates.setdefault(test_case_id, [])
+            position = bisect.bisect_right(dates, entry[0])
+            dates.insert(position, entry[0])
+            self._results.setdefault(test_case_id, []).insert(position, entry)
+            self._entries[key] = (test_case_id, entry)
+        return total_results
+    
+    def latest(self, test_case_id: str) -> Optional[Dict[Any, Any]]:
+        """Most recently completed result of a test case, or None if it has no completed results"""
+        results = self._results.get(str(test_case_id))
+        if results and results[-1][0]:
+            return results[-1][2]
+        return None
+    
+    def all(self, test_case_id: str) -> List[Dict[Any, Any]]:
+        """All results of a test case, oldest first"""
+        return [entry[2] for entry in self._results.get(str(test_case_id), [])]
+    
+    def between(self, test_case_id: str, start: Optional[datetime] = None,
+                end: Optional[datetime] = None) -> List[Dict[Any, Any]]:
+        """Completed results of a test case with a completion date within [start, end], oldest first"""
+        results = self._results.get(str(test_case_id), [])
+        dates = self._dates.get(str(test_case_id), [])
+        # Compare at whole-second precision, as API dates may or may not carry fractional seconds
+        low = bisect.bisect_left(dates, format_utc(start)[:19] if start else '\x00')
+        high = bisect.bisect_right(dates, format_utc(end)[:19] + '\uffff') if end else len(dates)
+        return [entry[2] for entry in results[low:high]]
+    
+    def clear(self):
+        """Drop every indexed result and the watermark"""
+        self._results.clear()
+        self._dates.clear()
+        self._entries.clear()
+        self.watermark = None
+    
+    def save(self, watermark: datetime):
+        """Record the time the index was last brought up to date and atomically persist it, if persistent"""
+        self.watermark = watermark
+        if not self.path:
+            return
+        runs: Dict[str, List[Dict[Any, Any]]] = {}
+        for key, (_, entry) in self._entries.items():
+            runs.setdefault(key.split(':', 1)[0], []).append(entry[2])
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as index_file:
+            json.dump({'watermark': format_utc(watermark), 'runs': runs}, index_file)
+        os.replace(temp_path, self.path)
+    
+    def delete(self):
+        """Clear the index and remove its persisted copy"""
+        self.clear()
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+class ExportSummary:
+    """Running totals of exported rows, accumulated as the rows stream past"""
+    
+    def __init__(self):
+        self.total_rows = 0
+        self.suites = 0
+        self.test_cases = 0
+        self.test_steps = 0
+        self.outcome_counts: Dict[str, int] = {}
+        self.status_counts: Dict[str, int] = {}
+        self.automation_counts: Dict[str, int] = {'Yes': 0, 'No': 0}
+    
+    def track(self, rows: Iterable[Mapping[str, str]]) -> Iterator[Mapping[str, str]]:
+        """Pass rows through unchanged while counting them"""
+        for row in rows:
+            self.add(row)
+            yield row
+    
+    def add(self, row: Mapping[str, str]):
+        self.total_rows += 1
+        row_type = row['Type']
+        if row_type == 'Suite':
+            self.suites += 1
+        elif row_type == 'Test Step':
+            self.test_steps += 1
+        elif row_type == 'Test Case':
+            # Status breakdown for test cases only
+            self.test_cases += 1
+            outcome = row['Execution Outcome'] or 'Not Executed'
+            status = row['Execution Status'] or 'Not Executed'
+            automated = row['Automated']
+            
+            self.outcome_counts[outcome] = self.outcome_counts.get(outcome, 0) + 1
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            self.automation_counts[automated] = self.automation_counts.get(automated, 0) + 1
+    
+    def merge(self, other: 'ExportSummary'):
+        """Add the totals of another summary to this one"""
+        self.total_rows += other.total_rows
+        self.suites += other.suites
+        self.test_cases += other.test_cases
+        self.test_steps += other.test_steps
+        for counts, other_counts in ((self.outcome_counts, other.outcome_counts),
+                                     (self.status_counts, other.status_counts),
+                                     (self.automation_counts, other.automation_counts)):
+            for key, count in other_counts.items():
+                counts[key] = counts.get(key, 0) + count
+    
+    def print_report(self):
+        print(f"\n" + "="*50)
+        print(f"EXPORT SUMMARY")
+        print(f"="*50)
+        print(f"Total suites: {self.suites}")
+        print(f"Total test cases: {self.test_cases}")
+        print(f"Total test steps: {self.test_steps}")
+        print(f"Total rows exported: {self.total_rows}")
+        
+        if self.test_cases:
+            print(f"\nExecution Outcome breakdown:")
+            for outcome, count in sorted(self.outcome_counts.items()):
+                percentage = (count / self.test_cases) * 100
+                print(f"  {outcome}: {count} ({percentage:.1f}%)")
+                
+            print(f"\nExecution Status breakdown:")
+            for status, count in sorted(self.status_counts.items()):
+                percentage = (count / self.test_cases) * 100
+                print(f"  {status}: {count} ({percentage:.1f}%)")
+            
+            print(f"\nAutomation breakdown:")
+            for automated, count in self.automation_counts.items():
+                percentage = (count / self.test_cases) * 100
+                print(f"  {automated}: {count} ({percentage:.1f}%)")
+            
+            # Calculate average steps per test case
+            if self.test_steps:
+                avg_steps = self.test_steps / self.test_cases
+                print(f"\nAverage test steps per test case: {avg_steps:.1f}")
+
+class ExportMetrics:
+    """Request, phase and cache metrics of an export, shared by an exporter, its forks and their workers.
+    
+    Requests are counted per endpoint with their response bytes and a latency histogram. Phase times are
+    summed over every call, so with concurrent workers they can add up to more than the wall time.
+    """
+    
+    def __init__(self):
+        self.started = time.time()
+        self.rows_exported = 0
+        self.endpoints: Dict[str, Dict[str, Any]] = {}
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.caches: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def endpoint_name(url: str) -> str:
+        path = urlsplit(url).path
+        for name, pattern in ENDPOINT_PATTERNS:
+            if pattern.search(path):
+                # Revision checks of the work item cache are cheap next to full work item fetches
+                if name == 'work_items' and 'fields=System.Rev&' in url:
+                    return 'work_item_revisions'
+                return name
+        return 'other'
+    
+    def record_request(self, url: str, seconds: float, response_bytes: int, status_code: Optional[int]):
+        """Record one HTTP request; a status code of None means no response was received"""
+        endpoint = self.endpoint_name(url)
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = {'requests': 0, 'errors': 0, 'response_bytes': 0, 'seconds': 0.0,
+                                                    'buckets': [0] * (len(LATENCY_BUCKETS) + 1)}
+            stats['requests'] += 1
+            if status_code is None or status_code >= 400:
+                stats['errors'] += 1
+            stats['response_bytes'] += response_bytes
+            stats['seconds'] += seconds
+            stats['buckets'][bucket] += 1
+    
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as one call of an extraction phase"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - started)
+    
+    def record_phase(self, name: str, seconds: float, calls: int = 1):
+        with self._lock:
+            stats = self.phases.setdefault(name, {'calls': 0, 'seconds': 0.0})
+            stats['calls'] += calls
+            stats['seconds'] += seconds
+    
+    def record_rows(self, count: int):
+        with self._lock:
+            self.rows_exported += count
+    
+    def record_cache(self, name: str, hits: int, misses: int):
+        with self._lock:
+            stats = self.caches.setdefault(name, {'hits': 0, 'misses': 0})
+            stats['hits'] += hits
+            stats['misses'] += misses
+    
+    def report(self) -> Dict[str, Any]:
+        """All metrics as a JSON-serializable dict; latency histograms are cumulative, keyed by upper bound"""
+        with self._lock:
+            endpoints = {}
+            for name, stats in sorted(self.endpoints.items()):
+                cumulative = list(itertools.accumulate(stats['buckets']))
+                endpoints[name] = {
+                    'requests': stats['requests'],
+                    'errors': stats['errors'],
+                    'response_bytes': stats['response_bytes'],
+                    'seconds': round(stats['seconds'], 6),
+                    'mean_seconds': round(stats['seconds'] / stats['requests'], 6),
+                    'latency_histogram': dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ['+Inf'], cumulative)),
+                }
+            return {
+                'started': format_utc(datetime.fromtimestamp(self.started, timezone.utc)),
+                'duration_seconds': round(time.time() - self.started, 3),
+                'rows_exported': self.rows_exported,
+                'endpoints': endpoints,
+                'phases': {name: {'calls': stats['calls'], 'seconds': round(stats['seconds'], 6)}
+                           for name, stats in sorted(self.phases.items())},
+                'caches': {name: dict(stats, hit_ratio=round(stats['hits'] / max(1, stats['hits'] + stats['misses']), 4))
+                           for name, stats in sorted(self.caches.items())},
+            }
+    
+    def write_json(self, filename: str):
+        with open(filename, 'w', encoding='utf-8') as json_file:
+            json.dump(self.report(), json_file, indent=2)
+    
+    def write_prometheus(self, filename: str):
+        """Write the metrics in the Prometheus text format, replacing the file atomically for the textfile collector"""
+        report = self.report()
+        prefix = PROMETHEUS_METRIC_PREFIX
+        lines = []
+        
+        def gauge(name: str, help_text: str, samples: Iterable[Tuple[str, Any]]):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.extend(f"{prefix}_{name}{labels} {value}" for labels, value in samples)
+        
+        endpoints = report['endpoints']
+        gauge('duration_seconds', 'Wall time of the last export', [('', report['duration_seconds'])])
+        gauge('rows', 'Rows written by the last export', [('', report['rows_exported'])])
+        gauge('last_run_timestamp_seconds', 'When the last export finished', [('', round(time.time(), 3))])
+        gauge('requests', 'Requests made, by endpoint',
+              [(f'{{endpoint="{name}"}}', stats['requests']) for name, stats in endpoints.items()])
+        gauge('request_errors', 'Requests that failed or returned an error status, by endpoint',
+              [(f'{{endpoint="{name}"}}', stats['errors']) for name, stats in endpoints.items()])
+        gauge('response_bytes', 'Response body bytes received, by endpoint',
+              [(f'{{endpoint="{name}"}}', stats['response_bytes']) for name, stats in endpoints.items()])
+        
+        lines.append(f"# HELP {prefix}_request_duration_seconds Request latency, by endpoint")
+        lines.append(f"# TYPE {prefix}_request_duration_seconds histogram")
+        for name, stats in endpoints.items():
+            for bound, count in stats['latency_histogram'].items():
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{endpoint="{name}",le="{bound}"}} {count}')
+            lines.append(f'{prefix}_request_duration_seconds_sum{{endpoint="{name}"}} {stats["seconds"]}')
+            lines.append(f'{prefix}_request_duration_seconds_count{{endpoint="{name}"}} {stats["requests"]}')
+        
+        gauge('phase_seconds', 'Time spent in each extraction phase, summed over concurrent workers',
+              [(f'{{phase="{name}"}}', stats['seconds']) for name, stats in report['phases'].items()])
+        gauge('phase_calls', 'Calls of each extraction phase',
+              [(f'{{phase="{name}"}}', stats['calls']) for name, stats in report['phases'].items()])
+        gauge('cache_hits', 'Cache hits, by cache',
+              [(f'{{cache="{name}"}}', stats['hits']) for name, stats in report['caches'].items()])
+        gauge('cache_misses', 'Cache misses, by cache',
+              [(f'{{cache="{name}"}}', stats['misses']) for name, stats in report['caches'].items()])
+        
+        temporary_filename = f"{filename}.tmp"
+        with open(temporary_filename, 'w', encoding='utf-8') as prometheus_file:
+            prometheus_file.write('\n'.join(lines) + '\n')
+        os.replace(temporary_filename, filename)
+
+class TimedIterator:
+    """Iterator over rows that adds up the time spent producing them, to tell it apart from the consumer's time"""
+    
+    def __init__(self, rows: Iterable[Mapping[str, str]]):
+        self.rows = iter(rows)
+        self.seconds = 0.0
+        self.count = 0
+    
+    def __iter__(self) -> 'TimedIterator':
+        return self
+    
+    def __next__(self) -> Mapping[str, str]:
+        started = time.perf_counter()
+        try:
+            row = next(self.rows)
+        finally:
+            self.seconds += time.perf_counter() - started
+        self.count += 1
+        return row
+
+class ExportProfiler:
+    """CPU and memory profile of an export, for --profile.
+    
+    cProfile covers the calling thread and the tasks run on worker threads, merged into one report. tracemalloc
+    readings at each phase boundary attribute memory growth to allocation sites; only the latest snapshot is
+    kept so the profiler's own memory stays out of the picture. Parse worker processes are not profiled.
+    """
+    
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        # Before Python 3.12, cProfile only sees the thread that enabled it, so each worker thread gets its own
+        self.per_thread = sys.version_info < (3, 12)
+        self.thread_profiles: List[cProfile.Profile] = []
+        self.boundaries: List[Dict[str, Any]] = []
+        self.running = False
+        self._profiling = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._started = 0.0
+        self._previous_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._peak_boundary: Optional[Dict[str, Any]] = None
+    
+    def start(self):
+        tracemalloc.start()
+        self._started = time.perf_counter()
+        self.running = True
+        self.boundary('start')
+        self._local.profile, self._local.depth = self.profile, 1
+        self.profile.enable()
+        self._profiling = True
+    
+    def stop(self):
+        self.profile.disable()
+        self._profiling = False
+        self._local.depth = 0
+        self.boundary('end')
+        self.running = False
+        tracemalloc.stop()
+    
+    def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Call func on a worker thread with that thread profiled"""
+        if not self.per_thread or getattr(self._local, 'depth', 0):
+            return func(*args)
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            profile = self._local.profile = cProfile.Profile()
+            with self._lock:
+                self.thread_profiles.append(profile)
+        self._local.depth = 1
+        profile.enable()
+        try:
+            return func(*args)
+        finally:
+            profile.disable()
+            self._local.depth = 0
+    
+    def _active_profile(self) -> Optional[cProfile.Profile]:
+        if not self.per_thread:
+            return self.profile if self._profiling else None
+        return self._local.profile if getattr(self._local, 'depth', 0) else None
+    
+    def boundary(self, label: str):
+        """Record traced memory at a phase boundary, with the allocation sites that grew since the previous one"""
+        if not self.running:
+            return
+        # The snapshot itself is not part of the export, so keep it out of the CPU profile
+        profile = self._active_profile()
+        if profile:
+            profile.disable()
+        try:
+            with self._lock:
+                current, peak = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                snapshot = tracemalloc.take_snapshot().filter_traces([
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                ])
+                growth = (snapshot.compare_to(self._previous_snapshot, 'lineno')[:PROFILE_TOP_ALLOCATIONS]
+                          if self._previous_snapshot else [])
+                entry = {'label': label, 'seconds': time.perf_counter() - self._started, 'current': current,
+                         'peak': peak, 'growth': [stat for stat in growth if stat.size_diff > 0]}
+                if self._peak_boundary is None or current > self._peak_boundary['current']:
+                    entry['largest'] = snapshot.statistics('lineno')[:PROFILE_TOP_ALLOCATIONS]
+                    if self._peak_boundary:
+                        del self._peak_boundary['largest']
+                    self._peak_boundary = entry
+                self.boundaries.append(entry)
+                self._previous_snapshot = snapshot
+        finally:
+            if profile:
+                profile.enable()
+    
+    def write_report(self, filename: str) -> str:
+        """Write the hotspot and allocation report, and the raw cProfile stats for other viewers; returns the stats path"""
+        stats_filename = f"{os.path.splitext(filename)[0]}.pstats"
+        with open(filename, 'w', encoding='utf-8') as report:
+            stats = pstats.Stats(self.profile, stream=report)
+            for profile in self.thread_profiles:
+                stats.add(profile)
+            stats.dump_stats(stats_filename)
+            
+            report.write("PHASE BOUNDARIES\n")
+            report.write(f"{'Elapsed s':>10}  {'Traced MB':>10}  {'Peak MB':>10}  Boundary\n")
+            for entry in self.boundaries:
+                report.write(f"{entry['seconds']:10.2f}  {entry['current'] / 1024 / 1024:10.1f}  "
+                             f"{entry['peak'] / 1024 / 1024:10.1f}  {entry['label']}\n")
+            report.write("(Peak MB is the highest traced memory since the previous boundary)\n")
+            
+            report.write("\nCPU HOTSPOTS BY OWN TIME\n")
+            stats.sort_stats('tottime').print_stats(PROFILE_TOP_FUNCTIONS)
+            report.write("\nCPU HOTSPOTS BY CUMULATIVE TIME\n")
+            stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+            
+            if self._peak_boundary:
+                report.write(f"\nLARGEST ALLOCATION SITES AT THE HIGHEST BOUNDARY ({self._peak_boundary['label']})\n")
+                for stat in self._peak_boundary['largest']:
+                    report.write(f"{stat.size / 1024:12,.1f} KiB {stat.count:10,} blocks  {stat.traceback}\n")
+            
+            report.write("\nMEMORY GROWTH BETWEEN BOUNDARIES\n")
+            for entry in self.boundaries:
+                if entry['growth']:
+                    report.write(f"\nUp to: {entry['label']}\n")
+                    for stat in entry['growth']:
+                        report.write(f"{stat.size_diff / 1024:+12,.1f} KiB {stat.count_diff:+10,} blocks  {stat.traceback}\n")
+        return stats_filename
+
+def plan_output_filename(output: Optional[str], plan_id: str, output_format: str = 'csv') -> str:
+    """Output filename of one plan in a multi-plan export: output with {plan_id} filled in or appended, or a default"""
+    if not output:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return f"test_plan_{plan_id}_hierarchical_export_{timestamp}{EXPORT_FORMATS[output_format]}"
+    if '{plan_id}' in output:
+        return output.replace('{plan_id}', str(plan_id))
+    root, extension = os.path.splitext(output)
+    return f"{root}_plan_{plan_id}{extension or EXPORT_FORMATS[output_format]}"
+
+def parse_execution_source(value: str) -> Tuple[str, Optional[datetime]]:
+    """Parse an --execution-source value of 'all', 'points' or 'runs-since=DATE' into (source, runs since)"""
+    if value in ('all', 'points'):
+        return value, None
+    
+    if value.startswith('runs-since='):
+        try:
+            runs_since = datetime.fromisoformat(value.split('=', 1)[1].replace('Z', '+00:00'))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid date in '{value}', expected e.g. runs-since=2024-01-31")
+        if runs_since.tzinfo is None:
+            runs_since = runs_since.replace(tzinfo=timezone.utc)
+        return 'runs-since', runs_since
+    
+    raise argparse.ArgumentTypeError(f"invalid execution source '{value}', expected all, points or runs-since=DATE")
+
+def parse_extra_field(value: str) -> Tuple[str, str]:
+    """Parse an --extra-fields value of 'FIELD' or 'COLUMN=FIELD' into (column name, field reference name)"""
+    column, _, field = value.rpartition('=')
+    column, field = column.strip() or field.strip(), field.strip()
+    if not field or any(char in field for char in ', &?#'):
+        raise argparse.ArgumentTypeError(f"invalid field '{value}', expected a field reference name such as "
+                                         f"Microsoft.VSTS.Common.Priority, optionally as COLUMN=FIELD")
+    # Column names are case-insensitive in SQLite and easily confused elsewhere
+    if column.casefold() in {name.casefold() for name in EXPORT_COLUMNS + SQLITE_TEST_CASE_COLUMNS}:
+        raise argparse.ArgumentTypeError(f"extra field column '{column}' clashes with an export column or a column "
+                                         f"of the SQLite test_cases table")
+    return column, field
+
 def main():
     parser = argparse.ArgumentParser(description='Export Azure DevOps Test Plan data with hierarchical structure and test steps')
     parser.add_argument('--organization', required=True, help='Azure DevOps organization name')
     parser.add_argument('--project', required=True, help='Azure DevOps project name')
     parser.add_argument('--pat', required=True, help='Personal Access Token')
-    parser.add_argument('--test-plan-id', required=True, help='Test Plan ID to export')
-    parser.add_argument('--output', help='Output CSV filename (optional)')
+    plans = parser.add_mutually_exclusive_group(required=True)
+    plans.add_argument('--test-plan-id', nargs='+', help='Test Plan ID(s) to export')
+    plans.add_argument('--all-plans', action='store_true', help='Export every test plan in the project')
+    parser.add_argument('--output',
+                        help='Output filename (optional); with several plans, {plan_id} in it is replaced by each plan ID')
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv',
+                        help='Output format: flat CSV, a SQLite database of normalized, indexed tables, Parquet, '
+                             'which requires pyarrow, or JSON Lines (default: csv)')
+    parser.add_argument('--extra-fields', nargs='+', type=parse_extra_field, default=[], metavar='[COLUMN=]FIELD',
+                        help="Work item fields exported as extra columns of test case rows, e.g. "
+                             "'Priority=Microsoft.VSTS.Common.Priority' System.Tags (optional)")
+    parser.add_argument('--combined-output', action='store_true',
+                        help='With several plans, write all of them to a single output file instead of one per plan')
+    parser.add_argument('--plan-workers', type=int, default=1,
+                        help='Number of test plans exported concurrently, each using --workers requests (default: 1)')
     parser.add_argument('--debug', action='store_true', help='Enable debug logging')
+    parser.add_argument('--workers', type=int, default=1, help='Number of concurrent API requests (default: 1)')
+    parser.add_argument('--cache-dir', help='Directory for a persistent work item cache reused across runs (optional)')
+    parser.add_argument('--cache-max-size-mb', type=float, default=1024,
+                        help='Evict least recently used cache entries above this size (default: 1024)')
+    parser.add_argument('--cache-max-age-days', type=float, default=30,
+                        help='Evict cache entries unused for this many days (default: 30)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only re-fetch test cases, shared steps and runs changed since the last incremental export (requires --cache-dir)')
+    parser.add_argument('--checkpoint-dir',
+                        help='Journal each completed suite to this directory, so an interrupted export can be resumed (optional)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume an interrupted export from its checkpoint, only extracting the remaining suites (requires --checkpoint-dir)')
+    parser.add_argument('--execution-source', type=parse_execution_source, default=('all', None), metavar='SOURCE',
+                        help="Execution status source: 'all' test runs (default), 'points' for test point results only, "
+                             "or 'runs-since=DATE' for runs updated since DATE")
+    suite_filter = parser.add_mutually_exclusive_group()
+    suite_filter.add_argument('--suite-id', help='Only export this test suite and the suites under it (optional)')
+    suite_filter.add_argument('--suite-path',
+                              help="Only export the suite with this path, e.g. 'Plan > Area > Suite', and the suites under it (optional)")
+    parser.add_argument('--max-retries', type=int, default=MAX_RETRIES,
+                        help=f'Retries of throttled or failed requests, with exponential backoff (default: {MAX_RETRIES})')
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help='Number of processes parsing test steps XML, for CPU-bound large plans (default: 0, in-process)')
+    parser.add_argument('--stream-decode-min-mb', type=float, default=STREAM_DECODE_MIN_BYTES / (1024 * 1024),
+                        help='Decode responses with a Content-Length of at least this many MB as they download '
+                             f'instead of whole; 0 disables (default: {STREAM_DECODE_MIN_BYTES // (1024 * 1024)})')
+    parser.add_argument('--engine', choices=['threads', 'async'], default='threads',
+                        help='Fetch engine: thread pool or asyncio, which requires httpx (default: threads)')
+    parser.add_argument('--metrics-output',
+                        help='Write a JSON report of requests, latency and bytes per endpoint, phase times and cache hits (optional)')
+    parser.add_argument('--metrics-prometheus',
+                        help='Write the same metrics as a Prometheus textfile, e.g. for the node exporter textfile collector (optional)')
+    parser.add_argument('--profile', nargs='?', const='export_profile.txt', metavar='REPORT',
+                        help='Profile CPU and memory of the export and write a hotspot and allocation report to REPORT '
+                             '(default: export_profile.txt), with raw cProfile stats next to it (optional)')
     
     args = parser.parse_args()
+    if args.incremental and not args.cache_dir:
+        parser.error('--incremental requires --cache-dir')
+    if args.resume and not args.checkpoint_dir:
+        parser.error('--resume requires --checkpoint-dir')
+    extra_columns = [column for column, _ in args.extra_fields]
+    if len({column.casefold() for column in extra_columns}) != len(extra_columns):
+        parser.error('--extra-fields columns must have distinct names, ignoring case')
+    if (args.suite_id or args.suite_path) and (args.all_plans or len(args.test_plan_id) > 1):
+        parser.error('--suite-id and --suite-path can only be used with a single --test-plan-id')
     
     # Create exporter instance
-    exporter = AzureTestPlanExporter(args.organization, args.project, args.pat, debug=args.debug)
+    execution_source, runs_since = args.execution_source
+    exporter = AzureTestPlanExporter(args.organization, args.project, args.pat, debug=args.debug,
+                                     workers=args.workers, engine=args.engine,
+                                     execution_source=execution_source, runs_since=runs_since,
+                                     suite_id=args.suite_id, suite_path=args.suite_path,
+                                     plan_workers=args.plan_workers, max_retries=args.max_retries,
+                                     parse_workers=args.parse_workers, extra_fields=args.extra_fields,
+                                     stream_decode_min_bytes=int(args.stream_decode_min_mb * 1024 * 1024))
+    if args.cache_dir:
+        exporter.work_item_cache = WorkItemCache(args.cache_dir, args.cache_max_size_mb, args.cache_max_age_days,
+                                                 logger=exporter.logger, fields=exporter.work_item_fields)
+    
+    # Checkpoints of the plans being exported, removed once their output is written completely
+    checkpoints: Dict[str, ExportCheckpoint] = {}
+    
+    def plan_exporter(plan_id: str) -> AzureTestPlanExporter:
+        # Every plan shares the exporter's connection pool and work item and shared steps caches
+        forked = exporter.fork()
+        if args.incremental:
+            forked.incremental_state = IncrementalExportState(args.cache_dir, plan_id, logger=exporter.logger)
+        if args.checkpoint_dir:
+            # A checkpoint only resumes an export of the same rows
+            settings = {'plan_id': str(plan_id), 'columns': exporter.export_columns,
+                        'fields': exporter.work_item_fields, 'execution_source': execution_source,
+                        'runs_since': format_utc(runs_since) if runs_since else None, 'suite_id': args.suite_id,
+                        'suite_path': args.suite_path, 'incremental': args.incremental}
+            forked.checkpoint = ExportCheckpoint(args.checkpoint_dir, plan_id, settings, resume=args.resume,
+                                                 logger=exporter.logger)
+            checkpoints[str(plan_id)] = forked.checkpoint
+        return forked
+    
+    def remove_checkpoints(plan_ids: List[str]):
+        # Kept while any request failed, so a resumed export retries the suites it left incomplete
+        if exporter.throttle.failed_requests:
+            return
+        for plan_id in plan_ids:
+            if str(plan_id) in checkpoints:
+                checkpoints.pop(str(plan_id)).delete()
+    
+    def profiled(func: Callable[[str], Any]) -> Callable[[str], Any]:
+        # Plans exported on their own threads are profiled there
+        return functools.partial(exporter.profiler.run, func) if exporter.profiler else func
+    
+    def export_plan(plan_id: str) -> ExportSummary:
+        summary = ExportSummary()
+        rows = summary.track(plan_exporter(plan_id).iter_test_data_hierarchical(plan_id))
+        exporter.export_hierarchical(rows, plan_output_filename(args.output, plan_id, args.format), args.format)
+        remove_checkpoints([plan_id])
+        if not summary.total_rows:
+            print(f"No test data found for test plan {plan_id} or extraction failed")
+        return summary
+    
+    def plan_rows(plan_id: str) -> List[ExportRow]:
+        return list(plan_exporter(plan_id).iter_test_data_hierarchical(plan_id))
+    
+    def ordered_plan_rows(executor: ThreadPoolExecutor, plan_ids: List[str]) -> Iterator[ExportRow]:
+        """Rows of each plan in order, extracting at most --plan-workers plans ahead of the one being written"""
+        pending = deque()
+        for plan_id in plan_ids:
+            pending.append(executor.submit(profiled(plan_rows), plan_id))
+            if len(pending) > args.plan_workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    
+    if args.profile:
+        exporter.profiler = ExportProfiler()
+        exporter.profiler.start()
     
     try:
-        # Extract hierarchical test data
-        hierarchical_data = exporter.extract_test_data_hierarchical(args.test_plan_id)
-        
-        if hierarchical_data:
-            # Export to CSV
-            exporter.export_hierarchical_to_csv(hierarchical_data, args.output)
-            
-            # Print summary
-            suites = [row for row in hierarchical_data if row['Type'] == 'Suite']
-            test_cases = [row for row in hierarchical_data if row['Type'] == 'Test Case']
-            test_steps = [row for row in hierarchical_data if row['Type'] == 'Test Step']
-            
-            print(f"\n" + "="*50)
-            print(f"EXPORT SUMMARY")
-            print(f"="*50)
-            print(f"Total suites: {len(suites)}")
-            print(f"Total test cases: {len(test_cases)}")
-            print(f"Total test steps: {len(test_steps)}")
-            print(f"Total rows exported: {len(hierarchical_data)}")
-            
-            # Status breakdown for test cases only
-            if test_cases:
-                outcome_counts = {}
-                status_counts = {}
-                automation_counts = {'Yes': 0, 'No': 0}
-                
-                for item in test_cases:
-                    outcome = item['Execution Outcome'] or 'Not Executed'
-                    status = item['Execution Status'] or 'Not Executed'
-                    automated = item['Automated']
-                    
-                    outcome_counts[outcome] = outcome_counts.get(outcome, 0) + 1
-                    status_counts[status] = status_counts.get(status, 0) + 1
-                    automation_counts[automated] = automation_counts.get(automated, 0) + 1
-                
-                print(f"\nExecution Outcome breakdown:")
-                for outcome, count in sorted(outcome_counts.items()):
-                    percentage = (count / len(test_cases)) * 100
-                    print(f"  {outcome}: {count} ({percentage:.1f}%)")
-                    
-                print(f"\nExecution Status breakdown:")
-                for status, count in sorted(status_counts.items()):
-                    percentage = (count / len(test_cases)) * 100
-                    print(f"  {status}: {count} ({percentage:.1f}%)")
-                
-                print(f"\nAutomation breakdown:")
-                for automated, count in automation_counts.items():
-                    percentage = (count / len(test_cases)) * 100
-                    print(f"  {automated}: {count} ({percentage:.1f}%)")
-                
-                # Calculate average steps per test case
-                if test_steps:
-                    avg_steps = len(test_steps) / len(test_cases)
-                    print(f"\nAverage test steps per test case: {avg_steps:.1f}")
-            
+        unknown_fields = exporter.unknown_extra_fields()
+        if unknown_fields:
+            parser.error(f"--extra-fields: no work item field has the reference name {', '.join(unknown_fields)}")
+        
+        plan_ids = args.test_plan_id or [str(plan.get('id', '')) for plan in exporter.get_test_plans()]
+        summary = ExportSummary()
+        
+        if len(plan_ids) == 1 and not args.all_plans:
+            # Stream hierarchical test data straight into the CSV, counting the summary on the way
+            rows = summary.track(plan_exporter(plan_ids[0]).iter_test_data_hierarchical(plan_ids[0]))
+            exporter.export_hierarchical(rows, args.output, args.format)
+            remove_checkpoints(plan_ids)
+        elif args.combined_output:
+            # Plans exported concurrently are buffered so they are written one after another in order
+            if args.plan_workers > 1:
+                with ThreadPoolExecutor(max_workers=args.plan_workers) as executor:
+                    rows = ordered_plan_rows(executor, plan_ids)
+                    exporter.export_hierarchical(summary.track(rows), args.output, args.format)
+            else:
+                rows = itertools.chain.from_iterable(plan_exporter(plan_id).iter_test_data_hierarchical(plan_id)
+                                                     for plan_id in plan_ids)
+                exporter.export_hierarchical(summary.track(rows), args.output, args.format)
+            remove_checkpoints(plan_ids)
+        else:
+            # One output per plan, each streamed as it is extracted
+            with ThreadPoolExecutor(max_workers=args.plan_workers) as executor:
+                plan_summaries = list(executor.map(profiled(export_plan), plan_ids))
+            for plan_summary in plan_summaries:
+                summary.merge(plan_summary)
+            if not all(plan_summary.total_rows for plan_summary in plan_summaries):
+                summary.print_report()
+                sys.exit(1)
+        
+        if summary.total_rows:
+            summary.print_report()
         else:
             print("No test data found or extraction failed")
             sys.exit(1)
+        
+        if exporter.throttle.failed_requests:
+            print(f"\nWarning: {exporter.throttle.failed_requests} requests still failed after {args.max_retries} retries, "
+                  f"the export may be incomplete")
+            sys.exit(1)
             
     except KeyboardInterrupt:
         print("\nExport interrupted by user")
         sys.exit(1)
+    except AuthenticationError as e:
+        print(f"Export aborted: {e}")
+        if args.checkpoint_dir:
+            print("Completed suites are checkpointed; rerun with a valid PAT and --resume to continue")
+        sys.exit(1)
     except Exception as e:
         print(f"Export failed with error: {e}")
         if args.debug:
             import traceback
             traceback.print_exc()
         sys.exit(1)
+    finally:
+        if exporter.profiler:
+            exporter.profiler.stop()
+            stats_filename = exporter.profiler.write_report(args.profile)
+            print(f"\nProfile written to {args.profile} (raw cProfile stats: {stats_filename})")
+        exporter.close()
+        if exporter.work_item_cache:
+            exporter.work_item_cache.close()
+        for checkpoint in checkpoints.values():
+            checkpoint.close()
+        # Written for failed exports too, so their slowdowns and errors show up
+        try:
+            if args.metrics_output:
+                exporter.metrics.write_json(args.metrics_output)
+            if args.metrics_prometheus:
+                exporter.metrics.write_prometheus(args.metrics_prometheus)
+        except OSError as e:
+            exporter.logger.error(f"Error writing metrics: {e}")
 
 if __name__ == "__main__":
     main()
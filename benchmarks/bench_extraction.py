@@ -0,0 +1,115 @@
+"""Benchmark extract_test_data_hierarchical against a local mock Azure DevOps server.
+
+Usage:
+    python benchmarks/bench_extraction.py [--suites 50] [--depth 3] [--cases-per-suite 20] [--latency-ms 5]
+                                          [--workers 8] [--engine threads] [--repeat 3] [--json]
+
+Starts mock_azure_devops.py in a separate process with a synthetic plan of the given shape, runs a cold
+extraction with a fresh exporter for each repeat and reports wall time, requests, response bytes and rows.
+One more run under tracemalloc reports the peak memory the extraction allocates.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+import urllib.request
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from azureTestPlanExporter import AzureTestPlanExporter
+from mock_azure_devops import MockAzureDevOpsServer, PlanShape, add_shape_arguments, shape_from_args
+
+# Seconds to wait for the mock server process to start listening
+SERVER_START_TIMEOUT = 30
+
+def serve(shape: PlanShape, ports: multiprocessing.Queue):
+    """Run the mock server on a free port, reporting the port once it is listening"""
+    server = MockAzureDevOpsServer(0, shape)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+def mock_call(port: int, path: str, method: str = 'GET') -> Dict[str, Any]:
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", method=method, data=b'' if method == 'POST' else None)
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+def run_extraction(port: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Extract the synthetic plan with a fresh exporter, returning its measurements"""
+    # Exporter logging goes to stderr, keeping stdout clean for --json
+    with contextlib.redirect_stdout(sys.stderr):
+        exporter = AzureTestPlanExporter('benchmark', 'benchmark', 'benchmark', workers=args.workers, engine=args.engine,
+                                         execution_source=args.execution_source, parse_workers=args.parse_workers)
+    exporter.logger.setLevel(logging.WARNING)
+    exporter.base_url = f"http://127.0.0.1:{port}/benchmark/benchmark/_apis"
+    mock_call(port, '/_mock/reset', 'POST')
+    try:
+        started = time.perf_counter()
+        rows = sum(1 for _ in exporter.iter_test_data_hierarchical('1'))
+        elapsed = time.perf_counter() - started
+    finally:
+        exporter.close()
+    stats = mock_call(port, '/_mock/stats')
+    return {'seconds': elapsed, 'rows': rows, 'requests': stats['requests'], 'bytes': stats['bytes_sent'],
+            'endpoint_requests': stats['endpoint_requests']}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark plan extraction against a local mock Azure DevOps server')
+    add_shape_arguments(parser)
+    parser.add_argument('--workers', type=int, default=1, help='Exporter --workers (default: 1)')
+    parser.add_argument('--engine', choices=['threads', 'async'], default='threads', help='Exporter --engine (default: threads)')
+    parser.add_argument('--execution-source', choices=['all', 'points'], default='all',
+                        help='Exporter --execution-source (default: all)')
+    parser.add_argument('--parse-workers', type=int, default=0, help='Exporter --parse-workers (default: 0)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed extractions, the best is reported (default: 3)')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON, for comparing between commits')
+    args = parser.parse_args()
+
+    shape = shape_from_args(args)
+    context = multiprocessing.get_context('spawn')
+    ports = context.Queue()
+    server = context.Process(target=serve, args=(shape, ports), daemon=True)
+    server.start()
+    try:
+        port = ports.get(timeout=SERVER_START_TIMEOUT)
+        runs = [run_extraction(port, args) for _ in range(args.repeat)]
+        best = min(runs, key=lambda run: run['seconds'])
+
+        tracemalloc.start()
+        run_extraction(port, args)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        server.terminate()
+        server.join()
+
+    results = {'shape': shape._asdict(), 'workers': args.workers, 'engine': args.engine,
+               'execution_source': args.execution_source, 'parse_workers': args.parse_workers,
+               'seconds': best['seconds'], 'seconds_per_run': [run['seconds'] for run in runs], 'rows': best['rows'],
+               'requests': best['requests'], 'bytes': best['bytes'], 'peak_memory_bytes': peak_memory,
+               'endpoint_requests': best['endpoint_requests']}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"Plan: {shape.suites} suites, depth {shape.depth}, {shape.suites * shape.cases_per_suite} test cases of "
+          f"{shape.steps_per_case} steps, {shape.shared_steps} shared steps (fan-out {shape.shared_step_fanout}), "
+          f"{shape.runs} runs of {shape.results_per_run} results, {shape.latency_ms:g} ms latency")
+    print(f"Exporter: {args.engine} engine, {args.workers} workers, execution source {args.execution_source}, "
+          f"{args.parse_workers} parse workers\n")
+    run_seconds = ', '.join(f"{run['seconds']:.2f}" for run in runs)
+    print(f"Wall time    {best['seconds']:10.2f} s  (best of {len(runs)}: {run_seconds})")
+    print(f"Rows         {best['rows']:10,}  ({best['rows'] / best['seconds']:,.0f} rows/s)")
+    print(f"Requests     {best['requests']:10,}")
+    print(f"Bytes        {best['bytes']:10,}  ({best['bytes'] / 1024 / 1024:.1f} MB received)")
+    print(f"Peak memory  {peak_memory:10,}  ({peak_memory / 1024 / 1024:.1f} MB allocated, under tracemalloc)")
+    print("\nRequests by endpoint:")
+    for endpoint, count in sorted(best['endpoint_requests'].items(), key=lambda item: -item[1]):
+        print(f"  {endpoint:<22} {count:8,}")
+
+if __name__ == '__main__':
+    main()
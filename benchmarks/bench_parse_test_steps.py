@@ -0,0 +1,157 @@
+"""Benchmark test steps XML parsing: the original ElementTree parser against the fast, memoized one.
+
+Usage:
+    python benchmarks/bench_parse_test_steps.py [--cases 5000] [--steps 8] [--duplicate-ratio 0.5] [--parse-workers 0]
+
+Generates a synthetic corpus of test steps XML documents shaped like the Microsoft.VSTS.TCM.Steps field,
+where a share of the test cases reuse the steps of another one, checks both parsers agree on every document,
+and reports documents and steps parsed per second.
+"""
+import argparse
+import logging
+import os
+import random
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+from html import escape, unescape
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from azureTestPlanExporter import AzureTestPlanExporter
+
+# Documents parsed per worker before timing, so process startup is not measured
+PARSE_WARMUP_DOCUMENTS = 16
+
+def legacy_clean_html_text(html_text: str) -> str:
+    """clean_html_text as it was before the fast parsing path"""
+    if not html_text:
+        return ""
+    clean_text = re.sub(r'<[^>]+>', '', html_text)
+    clean_text = unescape(clean_text)
+    clean_text = ' '.join(clean_text.split())
+    return clean_text.strip()
+
+def legacy_parse_test_steps(test_steps_xml: str) -> List[Dict[str, str]]:
+    """parse_test_steps as it was before the fast parsing path, without its debug logging"""
+    if not test_steps_xml:
+        return []
+
+    steps = []
+    try:
+        root = ET.fromstring(test_steps_xml)
+        for step_elem in root.findall('.//step'):
+            step_id = step_elem.get('id', '')
+            step_type = step_elem.get('type', '')
+            if step_type == 'ValidateStep':
+                parameterized_strings = step_elem.findall('parameterizedString')
+                if len(parameterized_strings) >= 2:
+                    action = legacy_clean_html_text(parameterized_strings[0].text)
+                    expected = legacy_clean_html_text(parameterized_strings[1].text)
+                else:
+                    action = ''
+                    expected = ''
+            else:
+                action_elem = step_elem.find('.//parameterizedString')
+                action = legacy_clean_html_text(action_elem.text if action_elem is not None else "")
+                expected = ''
+            if action or expected:
+                steps.append({'step_id': step_id, 'action': action, 'expected_result': expected})
+    except ET.ParseError:
+        return []
+    return steps
+
+def make_steps_xml(case_number: int, step_count: int) -> str:
+    """Build a steps document with formatted HTML text, as the Azure DevOps web editor stores it"""
+    steps = []
+    for step_id in range(2, step_count + 2):
+        action = escape(f"<DIV><P>Open the <B>settings</B> page &amp; set option {step_id} for case {case_number}</P></DIV>")
+        expected = escape(f"<DIV><P>Option {step_id} is saved&nbsp;and shown</P></DIV>")
+        if step_id % 3:
+            steps.append(f'<step id="{step_id}" type="ValidateStep">'
+                         f'<parameterizedString isformatted="true">{action}</parameterizedString>'
+                         f'<parameterizedString isformatted="true">{expected}</parameterizedString>'
+                         f'<description/></step>')
+        else:
+            steps.append(f'<step id="{step_id}" type="ActionStep">'
+                         f'<parameterizedString isformatted="true">{action}</parameterizedString>'
+                         f'<parameterizedString isformatted="true"/><description/></step>')
+    return f'<steps id="0" last="{step_count + 1}">{"".join(steps)}</steps>'
+
+def make_corpus(cases: int, steps: int, duplicate_ratio: float) -> List[str]:
+    rng = random.Random(42)
+    corpus = []
+    for case_number in range(cases):
+        if corpus and rng.random() < duplicate_ratio:
+            corpus.append(rng.choice(corpus))
+        else:
+            corpus.append(make_steps_xml(case_number, steps))
+    return corpus
+
+def measure(name: str, parse: Callable[[str], List[Dict[str, str]]], corpus: List[str], repeat: int) -> float:
+    best = None
+    step_count = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        step_count = sum(len(parse(steps_xml)) for steps_xml in corpus)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<28} {best * 1000:9.1f} ms  {len(corpus) / best:11,.0f} docs/s  {step_count / best:12,.0f} steps/s")
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark test steps XML parsing')
+    parser.add_argument('--cases', type=int, default=5000, help='Number of test steps documents (default: 5000)')
+    parser.add_argument('--steps', type=int, default=8, help='Steps per document (default: 8)')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.5,
+                        help='Share of documents repeating an earlier one (default: 0.5)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per parser, the best is reported (default: 3)')
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help='Also measure batch parsing on this many worker processes (default: 0, skipped)')
+    args = parser.parse_args()
+
+    exporter = AzureTestPlanExporter('benchmark', 'benchmark', 'benchmark')
+    exporter.logger.setLevel(logging.WARNING)
+    corpus = make_corpus(args.cases, args.steps, args.duplicate_ratio)
+    print(f"{len(corpus)} documents, {len(set(corpus))} distinct, {args.steps} steps each\n")
+
+    for steps_xml in set(corpus):
+        if exporter.parse_test_steps(steps_xml) != legacy_parse_test_steps(steps_xml):
+            sys.exit("Parsers disagree on a document")
+
+    def fast_uncached(steps_xml: str) -> List[Dict[str, str]]:
+        return exporter._parse_test_steps_xml(steps_xml)
+
+    def fast_memoized(steps_xml: str) -> List[Dict[str, str]]:
+        return exporter.parse_test_steps(steps_xml)
+
+    legacy = measure('original', legacy_parse_test_steps, corpus, args.repeat)
+    single_pass = measure('single pass', fast_uncached, corpus, args.repeat)
+    exporter._parsed_steps_cache.clear()
+    memoized_cold = measure('single pass + memo (cold)', fast_memoized, corpus, 1)
+    memoized_warm = measure('single pass + memo (warm)', fast_memoized, corpus, args.repeat)
+
+    print(f"\nSpeedup over original: {legacy / single_pass:.2f}x single pass, "
+          f"{legacy / memoized_cold:.2f}x memoized from cold, {legacy / memoized_warm:.2f}x memoized when warm")
+
+    if args.parse_workers:
+        pool_exporter = AzureTestPlanExporter('benchmark', 'benchmark', 'benchmark', parse_workers=args.parse_workers)
+        pool_exporter.logger.setLevel(logging.WARNING)
+        pool_exporter.parse_test_steps_many(corpus[:PARSE_WARMUP_DOCUMENTS * args.parse_workers])  # Start the workers
+
+        def pool_batch(batch: List[str]) -> List[List[Dict[str, str]]]:
+            pool_exporter._parsed_steps_cache.clear()
+            return pool_exporter.parse_test_steps_many(batch)
+
+        started = time.perf_counter()
+        pooled = pool_batch(corpus)
+        elapsed = time.perf_counter() - started
+        pool_exporter.close()
+        if pooled != [legacy_parse_test_steps(steps_xml) for steps_xml in corpus]:
+            sys.exit("Parse workers disagree with the original parser")
+        print(f"{f'{args.parse_workers} parse workers, cold':<28} {elapsed * 1000:9.1f} ms  "
+              f"{len(corpus) / elapsed:11,.0f} docs/s  ({legacy / elapsed:.2f}x original)")
+
+if __name__ == '__main__':
+    main()
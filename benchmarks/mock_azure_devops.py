@@ -0,0 +1,368 @@
+"""Local stand-in for the Azure DevOps REST endpoints the exporter calls, serving a synthetic test plan.
+
+Usage:
+    python benchmarks/mock_azure_devops.py [--port 8765] [--suites 50] [--depth 3] [--cases-per-suite 20] [--latency-ms 0]
+
+Serves the test plans, suites, TestCase, TestPoint, test runs and results, WIQL, fields and work items endpoints under
+http://127.0.0.1:<port>/<organization>/<project>/_apis, paging them the way Azure DevOps does. Work items honor
+fields=, and $expand=all adds their relations and links. Responses are gzip compressed when the client accepts
+it. Point the exporter at it by setting its base_url. GET /_mock/stats returns the requests served and response
+bytes sent, and POST /_mock/reset zeroes them.
+"""
+import argparse
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, NamedTuple, Optional
+from urllib.parse import parse_qs, urlparse
+
+# Test case work item IDs start here, shared steps work item IDs follow the test cases
+FIRST_TEST_CASE_ID = 100000
+
+# Work item fields the project defines; fields= naming any other field fails the whole request, as it does on
+# Azure DevOps
+FIELDS = ['System.Id', 'System.Rev', 'System.WorkItemType', 'System.Title', 'System.State', 'System.AreaPath',
+          'System.IterationPath', 'System.CreatedDate', 'System.ChangedDate', 'System.CreatedBy', 'System.ChangedBy',
+          'System.Tags', 'System.Reason', 'System.CommentCount', 'System.Description', 'Microsoft.VSTS.Common.Priority',
+          'Microsoft.VSTS.TCM.Steps', 'Microsoft.VSTS.TCM.Parameters', 'Microsoft.VSTS.TCM.LocalDataSource',
+          'Microsoft.VSTS.TCM.AutomatedTestName']
+
+class PlanShape(NamedTuple):
+    """Size and shape of the synthetic test plan, and how the server behaves"""
+    suites: int = 50
+    depth: int = 3
+    cases_per_suite: int = 20
+    steps_per_case: int = 8
+    shared_steps: int = 20
+    shared_step_fanout: int = 1
+    links_per_work_item: int = 10
+    runs: int = 30
+    results_per_run: int = 200
+    page_size: int = 200
+    latency_ms: float = 0.0
+    compression: bool = True
+    # '' for correct paging, 'repeat-token' to send the first page's continuation token with every page, or
+    # 'ignore-skip' to return the first $top items whatever $skip asks for
+    paging_fault: str = ''
+    seed: int = 42
+
+class SyntheticPlan:
+    """A test plan with a suite tree, test cases, shared steps and run history, generated from a PlanShape"""
+
+    def __init__(self, shape: PlanShape, plan_id: int = 1):
+        rng = random.Random(shape.seed)
+        self.plan = {'id': plan_id, 'name': f'Benchmark plan {plan_id}'}
+
+        # Spread suites over the levels round-robin, each under a random suite one level up
+        self.suites = [{'id': 1, 'name': 'Root', 'suiteType': 'staticTestSuite', 'plan': {'id': plan_id}}]
+        levels: List[List[int]] = [[1]]
+        for suite_id in range(2, shape.suites + 2):
+            level = 1 + (suite_id - 2) % max(shape.depth, 1)
+            while len(levels) <= level:
+                levels.append([])
+            parent_id = rng.choice(levels[level - 1])
+            levels[level].append(suite_id)
+            self.suites.append({'id': suite_id, 'name': f'Suite {suite_id}', 'suiteType': 'staticTestSuite',
+                                'parentSuite': {'id': parent_id}, 'plan': {'id': plan_id}})
+
+        first_shared_steps_id = FIRST_TEST_CASE_ID + shape.suites * shape.cases_per_suite
+        shared_steps_ids = list(range(first_shared_steps_id, first_shared_steps_id + shape.shared_steps))
+        self.work_items: Dict[int, Dict[str, Any]] = {}
+        self.relations: Dict[int, List[Dict[str, Any]]] = {}
+        for shared_steps_id in shared_steps_ids:
+            self.work_items[shared_steps_id] = self._work_item(shared_steps_id, 'Shared Steps',
+                                                               self._steps_xml(shared_steps_id, 3, []))
+            self.relations[shared_steps_id] = self._relations(shared_steps_id, shape.links_per_work_item)
+
+        self.suite_test_cases: Dict[int, List[int]] = {}
+        test_case_id = FIRST_TEST_CASE_ID
+        for suite in self.suites[1:]:
+            self.suite_test_cases[suite['id']] = []
+            for _ in range(shape.cases_per_suite):
+                refs = rng.sample(shared_steps_ids, min(shape.shared_step_fanout, len(shared_steps_ids)))
+                work_item = self._work_item(test_case_id, 'Test Case',
+                                            self._steps_xml(test_case_id, shape.steps_per_case, refs))
+                if test_case_id % 4 == 0:
+                    work_item['fields']['Microsoft.VSTS.TCM.AutomatedTestName'] = f'Tests.Case{test_case_id}'
+                self.work_items[test_case_id] = work_item
+                self.relations[test_case_id] = self._relations(test_case_id, shape.links_per_work_item)
+                self.suite_test_cases[suite['id']].append(test_case_id)
+                test_case_id += 1
+        test_case_ids = list(range(FIRST_TEST_CASE_ID, test_case_id))
+
+        # One run a day up to now, each with results for a random sample of the test cases
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        self.runs = []
+        self.results: Dict[int, List[Dict[str, Any]]] = {}
+        for run_id in range(1, shape.runs + 1):
+            run_date = now - timedelta(days=shape.runs - run_id)
+            self.runs.append({'id': run_id, 'name': f'Run {run_id}', 'state': 'Completed', 'plan': {'id': str(plan_id)},
+                              'lastUpdatedDate': run_date.strftime('%Y-%m-%dT%H:%M:%SZ')})
+            sample = rng.sample(test_case_ids, min(shape.results_per_run, len(test_case_ids)))
+            self.results[run_id] = [{
+                'id': 100000 + index, 'testCase': {'id': str(case_id), 'name': f'Test case {case_id}'},
+                'outcome': rng.choice(['Passed', 'Passed', 'Passed', 'Failed', 'Blocked']), 'state': 'Completed',
+                'completedDate': (run_date - timedelta(minutes=index)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'runBy': {'displayName': f'Tester {case_id % 7}'},
+            } for index, case_id in enumerate(sample)]
+
+    @staticmethod
+    def _steps_xml(work_item_id: int, step_count: int, shared_steps_refs: List[int]) -> str:
+        """Steps field XML with formatted HTML text, as the web editor stores it, ending with shared steps references"""
+        steps = []
+        for step_id in range(2, step_count + 2):
+            action = escape(f"<DIV><P>Open the <B>settings</B> page &amp; set option {step_id} of {work_item_id}</P></DIV>")
+            expected = escape(f"<DIV><P>Option {step_id} is saved&nbsp;and shown</P></DIV>")
+            steps.append(f'<step id="{step_id}" type="ValidateStep">'
+                         f'<parameterizedString isformatted="true">{action}</parameterizedString>'
+                         f'<parameterizedString isformatted="true">{expected}</parameterizedString><description/></step>')
+        for offset, shared_steps_id in enumerate(shared_steps_refs, step_count + 2):
+            steps.append(f'<step id="{offset}" type="ActionStep">'
+                         f'<parameterizedString isformatted="true">@{shared_steps_id}</parameterizedString>'
+                         f'<parameterizedString isformatted="true"/><description/></step>')
+        return f'<steps id="0" last="{step_count + len(shared_steps_refs) + 1}">{"".join(steps)}</steps>'
+
+    @staticmethod
+    def _relations(work_item_id: int, count: int) -> List[Dict[str, Any]]:
+        """Links to other work items, as test cases have to the requirements and bugs they cover"""
+        return [{'rel': 'Microsoft.VSTS.Common.TestedBy-Reverse',
+                 'url': f'https://dev.azure.com/benchmark/_apis/wit/workItems/{work_item_id + 1000000 + index}',
+                 'attributes': {'isLocked': False, 'name': 'Tested By', 'authorizedDate': '2024-01-01T00:00:00Z',
+                                'id': index, 'resourceCreatedDate': '2024-01-01T00:00:00Z',
+                                'resourceModifiedDate': '2024-01-01T00:00:00Z', 'revisedDate': '9999-01-01T00:00:00Z'}}
+                for index in range(count)]
+
+    def work_item_payload(self, work_item_id: int, query: Dict[str, List[str]]) -> Optional[Dict[str, Any]]:
+        """A work item as the API returns it: only the requested fields, or all fields with relations and links
+        for $expand=all"""
+        work_item = self.work_items.get(work_item_id)
+        if work_item is None:
+            return None
+        if 'fields' in query:
+            fields = query['fields'][0].split(',')
+            return {'id': work_item['id'], 'rev': work_item['rev'],
+                    'fields': {field: work_item['fields'][field] for field in fields if field in work_item['fields']}}
+        if query.get('$expand') == ['all']:
+            base_url = f"https://dev.azure.com/benchmark/_apis/wit/workItems/{work_item_id}"
+            return dict(work_item, relations=self.relations[work_item_id], url=base_url, _links={
+                name: {'href': f'{base_url}/{name}'} for name in ('self', 'workItemUpdates', 'workItemRevisions',
+                                                                  'workItemComments', 'html', 'workItemType', 'fields')})
+        return work_item
+
+    @staticmethod
+    def _work_item(work_item_id: int, work_item_type: str, steps_xml: str) -> Dict[str, Any]:
+        return {'id': work_item_id, 'rev': 3, 'fields': {
+            'System.Id': work_item_id, 'System.Rev': 3, 'System.WorkItemType': work_item_type,
+            'System.Title': f'{work_item_type} {work_item_id}', 'System.State': 'Design',
+            'System.AreaPath': f'Benchmark\\Area {work_item_id % 5}', 'System.IterationPath': 'Benchmark\\Sprint 1',
+            'System.CreatedDate': '2024-01-01T00:00:00Z', 'System.ChangedDate': '2024-02-01T00:00:00Z',
+            'System.CreatedBy': {'displayName': f'Author {work_item_id % 3}'},
+            'Microsoft.VSTS.Common.Priority': 2, 'Microsoft.VSTS.TCM.Steps': steps_xml,
+            'System.Tags': 'benchmark; regression', 'System.Reason': 'New', 'System.CommentCount': 0,
+            'System.ChangedBy': {'displayName': f'Author {work_item_id % 3}', 'uniqueName': f'author{work_item_id % 3}@benchmark',
+                                 'id': f'00000000-0000-0000-0000-00000000000{work_item_id % 3}'},
+            'System.Description': escape(f'<div>Checks option handling of work item {work_item_id} end to end</div>'),
+            'Microsoft.VSTS.TCM.Parameters': '<parameters/>', 'Microsoft.VSTS.TCM.LocalDataSource': '<NewDataSet/>',
+        }}
+
+class MockAzureDevOpsServer(ThreadingHTTPServer):
+    """HTTP server for a SyntheticPlan that counts the requests it serves and the bytes it sends"""
+    daemon_threads = True
+
+    def __init__(self, port: int, shape: PlanShape):
+        super().__init__(('127.0.0.1', port), MockAzureDevOpsHandler)
+        self.shape = shape
+        self.data = SyntheticPlan(shape)
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.endpoint_requests: Dict[str, int] = {}
+
+    def record(self, endpoint: str, bytes_sent: int):
+        with self.stats_lock:
+            self.requests += 1
+            self.bytes_sent += bytes_sent
+            self.endpoint_requests[endpoint] = self.endpoint_requests.get(endpoint, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.stats_lock:
+            return {'requests': self.requests, 'bytes_sent': self.bytes_sent,
+                    'endpoint_requests': dict(self.endpoint_requests)}
+
+class MockAzureDevOpsHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, which stalls on Nagle and delayed ACKs over keep-alive connections
+    disable_nagle_algorithm = True
+    server: MockAzureDevOpsServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, endpoint: str, body: Any, status: int = 200, headers: Optional[Dict[str, str]] = None):
+        payload = json.dumps(body).encode('utf-8')
+        compress = self.server.shape.compression and 'gzip' in self.headers.get('Accept-Encoding', '')
+        if compress:
+            payload = gzip.compress(payload, compresslevel=6)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+        if endpoint:
+            self.server.record(endpoint, len(payload))
+
+    def _send_page(self, endpoint: str, items: List[Any], query: Dict[str, List[str]]):
+        """Page with $top/$skip when asked to, like the test runs endpoints, otherwise with continuation tokens"""
+        fault = self.server.shape.paging_fault
+        if '$top' in query:
+            top, skip = int(query['$top'][0]), int(query.get('$skip', ['0'])[0])
+            page = items[:top] if fault == 'ignore-skip' else items[skip:skip + top]
+            return self._send(endpoint, {'count': len(page), 'value': page})
+        start = int(query.get('continuationToken', ['0'])[0])
+        end = start + self.server.shape.page_size
+        next_token = str(self.server.shape.page_size if fault == 'repeat-token' else end)
+        headers = {'x-ms-continuationtoken': next_token} if end < len(items) else {}
+        self._send(endpoint, {'count': len(items[start:end]), 'value': items[start:end]}, headers=headers)
+
+    def _delay(self):
+        if self.server.shape.latency_ms:
+            time.sleep(self.server.shape.latency_ms / 1000)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path, query = url.path, parse_qs(url.query)
+        data = self.server.data
+        if path == '/_mock/stats':
+            return self._send('', self.server.stats())
+        self._delay()
+
+        if re.search(r'/testplan/plans$', path, re.IGNORECASE):
+            return self._send('plans', {'count': 1, 'value': [data.plan]})
+        if re.search(r'/testplan/plans/\d+$', path, re.IGNORECASE):
+            return self._send('plan', data.plan)
+        if re.search(r'/testplan/plans/\d+/suites$', path, re.IGNORECASE):
+            return self._send_page('suites', data.suites, query)
+        match = re.search(r'/suites/(\d+)/testcase$', path, re.IGNORECASE)
+        if match:
+            test_cases = [{'workItem': {'id': case_id, 'name': data.work_items[case_id]['fields']['System.Title']},
+                           'pointAssignments': [{'tester': {'displayName': f'Tester {case_id % 7}'}}]}
+                          for case_id in data.suite_test_cases.get(int(match.group(1)), [])]
+            return self._send_page('test_cases', test_cases, query)
+        match = re.search(r'/suites/(\d+)/testpoint$', path, re.IGNORECASE)
+        if match:
+            test_points = [{'testCaseReference': {'id': case_id}, 'outcome': 'unspecified',
+                            'lastResultOutcome': 'Passed' if case_id % 3 else '', 'lastResultState': 'Completed',
+                            'assignedTo': {'displayName': f'Tester {case_id % 7}'}}
+                           for case_id in data.suite_test_cases.get(int(match.group(1)), [])]
+            return self._send_page('test_points', test_points, query)
+        if re.search(r'/test/runs$', path, re.IGNORECASE):
+            runs = data.runs
+            if 'minLastUpdatedDate' in query:
+                # The runs query API filters on a last-updated date range
+                low, high = query['minLastUpdatedDate'][0], query['maxLastUpdatedDate'][0]
+                runs = [run for run in runs if low <= run['lastUpdatedDate'] <= high]
+                return self._send_page('test_runs_query', runs, query)
+            return self._send_page('test_runs', runs, query)
+        match = re.search(r'/test/runs/(\d+)/results$', path, re.IGNORECASE)
+        if match:
+            return self._send_page('test_results', data.results.get(int(match.group(1)), []), query)
+        if re.search(r'/wit/fields$', path, re.IGNORECASE):
+            return self._send('fields', {'count': len(FIELDS), 'value': [
+                {'referenceName': field, 'name': field.rsplit('.', 1)[-1]} for field in FIELDS]})
+        unknown_fields = [field for field in query.get('fields', [''])[0].split(',')
+                          if field and field.casefold() not in {known.casefold() for known in FIELDS}]
+        if unknown_fields and re.search(r'/wit/workitems', path, re.IGNORECASE):
+            return self._send('unknown_field', {'message': f'TF51535: Cannot find field {unknown_fields[0]}.'}, 400)
+        match = re.search(r'/wit/workitems/(\d+)$', path, re.IGNORECASE)
+        if match:
+            work_item = data.work_item_payload(int(match.group(1)), query)
+            if work_item is None:
+                return self._send('work_item', {'message': 'Work item does not exist'}, 404)
+            return self._send('work_item', work_item)
+        if re.search(r'/wit/workitems$', path, re.IGNORECASE):
+            ids = [int(work_item_id) for work_item_id in query.get('ids', [''])[0].split(',') if work_item_id]
+            work_items = [data.work_item_payload(work_item_id, query) for work_item_id in ids]
+            if query.get('fields') == ['System.Rev']:
+                return self._send('work_item_revisions', {'count': len(work_items), 'value': work_items})
+            return self._send('work_items', {'count': len(work_items), 'value': work_items})
+        self._send('unknown', {'message': f'No mock for {path}'}, 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if url.path == '/_mock/reset':
+            self.server.reset_stats()
+            return self._send('', {})
+        self._delay()
+
+        if re.search(r'/wit/wiql$', url.path, re.IGNORECASE):
+            # Everything counts as changed: the synthetic plan has no change history
+            json.loads(body or b'{}')
+            return self._send('wiql', {'workItems': [{'id': work_item_id} for work_item_id in self.server.data.work_items]})
+        self._send('unknown', {'message': f'No mock for {url.path}'}, 404)
+
+def add_shape_arguments(parser: argparse.ArgumentParser):
+    """Add an option for each PlanShape field"""
+    defaults = PlanShape()
+    parser.add_argument('--suites', type=int, default=defaults.suites,
+                        help=f'Number of suites under the root suite (default: {defaults.suites})')
+    parser.add_argument('--depth', type=int, default=defaults.depth,
+                        help=f'Levels of suites under the root suite (default: {defaults.depth})')
+    parser.add_argument('--cases-per-suite', type=int, default=defaults.cases_per_suite,
+                        help=f'Test cases in each suite (default: {defaults.cases_per_suite})')
+    parser.add_argument('--steps-per-case', type=int, default=defaults.steps_per_case,
+                        help=f'Test steps in each test case (default: {defaults.steps_per_case})')
+    parser.add_argument('--shared-steps', type=int, default=defaults.shared_steps,
+                        help=f'Number of shared steps work items (default: {defaults.shared_steps})')
+    parser.add_argument('--shared-step-fanout', type=int, default=defaults.shared_step_fanout,
+                        help=f'Shared steps referenced from each test case (default: {defaults.shared_step_fanout})')
+    parser.add_argument('--links-per-work-item', type=int, default=defaults.links_per_work_item,
+                        help=f'Relations of each work item, returned with $expand=all (default: {defaults.links_per_work_item})')
+    parser.add_argument('--runs', type=int, default=defaults.runs,
+                        help=f'Test runs in the plan history, one a day (default: {defaults.runs})')
+    parser.add_argument('--results-per-run', type=int, default=defaults.results_per_run,
+                        help=f'Test results in each run (default: {defaults.results_per_run})')
+    parser.add_argument('--page-size', type=int, default=defaults.page_size,
+                        help=f'Items per page of the continuation token endpoints (default: {defaults.page_size})')
+    parser.add_argument('--latency-ms', type=float, default=defaults.latency_ms,
+                        help=f'Delay added to every response, in milliseconds (default: {defaults.latency_ms:g})')
+    parser.add_argument('--no-compression', dest='compression', action='store_false',
+                        help='Ignore Accept-Encoding and always send uncompressed responses')
+    parser.add_argument('--paging-fault', choices=['repeat-token', 'ignore-skip'], default=defaults.paging_fault,
+                        help="Page incorrectly, sending the first page's continuation token again or ignoring $skip")
+
+def shape_from_args(args: argparse.Namespace) -> PlanShape:
+    return PlanShape(**{field: getattr(args, field) for field in PlanShape._fields if hasattr(args, field)})
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a synthetic test plan on the Azure DevOps REST endpoints')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    add_shape_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockAzureDevOpsServer(args.port, shape_from_args(args))
+    print(f"Serving plan {server.data.plan['id']} with {len(server.data.suites)} suites and "
+          f"{len(server.data.work_items)} work items on http://127.0.0.1:{server.server_port}/benchmark/benchmark/_apis")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from azureTestPlanExporter import AzureTestPlanExporter  # noqa: E402
+from benchmarks.mock_azure_devops import MockAzureDevOpsServer, PlanShape  # noqa: E402
+
+
+@pytest.fixture
+def mock_exporter():
+    """Start a mock Azure DevOps server for a PlanShape and return an exporter pointed at it"""
+    servers = []
+    exporters = []
+
+    def start(shape: PlanShape, **exporter_options) -> AzureTestPlanExporter:
+        server = MockAzureDevOpsServer(0, shape)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        exporter = AzureTestPlanExporter('org', 'proj', 'pat', max_retries=0, **exporter_options)
+        exporter.base_url = f"http://127.0.0.1:{server.server_port}/org/proj/_apis"
+        exporters.append(exporter)
+        return exporter
+
+    yield start
+    for exporter in exporters:
+        exporter.close()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
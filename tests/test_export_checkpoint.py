@@ -0,0 +1,79 @@
+from datetime import datetime, timezone
+
+from azureTestPlanExporter import EXPORT_COLUMNS, ExportCheckpoint, ExportRow
+# Imported under another name so pytest does not try to collect it as a test class
+from azureTestPlanExporter import TestResultRecord as ResultRecord
+
+SETTINGS = {'execution_source': 'all', 'extra_fields': []}
+STARTED = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def make_row(test_case_id: str) -> ExportRow:
+    return ExportRow.make('Test Case', '1', 'Plan > Suite', '2', test_case_id, f"Test case {test_case_id}")
+
+
+def write_checkpoint(directory) -> ExportCheckpoint:
+    checkpoint = ExportCheckpoint(str(directory), '1', SETTINGS)
+    checkpoint.begin(STARTED)
+    checkpoint.record_test_results({'10': ResultRecord('Passed', 'Completed', '2024-03-01T10:00:00Z', 'Tester')})
+    checkpoint.record_suite('2', [make_row('10')])
+    checkpoint.record_suite('3', [make_row('11'), make_row('12')])
+    checkpoint.close()
+    return checkpoint
+
+
+def test_resume_restores_journaled_suites_and_results(tmp_path):
+    write_checkpoint(tmp_path)
+    resumed = ExportCheckpoint(str(tmp_path), '1', SETTINGS, resume=True)
+    assert resumed.begin(datetime.now(timezone.utc)) == STARTED
+    assert resumed.test_results == {'10': ResultRecord('Passed', 'Completed', '2024-03-01T10:00:00Z', 'Tester')}
+    assert [row['Test Case ID'] for row in resumed.completed_rows('3')] == ['11', '12']
+    assert resumed.completed_rows('4') is None
+    resumed.close()
+
+
+def test_torn_last_line_is_ignored_and_truncated_on_begin(tmp_path):
+    path = write_checkpoint(tmp_path).path
+    with open(path, 'rb') as journal:
+        complete = journal.read()
+    with open(path, 'ab') as journal:
+        journal.write(b'{"suite_id":"4","rows":[["Test Case","1"')
+
+    resumed = ExportCheckpoint(str(tmp_path), '1', SETTINGS, resume=True)
+    assert sorted(resumed.suite_rows) == ['2', '3']
+    resumed.begin(datetime.now(timezone.utc))
+    resumed.close()
+    with open(path, 'rb') as journal:
+        assert journal.read() == complete
+
+    # Entries appended after resuming follow the last complete one
+    resumed = ExportCheckpoint(str(tmp_path), '1', SETTINGS, resume=True)
+    resumed.begin(datetime.now(timezone.utc))
+    resumed.record_suite('4', [make_row('13')])
+    resumed.close()
+    reloaded = ExportCheckpoint(str(tmp_path), '1', SETTINGS, resume=True)
+    assert sorted(reloaded.suite_rows) == ['2', '3', '4']
+    assert len(reloaded.completed_rows('4')[0].cells) == len(EXPORT_COLUMNS)
+
+
+def test_last_entry_without_newline_is_kept(tmp_path):
+    path = write_checkpoint(tmp_path).path
+    with open(path, 'rb+') as journal:
+        journal.truncate(len(journal.read()) - 1)
+
+    resumed = ExportCheckpoint(str(tmp_path), '1', SETTINGS, resume=True)
+    resumed.begin(datetime.now(timezone.utc))
+    resumed.record_suite('4', [make_row('13')])
+    resumed.close()
+    reloaded = ExportCheckpoint(str(tmp_path), '1', SETTINGS, resume=True)
+    assert sorted(reloaded.suite_rows) == ['2', '3', '4']
+
+
+def test_different_settings_start_over(tmp_path):
+    write_checkpoint(tmp_path)
+    resumed = ExportCheckpoint(str(tmp_path), '1', dict(SETTINGS, execution_source='points'), resume=True)
+    assert resumed.suite_rows == {}
+    assert resumed.begin(datetime.now(timezone.utc)) != STARTED
+    resumed.close()
+    reloaded = ExportCheckpoint(str(tmp_path), '1', dict(SETTINGS, execution_source='points'), resume=True)
+    assert reloaded.suite_rows == {} and reloaded.test_results is None
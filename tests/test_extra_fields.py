@@ -0,0 +1,50 @@
+import argparse
+
+import pytest
+
+from azureTestPlanExporter import parse_extra_field
+from benchmarks.mock_azure_devops import PlanShape
+
+SHAPE = PlanShape(suites=2, cases_per_suite=2, runs=1, results_per_run=2)
+
+
+def test_unknown_extra_fields_are_reported(mock_exporter):
+    exporter = mock_exporter(SHAPE, extra_fields=[('Priority', 'Microsoft.VSTS.Common.Priority'),
+                                                  ('Tags', 'system.tags'), ('Risk', 'Custom.Risk')])
+    assert exporter.unknown_extra_fields() == ['Custom.Risk']
+
+
+def test_known_extra_fields_are_fetched(mock_exporter):
+    exporter = mock_exporter(SHAPE, extra_fields=[('Priority', 'Microsoft.VSTS.Common.Priority')])
+    assert exporter.unknown_extra_fields() == []
+    work_items = exporter.get_work_items_batch(['100000'])
+    assert work_items['100000']['fields']['Microsoft.VSTS.Common.Priority'] == 2
+
+
+def test_an_unknown_extra_field_fails_every_work_item_request(mock_exporter):
+    exporter = mock_exporter(SHAPE, extra_fields=[('Risk', 'Custom.Risk')])
+    assert exporter.get_work_items_batch(['100000']) == {}
+    assert exporter.throttle.failed_requests == 1
+
+
+def test_without_extra_fields_nothing_is_checked(mock_exporter):
+    exporter = mock_exporter(SHAPE)
+    exporter.base_url = 'http://127.0.0.1:9/unreachable'
+    assert exporter.unknown_extra_fields() == []
+    assert exporter.throttle.failed_requests == 0
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('System.Tags', ('System.Tags', 'System.Tags')),
+    ('Tags=System.Tags', ('Tags', 'System.Tags')),
+    (' Priority = Microsoft.VSTS.Common.Priority ', ('Priority', 'Microsoft.VSTS.Common.Priority')),
+])
+def test_parse_extra_field(value, expected):
+    assert parse_extra_field(value) == expected
+
+
+@pytest.mark.parametrize('value', ['', 'Tags=', 'Tags=System Tags', 'Title=System.Tags', 'title=System.Tags',
+                                   'id=System.Tags', 'AREA_PATH=System.AreaPath', 'Test Case ID=System.Id'])
+def test_parse_extra_field_rejects_invalid_and_clashing_columns(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_extra_field(value)
@@ -0,0 +1,113 @@
+import json
+import random
+
+import pytest
+
+from azureTestPlanExporter import JsonStreamDecoder, is_large_response
+
+DOCUMENTS = [
+    {},
+    {"count": 0, "value": []},
+    {"count": 3, "value": [{"id": 1, "fields": {"System.Title": "Login"}}, {"id": -2.5e3}, [1, [2, {}]]]},
+    {"value": [1, 22, -333, 4.5, -0.0, 1e10, True, False, None, "", "x"], "continuationToken": None},
+    {"value": ["café ☃ \U0001f600", "quote \" and \\ backslash", " \ttabbed\n"]},
+    {"nested": {"value": [1, 2]}, "list": [{"a": [[], {}]}], "last": "done"},
+    {"value": [{"id": number, "name": f"item {number}"} for number in range(40)], "count": 40},
+    [1, 2, {"a": "b"}],
+    "top-level string",
+    -12.75,
+    None,
+]
+
+
+def decode_in_chunks(data: bytes, sizes) -> object:
+    decoder = JsonStreamDecoder()
+    position = 0
+    for size in sizes:
+        decoder.feed(data[position:position + size])
+        position += size
+    decoder.feed(data[position:])
+    return decoder.finish()
+
+
+def random_chunk_sizes(rng: random.Random, length: int):
+    sizes = []
+    while sum(sizes) < length:
+        sizes.append(rng.choice([0, 1, 1, 2, 3, 7, 64]))
+    return sizes
+
+
+@pytest.mark.parametrize('document', DOCUMENTS)
+@pytest.mark.parametrize('indent', [None, 2])
+def test_random_chunk_splits_match_json_loads(document, indent):
+    data = json.dumps(document, indent=indent, ensure_ascii=False).encode('utf-8')
+    rng = random.Random(len(data))
+    for _ in range(50):
+        assert decode_in_chunks(data, random_chunk_sizes(rng, len(data))) == json.loads(data)
+
+
+@pytest.mark.parametrize('document', DOCUMENTS)
+def test_every_two_chunk_split_matches_json_loads(document):
+    data = json.dumps(document, ensure_ascii=False).encode('utf-8')
+    for split in range(len(data) + 1):
+        assert decode_in_chunks(data, [split]) == json.loads(data)
+
+
+def test_single_chunk_with_byte_order_mark():
+    data = b'\xef\xbb\xbf' + json.dumps({"value": [1, 2]}).encode('utf-8')
+    assert decode_in_chunks(data, []) == {"value": [1, 2]}
+
+
+MALFORMED = [
+    '',
+    '   ',
+    '{',
+    '{"value": [1, 2',
+    '{"value": [1, 2]',
+    '{"value": [1, 2],',
+    '{"count": 1',
+    '{"count": -1.}',
+    '{"count": 1,}',
+    '{"value": [1,]}',
+    '{"value": [1 2]}',
+    '{"count" 1}',
+    '{1: 2}',
+    '{"flag": tru}',
+    '{"name": "unterminated}',
+    '{"count": 1} trailing',
+    '{"count": 1}{}',
+    '{\u00a0"count": 1}',
+    '[1, 2',
+]
+
+
+@pytest.mark.parametrize('text', MALFORMED)
+def test_malformed_or_truncated_input_raises(text):
+    data = text.encode('utf-8')
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(data)
+    for split in range(len(data) + 1):
+        with pytest.raises(json.JSONDecodeError):
+            decode_in_chunks(data, [split])
+
+
+@pytest.mark.parametrize('document', DOCUMENTS[1:7])
+def test_every_truncation_raises(document):
+    data = json.dumps(document).encode('utf-8')
+    for length in range(len(data)):
+        with pytest.raises(json.JSONDecodeError):
+            decode_in_chunks(data[:length], [length // 2])
+
+
+@pytest.mark.parametrize('headers, min_bytes, expected', [
+    ({'Content-Length': '2048'}, 1024, True),
+    ({'Content-Length': '1024'}, 1024, True),
+    ({'Content-Length': '1023'}, 1024, False),
+    # Chunked and compressed responses of unknown size are read whole and decoded with decode_json
+    ({}, 1024, False),
+    ({'Transfer-Encoding': 'chunked', 'Content-Encoding': 'gzip'}, 1024, False),
+    ({'Content-Length': 'invalid'}, 1024, False),
+    ({'Content-Length': '2048'}, 0, False),
+])
+def test_only_bodies_known_to_be_large_are_stream_decoded(headers, min_bytes, expected):
+    assert is_large_response(headers, min_bytes) is expected
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from azureTestPlanExporter import AsyncExtractionEngine, AzureTestPlanExporter
+from benchmarks.mock_azure_devops import PlanShape
+
+SUITES = 9
+PAGE_SIZE = 4
+
+
+@pytest.fixture
+def serve(mock_exporter):
+    def start(paging_fault: str = '') -> AzureTestPlanExporter:
+        return mock_exporter(PlanShape(suites=SUITES - 1, page_size=PAGE_SIZE, paging_fault=paging_fault))
+    return start
+
+
+def sync_pages(exporter: AzureTestPlanExporter, page_size=None):
+    return list(exporter.iter_pages(exporter._test_suites_url('1'), page_size))
+
+
+def async_pages(exporter: AzureTestPlanExporter, page_size=None):
+    httpx = pytest.importorskip('httpx')
+    engine = AsyncExtractionEngine(exporter)
+
+    async def collect():
+        engine.slots = asyncio.Condition()
+        engine.in_flight = 0
+        async with httpx.AsyncClient() as engine.client:
+            return [page async for page in engine.iter_pages(exporter._test_suites_url('1'), page_size)]
+    return asyncio.run(collect())
+
+
+def suite_ids(pages):
+    return [suite['id'] for page in pages for suite in page]
+
+
+@pytest.mark.parametrize('get_pages', [sync_pages, async_pages])
+@pytest.mark.parametrize('page_size', [None, PAGE_SIZE])
+def test_pages_follow_continuation_tokens_and_skip(serve, get_pages, page_size):
+    pages = get_pages(serve(), page_size)
+    assert suite_ids(pages) == list(range(1, SUITES + 1))
+    assert len(pages) == 3
+
+
+@pytest.mark.parametrize('get_pages', [sync_pages, async_pages])
+def test_repeated_continuation_token_stops_paging(serve, get_pages):
+    pages = get_pages(serve('repeat-token'))
+    assert suite_ids(pages) == [1, 2, 3, 4, 5, 6, 7, 8]
+
+
+@pytest.mark.parametrize('get_pages', [sync_pages, async_pages])
+def test_ignored_skip_stops_paging(serve, get_pages):
+    pages = get_pages(serve('ignore-skip'), PAGE_SIZE)
+    assert suite_ids(pages) == [1, 2, 3, 4]
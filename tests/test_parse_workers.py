@@ -0,0 +1,50 @@
+import threading
+
+import pytest
+
+import azureTestPlanExporter
+from benchmarks.mock_azure_devops import PlanShape
+
+SHAPE = PlanShape(suites=4, depth=2, cases_per_suite=12, steps_per_case=3, shared_steps=6, shared_step_fanout=2,
+                  runs=2, results_per_run=10)
+
+
+def export_rows(exporter):
+    return [tuple(row.cells) for row in exporter.iter_test_data_hierarchical('1')]
+
+
+@pytest.mark.parametrize('engine', ['threads', 'async'])
+def test_rows_are_built_from_the_parse_workers_results(mock_exporter, monkeypatch, engine):
+    if engine == 'async':
+        pytest.importorskip('httpx')
+    # Far fewer cache entries than step documents, so rows cannot rely on the parsed steps cache
+    monkeypatch.setattr(azureTestPlanExporter, 'STEPS_PARSE_CACHE_SIZE', 1)
+    baseline = mock_exporter(SHAPE, engine=engine)
+    expected = export_rows(baseline)
+
+    exporter = mock_exporter(SHAPE, engine=engine, parse_workers=2, workers=4)
+    # The same server, as result dates are generated relative to when a server starts
+    exporter.base_url = baseline.base_url
+    # Per thread, as other suites are fetched and parsed while one is being built
+    building = threading.local()
+    in_process_parses = []
+    build_suite_rows = exporter._build_suite_rows
+    parse_test_steps_xml = exporter._parse_test_steps_xml
+
+    def tracked_build_suite_rows(*args, **kwargs):
+        building.active = True
+        try:
+            return build_suite_rows(*args, **kwargs)
+        finally:
+            building.active = False
+
+    def tracked_parse_test_steps_xml(test_steps_xml):
+        if getattr(building, 'active', False):
+            in_process_parses.append(test_steps_xml)
+        return parse_test_steps_xml(test_steps_xml)
+    monkeypatch.setattr(exporter, '_build_suite_rows', tracked_build_suite_rows)
+    monkeypatch.setattr(exporter, '_parse_test_steps_xml', tracked_parse_test_steps_xml)
+
+    assert export_rows(exporter) == expected
+    assert any(row[0] == 'Test Step' for row in expected)
+    assert in_process_parses == []
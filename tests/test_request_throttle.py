@@ -0,0 +1,169 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from azureTestPlanExporter import RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX, RequestThrottle
+
+
+class FakeClock:
+    """Stands in for time.monotonic and time.sleep, so pauses and back-off windows pass instantly"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(time, 'sleep', clock.sleep)
+    return clock
+
+
+def test_retry_delay_honours_retry_after_seconds():
+    throttle = RequestThrottle(8)
+    for attempt in range(5):
+        assert 7 <= throttle.retry_delay(attempt, {'Retry-After': '7'}) <= 8
+
+
+def test_retry_delay_honours_retry_after_http_date():
+    throttle = RequestThrottle(8)
+    retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 28 <= throttle.retry_delay(0, {'Retry-After': retry_at}) <= 31
+
+
+@pytest.mark.parametrize('headers', [None, {}, {'Retry-After': 'soon'}, {'Retry-After': '0'}])
+def test_retry_delay_without_retry_after_backs_off_exponentially(headers):
+    throttle = RequestThrottle(8)
+    for attempt in range(10):
+        backoff = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt)
+        for _ in range(20):
+            assert backoff / 2 <= throttle.retry_delay(attempt, headers) <= backoff
+    assert throttle.retry_delay(30, headers) <= RETRY_BACKOFF_MAX
+
+
+def test_retry_after_pauses_every_request(clock):
+    throttle = RequestThrottle(8)
+    throttle.record(429, {'Retry-After': '5'})
+    assert throttle.pause_remaining() == 5
+    # A shorter Retry-After does not cut the pause short
+    throttle.record(503, {'Retry-After': '2'})
+    assert throttle.pause_remaining() == 5
+
+    with throttle:
+        pass
+    assert clock.slept == [5]
+    assert throttle.pause_remaining() == 0
+
+
+def test_throttled_responses_halve_the_limit_at_most_once_a_second(clock):
+    throttle = RequestThrottle(16)
+    throttle.record(429, {})
+    throttle.record(429, {})
+    throttle.record(503, {})
+    assert throttle.limit == 8
+    assert throttle.retries == 3
+
+    clock.now += 1
+    throttle.record(429, {})
+    assert throttle.limit == 4
+    for _ in range(5):
+        clock.now += 1
+        throttle.record(429, {})
+    assert throttle.limit == 1
+
+
+@pytest.mark.parametrize('headers', [
+    {'X-RateLimit-Delay': '0.5'},
+    {'X-RateLimit-Remaining': '9', 'X-RateLimit-Limit': '100'},
+])
+def test_rate_limit_pressure_halves_the_limit(clock, headers):
+    throttle = RequestThrottle(8)
+    throttle.record(200, headers)
+    assert throttle.limit == 4
+
+
+@pytest.mark.parametrize('headers', [
+    {'X-RateLimit-Delay': '0'},
+    {'X-RateLimit-Remaining': '10', 'X-RateLimit-Limit': '100'},
+    {'X-RateLimit-Remaining': 'many', 'X-RateLimit-Limit': '100'},
+])
+def test_rate_limit_headers_without_pressure_keep_the_limit(clock, headers):
+    throttle = RequestThrottle(8)
+    throttle.record(200, headers)
+    assert throttle.limit == 8
+
+
+def test_server_errors_are_retried_without_reducing_the_limit(clock):
+    throttle = RequestThrottle(8)
+    for status_code in (500, 502, 504):
+        throttle.record(status_code, {})
+    assert throttle.retries == 3
+    assert throttle.limit == 8
+
+
+def test_limit_grows_back_by_one_after_a_limit_of_successes(clock):
+    throttle = RequestThrottle(8)
+    throttle.record(429, {})
+    assert throttle.limit == 4
+
+    for expected_limit in (5, 6, 7, 8):
+        for _ in range(throttle.limit - 1):
+            throttle.record(200, {})
+        assert throttle.limit == expected_limit - 1
+        throttle.record(200, {})
+        assert throttle.limit == expected_limit
+
+    for _ in range(100):
+        throttle.record(200, {})
+    assert throttle.limit == 8
+
+
+def test_throttling_restarts_the_count_of_successes(clock):
+    throttle = RequestThrottle(8)
+    throttle.record(429, {})
+    for _ in range(3):
+        throttle.record(200, {})
+    clock.now += 1
+    throttle.record(429, {})
+    assert throttle.limit == 2
+    throttle.record(200, {})
+    assert throttle.limit == 2
+    throttle.record(200, {})
+    assert throttle.limit == 3
+
+
+def test_requests_in_flight_wait_for_the_limit():
+    throttle = RequestThrottle(1)
+    entered = threading.Event()
+
+    def second_request():
+        with throttle:
+            entered.set()
+
+    with throttle:
+        thread = threading.Thread(target=second_request)
+        thread.start()
+        assert not entered.wait(0.1)
+    assert entered.wait(5)
+    thread.join()
+    assert throttle.in_flight == 0
+
+
+def test_failed_requests_are_counted():
+    throttle = RequestThrottle(0)
+    assert throttle.limit == 1
+    throttle.record_failure()
+    throttle.record_failure()
+    assert throttle.failed_requests == 2
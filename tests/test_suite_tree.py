@@ -0,0 +1,125 @@
+import logging
+
+import pytest
+
+import azureTestPlanExporter
+from azureTestPlanExporter import AzureTestPlanExporter, SuiteTree
+
+
+def make_suites(count: int):
+    """A chain of suites, each the parent of the next"""
+    suites = [{'id': 1, 'name': 'Root'}]
+    for suite_id in range(2, count + 1):
+        suites.append({'id': suite_id, 'name': f'Suite {suite_id}', 'parentSuite': {'id': suite_id - 1}})
+    return suites
+
+
+@pytest.fixture
+def exporter():
+    return AzureTestPlanExporter('org', 'proj', 'pat')
+
+
+def test_build_suite_hierarchy_reuses_the_tree_of_the_same_suite_list(exporter, monkeypatch):
+    built = []
+
+    class CountingSuiteTree(SuiteTree):
+        def __init__(self, *args, **kwargs):
+            built.append(self)
+            super().__init__(*args, **kwargs)
+    monkeypatch.setattr(azureTestPlanExporter, 'SuiteTree', CountingSuiteTree)
+
+    suites = make_suites(50)
+    paths = [exporter.build_suite_hierarchy(suite, suites) for suite in suites]
+    assert len(built) == 1
+    assert paths[2] == ['Root', 'Suite 2', 'Suite 3']
+    assert len(paths[-1]) == 50
+
+
+def test_build_suite_hierarchy_rebuilds_for_another_or_changed_suite_list(exporter):
+    suites = make_suites(3)
+    assert exporter.build_suite_hierarchy(suites[2], suites) == ['Root', 'Suite 2', 'Suite 3']
+
+    suites.append({'id': 4, 'name': 'Suite 4', 'parentSuite': {'id': 3}})
+    assert exporter.build_suite_hierarchy(suites[3], suites) == ['Root', 'Suite 2', 'Suite 3', 'Suite 4']
+
+    renamed = [dict(suite, name=f"Renamed {suite['id']}") for suite in suites]
+    assert exporter.build_suite_hierarchy(renamed[1], renamed) == ['Renamed 1', 'Renamed 2']
+
+
+def make_tree(suites):
+    return SuiteTree(suites, logging.getLogger('AzureTestPlanExporter'))
+
+
+def test_paths_walk_up_to_the_root():
+    tree = make_tree([{'id': 3, 'name': 'Login', 'parentSuite': {'id': 2}},
+                      {'id': 1, 'name': 'Plan'},
+                      {'id': 2, 'name': 'Web', 'parentSuite': {'id': 1}},
+                      {'id': 4, 'name': 'Mobile', 'parentSuite': {'id': 1}}])
+    assert tree.path(3) == ['Plan', 'Web', 'Login']
+    assert tree.full_path('4') == 'Plan > Mobile'
+    assert tree.path('1') == ['Plan']
+    assert tree.path('5') == []
+    assert tree.ids() == ['3', '1', '2', '4']
+    assert tree.children(1) == ['2', '4']
+    assert '2' in tree and 5 not in tree
+    assert tree[3]['name'] == 'Login'
+
+
+def test_unnamed_suites_are_left_out_of_paths():
+    tree = make_tree([{'id': 1, 'name': 'Plan'}, {'id': 2, 'parentSuite': {'id': 1}},
+                      {'id': 3, 'name': 'Login', 'parentSuite': {'id': 2}}])
+    assert tree.path(3) == ['Plan', 'Login']
+
+
+def test_a_cycle_in_the_hierarchy_ends_the_path(caplog):
+    tree = make_tree([{'id': 1, 'name': 'A', 'parentSuite': {'id': 3}},
+                      {'id': 2, 'name': 'B', 'parentSuite': {'id': 1}},
+                      {'id': 3, 'name': 'C', 'parentSuite': {'id': 2}},
+                      {'id': 4, 'name': 'D', 'parentSuite': {'id': 4}}])
+    with caplog.at_level(logging.WARNING):
+        assert tree.path(2) == ['C', 'A', 'B']
+        assert tree.path(4) == ['D']
+    assert [record.getMessage() for record in caplog.records] == [
+        'Suite hierarchy cycle detected at suite 2', 'Suite hierarchy cycle detected at suite 4']
+    # Memoized from the first walk, without walking the cycle again
+    caplog.clear()
+    assert tree.path(1) == ['C', 'A']
+    assert tree.path(3) == ['C']
+    assert caplog.records == []
+    assert tree.subtree_ids(1) == ['1', '2', '3']
+
+
+def test_a_missing_parent_ends_the_path(caplog):
+    tree = make_tree([{'id': 2, 'name': 'Web', 'parentSuite': {'id': 1}},
+                      {'id': 3, 'name': 'Login', 'parentSuite': {'id': 2}}])
+    with caplog.at_level(logging.WARNING):
+        assert tree.path(3) == ['Web', 'Login']
+    assert 'Parent suite 1 not found in suite list' in caplog.text
+
+
+def test_paths_are_memoized_for_every_suite_walked_through():
+    suites = make_suites(2000)
+    tree = make_tree(suites)
+    assert len(tree.path(2000)) == 2000
+    suites[0]['name'] = 'Renamed'
+    assert tree.path(1000)[0] == 'Root'
+
+
+def test_find_by_path():
+    tree = make_tree(make_suites(4))
+    assert tree.find_by_path('Root > Suite 2 > Suite 3') == '3'
+    assert tree.find_by_path(' Root>Suite 2 ') == '2'
+    assert tree.find_by_path('Root > Suite 3') is None
+    assert tree.find_by_path('') is None
+
+
+def test_subtree_ids_lists_a_suite_and_its_descendants():
+    tree = make_tree([{'id': 1, 'name': 'Plan'},
+                      {'id': 2, 'name': 'Web', 'parentSuite': {'id': 1}},
+                      {'id': 3, 'name': 'Mobile', 'parentSuite': {'id': 1}},
+                      {'id': 4, 'name': 'Login', 'parentSuite': {'id': 2}},
+                      {'id': 5, 'name': 'Android', 'parentSuite': {'id': 3}}])
+    assert tree.subtree_ids(1) == ['1', '2', '3', '4', '5']
+    assert tree.subtree_ids('3') == ['3', '5']
+    assert tree.subtree_ids(4) == ['4']
+    assert tree.subtree_ids(9) == ['9']
@@ -0,0 +1,126 @@
+import json
+from datetime import datetime, timezone
+
+# Imported under another name so pytest does not try to collect it as a test class
+from azureTestPlanExporter import TestResultIndex as ResultIndex
+
+WATERMARK = datetime(2024, 3, 10, 8, 30, tzinfo=timezone.utc)
+
+
+def make_result(result_id: int, test_case_id: str, completed_date: str, outcome: str = 'Passed'):
+    return {'id': result_id, 'testCase': {'id': test_case_id}, 'completedDate': completed_date, 'outcome': outcome}
+
+
+def at(day: int, hour: int = 12, minute: int = 0, second: int = 0) -> datetime:
+    return datetime(2024, 3, day, hour, minute, second, tzinfo=timezone.utc)
+
+
+def outcomes(results):
+    return [result['outcome'] for result in results]
+
+
+def make_index(directory=None) -> ResultIndex:
+    index = ResultIndex('1', str(directory) if directory else None)
+    index.add('10', [make_result(1, '100', '2024-03-03T12:00:00Z', 'Third'),
+                     make_result(2, '100', '2024-03-01T12:00:00.123Z', 'First'),
+                     make_result(3, '200', '2024-03-02T12:00:00Z', 'Other')])
+    index.add('11', [make_result(1, '100', '2024-03-02T12:00:00.5Z', 'Second'),
+                     make_result(2, '100', '2024-03-05T12:00:00Z', 'Fifth')])
+    return index
+
+
+def test_results_are_ordered_by_completion_date():
+    index = make_index()
+    assert len(index) == 5
+    assert outcomes(index.all('100')) == ['First', 'Second', 'Third', 'Fifth']
+    assert outcomes(index.all(200)) == ['Other']
+    assert index.all('300') == []
+    assert index.latest('100')['outcome'] == 'Fifth'
+    assert index.latest('300') is None
+
+
+def test_results_without_a_completion_date_are_never_latest():
+    index = ResultIndex('1')
+    index.add('10', [make_result(1, '100', None, 'InProgress')])
+    assert index.latest('100') is None
+    assert outcomes(index.all('100')) == ['InProgress']
+    index.add('11', [make_result(1, '100', '2024-03-01T12:00:00Z')])
+    assert index.latest('100')['outcome'] == 'Passed'
+
+
+def test_results_without_a_test_case_are_read_but_not_indexed():
+    index = ResultIndex('1')
+    assert index.add('10', [{'id': 1, 'outcome': 'Passed'}, make_result(2, '100', '2024-03-01T12:00:00Z')]) == 2
+    assert len(index) == 1
+
+
+def test_rereading_a_run_replaces_its_results():
+    index = make_index()
+    index.add('10', [make_result(1, '100', '2024-03-06T12:00:00Z', 'Rerun'),
+                     make_result(3, '300', '2024-03-02T12:00:00Z', 'Moved')])
+    assert len(index) == 5
+    assert outcomes(index.all('100')) == ['First', 'Second', 'Fifth', 'Rerun']
+    assert index.all('200') == []
+    assert outcomes(index.all('300')) == ['Moved']
+    assert outcomes(index.between('100', at(3), at(5))) == ['Fifth']
+
+
+def test_between_is_inclusive_at_whole_second_precision():
+    index = make_index()
+    assert outcomes(index.between('100')) == ['First', 'Second', 'Third', 'Fifth']
+    assert outcomes(index.between('100', start=at(2))) == ['Second', 'Third', 'Fifth']
+    assert outcomes(index.between('100', end=at(2))) == ['First', 'Second']
+    assert outcomes(index.between('100', at(1), at(3))) == ['First', 'Second', 'Third']
+    # Fractional seconds fall within the second they start
+    assert outcomes(index.between('100', at(1), at(1))) == ['First']
+    assert outcomes(index.between('100', at(2, second=1), at(5, 11, 59, 59))) == ['Third']
+    assert index.between('100', at(5, second=1)) == []
+    assert index.between('100', at(4), at(4)) == []
+    assert index.between('300', at(1), at(5)) == []
+
+
+def test_between_converts_other_time_zones_to_utc():
+    index = make_index()
+    plus_two = datetime.fromisoformat('2024-03-03T14:00:00+02:00')
+    assert outcomes(index.between('100', plus_two, plus_two)) == ['Third']
+
+
+def test_saved_index_is_loaded_with_its_watermark(tmp_path):
+    index = make_index(tmp_path)
+    index.save(WATERMARK)
+    loaded = ResultIndex('1', str(tmp_path))
+    assert loaded.watermark == WATERMARK
+    assert len(loaded) == 5
+    assert outcomes(loaded.all('100')) == ['First', 'Second', 'Third', 'Fifth']
+    assert outcomes(loaded.between('100', at(2), at(3))) == ['Second', 'Third']
+    assert ResultIndex('2', str(tmp_path)).watermark is None
+
+
+def test_unpersisted_index_only_records_the_watermark():
+    index = make_index()
+    index.save(WATERMARK)
+    assert index.path is None
+    assert index.watermark == WATERMARK
+
+
+def test_unreadable_index_is_ignored(tmp_path):
+    index = make_index(tmp_path)
+    index.save(WATERMARK)
+    with open(index.path, 'w', encoding='utf-8') as index_file:
+        json.dump({'runs': {'10': [make_result(1, '100', '2024-03-01T12:00:00Z')]}}, index_file)
+    loaded = ResultIndex('1', str(tmp_path))
+    assert len(loaded) == 0
+    assert loaded.watermark is None
+
+
+def test_clear_and_delete(tmp_path):
+    index = make_index(tmp_path)
+    index.save(WATERMARK)
+    index.clear()
+    assert len(index) == 0 and index.watermark is None
+    assert index.all('100') == [] and index.between('100') == []
+
+    index = make_index(tmp_path)
+    index.delete()
+    assert len(index) == 0
+    assert ResultIndex('1', str(tmp_path)).watermark is None
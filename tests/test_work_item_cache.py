@@ -0,0 +1,139 @@
+import random
+import time
+
+import pytest
+
+from azureTestPlanExporter import WorkItemCache
+
+DAY = 24 * 60 * 60
+
+
+class FakeClock:
+    """Stands in for time.time, so entries can be aged without waiting"""
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, 'time', clock.time)
+    return clock
+
+
+@pytest.fixture
+def open_cache(tmp_path):
+    caches = []
+
+    def open_cache(**options) -> WorkItemCache:
+        cache = WorkItemCache(str(tmp_path), **options)
+        caches.append(cache)
+        return cache
+
+    yield open_cache
+    for cache in caches:
+        cache.close()
+
+
+def make_work_item(wi_id: int, rev: int = 1, **fields):
+    # Random text, so payloads compress to roughly the same size
+    text = random.Random(wi_id).randbytes(300).hex()
+    return {'id': wi_id, 'rev': rev, 'fields': dict({'System.Title': f'Work item {wi_id}',
+                                                     'Microsoft.VSTS.TCM.Steps': text}, **fields)}
+
+
+def cached_ids(cache: WorkItemCache):
+    return sorted(str(row[0]) for row in cache._conn.execute("SELECT id FROM work_items"))
+
+
+def total_size(cache: WorkItemCache) -> int:
+    return cache._conn.execute("SELECT SUM(size) FROM work_items").fetchone()[0]
+
+
+def test_only_the_current_revision_is_a_hit(open_cache):
+    cache = open_cache()
+    cache.put_many([make_work_item(1, rev=3), make_work_item(2, rev=1)])
+    assert cache.get_many({'1': 3, '2': 2, '3': 1}) == {'1': make_work_item(1, rev=3)}
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # A newer revision replaces the cached one
+    cache.put_many([make_work_item(2, rev=2)])
+    assert cache.get_many({'2': 1}) == {}
+    assert cache.get_many({'2': 2}) == {'2': make_work_item(2, rev=2)}
+    # A revision of None takes whatever is cached
+    assert sorted(cache.get_many({'1': None, '2': None})) == ['1', '2']
+    assert (cache.hits, cache.misses) == (4, 3)
+
+
+def test_revision_is_read_from_the_fields_and_unrevisioned_items_are_skipped(open_cache):
+    cache = open_cache()
+    fields_only = {'id': 1, 'fields': {'System.Rev': 5, 'System.Title': 'From fields'}}
+    cache.put_many([fields_only, {'id': 2, 'fields': {}}, {'rev': 1, 'fields': {}}])
+    assert cached_ids(cache) == ['1']
+    assert cache.get_many({'1': 5}) == {'1': fields_only}
+
+
+def test_entries_persist_across_opens(open_cache):
+    open_cache().put_many([make_work_item(1)])
+    assert open_cache().get_many({'1': 1}) == {'1': make_work_item(1)}
+
+
+def test_least_recently_used_entries_are_evicted_over_the_size_limit(open_cache, clock):
+    cache = open_cache()
+    for wi_id in (1, 2, 3, 4):
+        cache.put_many([make_work_item(wi_id)])
+        clock.now += 1
+    cache.get_many({'1': 1})
+    clock.now += 1
+    cache.get_many({'3': 1})
+
+    cache.max_size_bytes = total_size(cache) - 1
+    assert cache.evict() == 1
+    assert cached_ids(cache) == ['1', '3', '4']
+
+    sizes = dict(cache._conn.execute("SELECT id, size FROM work_items"))
+    cache.max_size_bytes = sizes[3]
+    assert cache.evict() == 2
+    assert cached_ids(cache) == ['3']
+    assert cache.evict() == 0
+
+
+def test_size_limit_is_applied_when_opened(open_cache):
+    cache = open_cache()
+    cache.put_many([make_work_item(wi_id) for wi_id in range(1, 11)])
+    assert open_cache(max_size_mb=0).get_many({str(wi_id): 1 for wi_id in range(1, 11)}) == {}
+
+
+def test_entries_unused_for_max_age_are_evicted(open_cache, clock):
+    cache = open_cache(max_age_days=2)
+    cache.put_many([make_work_item(1), make_work_item(2)])
+    clock.now += DAY
+    cache.put_many([make_work_item(3)])
+    clock.now += DAY
+    # Reading an entry keeps it fresh
+    cache.get_many({'2': 1})
+
+    clock.now += 1
+    assert cache.evict() == 1
+    assert cached_ids(cache) == ['2', '3']
+
+    clock.now += 2 * DAY
+    assert cached_ids(open_cache(max_age_days=2)) == []
+
+
+def test_cache_is_cleared_when_other_fields_are_requested(open_cache):
+    fields = ['System.Title', 'Microsoft.VSTS.TCM.Steps']
+    open_cache(fields=fields).put_many([make_work_item(1)])
+    assert cached_ids(open_cache(fields=list(reversed(fields)))) == ['1']
+    # Fields are not checked when none are given
+    assert cached_ids(open_cache()) == ['1']
+
+    cache = open_cache(fields=fields + ['System.Tags'])
+    assert cached_ids(cache) == []
+    cache.put_many([make_work_item(2, **{'System.Tags': 'smoke'})])
+    assert cached_ids(open_cache(fields=fields + ['System.Tags'])) == ['2']
+    assert cached_ids(open_cache(fields=fields)) == []